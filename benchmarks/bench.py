@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""Benchmarks of m3's hashing, diff, copy, overwrite, apply and export paths.
+
+Generates synthetic projects with the given numbers of jars, times each
+benchmark against them and writes the results as JSON for regression
+tracking. Assets are downloaded from a stub CDN served on localhost, and m3's
+per-user state directory is redirected to a temporary directory so that the
+real ~/.m3 is never touched.
+
+Run from the root of the repository:
+
+    python -m benchmarks.bench --sizes 100 1000 --output results.json
+"""
+
+# Benchmarks share a signature, not all of them need the scratch directory.
+# pylint: disable=unused-argument
+
+import argparse
+import contextlib
+import dataclasses
+import functools
+import hashlib
+import http.server
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from click.testing import CliRunner
+
+from src.cli.apply import Apply
+from src.cli.diff import evaluate_diff
+from src.cli.export import export, get_export_cache_path
+from src.config.config import Config
+from src.config.lockfile import HASH_ALGS, Lockfile
+from src.config.lockfile_entry import HashEntry, LockfileEntry
+from src.lib.asset import CurseForgeAsset
+from src.lib.copy import copy
+from src.lib.overwrite import overwrite_dir
+from src.util import paths
+from src.util.enum import AssetType, Platform, Side
+from src.util.hash import hash_asset_dir_multi_hash
+from src.util.hash_cache import HashCache
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_JAR_SIZE = 16 * 1024
+DEFAULT_REPEAT = 3
+# Fraction of the jars that differ between the directories overwrite_dir is
+# benchmarked on.
+OVERWRITE_CHANGED_FRACTION = 0.1
+# Number of jars per config file in the packs export is benchmarked on.
+EXPORT_JARS_PER_CONFIG = 10
+SEED = 0
+
+
+@dataclass
+class Pack:
+    """A synthetic project and the stub CDN serving its assets."""
+    config: Config
+    lockfile: Lockfile
+    # Directory holding the original jars, served by the stub CDN
+    jars_dir: Path
+    jar_names: list[str]
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    # pylint: disable-next=redefined-builtin
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_cdn(directory: Path):
+    """Serves the files in the given directory on localhost for the duration of
+    the context, yielding the base URL."""
+    handler = functools.partial(_QuietHandler, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def generate_pack(root: Path, count: int, jar_size: int,
+                  cdn_url: str) -> Pack:
+    """Generates a project with a lockfile of the given number of jars, whose
+    sizes vary between half and one and a half times jar_size. The jars are
+    written to a directory served by the stub CDN, the project's asset
+    directories start out empty.
+
+    Args:
+        root: The directory to generate the project in
+        count: The number of jars
+        jar_size: The average size of the jars in bytes
+        cdn_url: The base URL of the stub CDN serving root / 'cdn'
+
+    Returns:
+        The generated Pack.
+    """
+    rng = random.Random(SEED + count)
+    jars_dir = root / 'cdn'
+    jars_dir.mkdir(parents=True)
+    project = root / 'project'
+    project.mkdir()
+    config = Config(name='bench', _path=project / 'm3.json')
+    config.write()
+    for path in config.get_asset_paths().values():
+        path.mkdir()
+    lockfile = Lockfile(_path=project / 'm3.lock.json')
+    jar_names = []
+    for i in range(count):
+        name = f'mod-{i:05}.jar'
+        contents = rng.randbytes(rng.randint(jar_size // 2, jar_size * 3 // 2))
+        (jars_dir / name).write_bytes(contents)
+        jar_names.append(name)
+        asset = CurseForgeAsset(
+            name=f'mod-{i}', display_name=f'Mod {i}', file_name=name,
+            platform=Platform.CURSEFORGE, asset_type=AssetType.MOD,
+            side=Side.BOTH, cdn_link=f'{cdn_url}/{name}', dependencies=[],
+            project_id=i, file_id=i)
+        lockfile.add_entry(LockfileEntry(
+            name=asset.name, display_name=asset.display_name, file_name=name,
+            hash=HashEntry(**{
+                alg.value: hashlib.new(alg.value, contents).hexdigest()
+                for alg in HASH_ALGS}),
+            platform=Platform.CURSEFORGE, asset_type=AssetType.MOD,
+            asset=asset))
+    lockfile.write()
+    return Pack(config, lockfile, jars_dir, jar_names)
+
+
+def _reset_dir(path: Path):
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+
+
+def _fill_mods(pack: Pack):
+    """Hardlinks every jar into the project's mods directory."""
+    mods_dir = pack.config.get_asset_paths()[AssetType.MOD]
+    _reset_dir(mods_dir)
+    for name in pack.jar_names:
+        os.link(pack.jars_dir / name, mods_dir / name)
+
+
+def _use_m3_home(path: Path):
+    """Points m3's per-user state directory at the given directory."""
+    paths.M3_HOME = path
+
+
+# Each benchmark is a function taking the pack and a scratch directory, which
+# returns a (setup, run) pair. setup() is called before every timed call of
+# run() and is not timed.
+Benchmark = Callable[[Pack, Path], tuple[Callable[[], None],
+                                         Callable[[], None]]]
+
+
+def bench_hash(pack: Pack, scratch: Path):
+    """Hashes the mods directory without a hash cache."""
+    mods_dir = pack.config.get_asset_paths()[AssetType.MOD]
+    return (lambda: _fill_mods(pack),
+            lambda: hash_asset_dir_multi_hash(mods_dir, HASH_ALGS))
+
+
+def bench_hash_cached(pack: Pack, scratch: Path):
+    """Hashes the mods directory with a warm hash cache."""
+    mods_dir = pack.config.get_asset_paths()[AssetType.MOD]
+    cache_path = scratch / 'hashes.json'
+
+    def _setup():
+        _fill_mods(pack)
+        cache = HashCache(cache_path)
+        hash_asset_dir_multi_hash(mods_dir, HASH_ALGS, cache)
+        cache.save()
+
+    return (_setup, lambda: hash_asset_dir_multi_hash(
+        mods_dir, HASH_ALGS, HashCache(cache_path)))
+
+
+def bench_evaluate_diff(pack: Pack, scratch: Path):
+    """Diffs the lockfile against a mods directory missing a tenth of the
+    jars, without a hash cache."""
+    def _setup():
+        _fill_mods(pack)
+        mods_dir = pack.config.get_asset_paths()[AssetType.MOD]
+        for name in pack.jar_names[::10]:
+            (mods_dir / name).unlink()
+
+    return _setup, lambda: evaluate_diff(pack.config, pack.lockfile)
+
+
+def bench_get_assets_by_type(pack: Pack, scratch: Path):
+    """Builds the multikey dict of the mods of a freshly loaded lockfile."""
+    lockfiles = []
+
+    def _setup():
+        lockfiles[:] = [Lockfile(entries=dict(pack.lockfile.entries),
+                                 _path=pack.lockfile.get_path())]
+
+    return (_setup,
+            lambda: lockfiles[0].get_assets_by_type(AssetType.MOD))
+
+
+def bench_copy(pack: Pack, scratch: Path):
+    """Copies the jars into an empty directory."""
+    dest = scratch / 'copy'
+    return (lambda: _reset_dir(dest),
+            lambda: copy(pack.jars_dir, dest, include=['*'], exclude=[]))
+
+
+def bench_copy_link(pack: Pack, scratch: Path):
+    """Hardlinks the jars into an empty directory."""
+    dest = scratch / 'copy'
+    return (lambda: _reset_dir(dest),
+            lambda: copy(pack.jars_dir, dest, include=['*'], exclude=[],
+                         link=True))
+
+
+def bench_overwrite_dir(pack: Pack, scratch: Path):
+    """Overwrites a directory of the jars with a staging directory where a
+    tenth of the jars were replaced."""
+    dest = scratch / 'dest'
+    staging = scratch / 'staging'
+    changed = set(pack.jar_names[::int(1 / OVERWRITE_CHANGED_FRACTION)])
+
+    def _setup():
+        _reset_dir(dest)
+        _reset_dir(staging)
+        for name in pack.jar_names:
+            os.link(pack.jars_dir / name, dest / name)
+            if name in changed:
+                (staging / f'new-{name}').write_bytes(b'changed')
+            else:
+                os.link(pack.jars_dir / name, staging / name)
+
+    return _setup, lambda: overwrite_dir(dest, staging)
+
+
+def _run_apply():
+    result = CliRunner().invoke(Apply.apply, [])
+    if result.exit_code != 0:
+        raise RuntimeError(f'apply failed: {result.output}') \
+            from result.exception
+
+
+def bench_apply(pack: Pack, scratch: Path):
+    """Applies the lockfile to an empty mods directory, downloading every jar
+    from the stub CDN."""
+    def _setup():
+        _reset_dir(pack.config.get_asset_paths()[AssetType.MOD])
+        home = scratch / 'm3_home'
+        shutil.rmtree(home, ignore_errors=True)
+        _use_m3_home(home)
+
+    return _setup, _run_apply
+
+
+def bench_apply_store(pack: Pack, scratch: Path):
+    """Applies the lockfile to an empty mods directory with every jar in the
+    asset store."""
+    home = scratch / 'm3_home'
+
+    def _setup():
+        _use_m3_home(home)
+        mods_dir = pack.config.get_asset_paths()[AssetType.MOD]
+        if not home.exists():
+            _reset_dir(mods_dir)
+            _run_apply()
+        _reset_dir(mods_dir)
+
+    return _setup, _run_apply
+
+
+def _get_export_config(pack: Pack) -> Config:
+    """Fills the mods directory, writes a compressible config file for every
+    EXPORT_JARS_PER_CONFIG jars, and returns a config that exports both."""
+    _fill_mods(pack)
+    config_dir = pack.config.get_parent_dir() / 'config'
+    config_dir.mkdir(exist_ok=True)
+    for i in range(0, len(pack.jar_names), EXPORT_JARS_PER_CONFIG):
+        (config_dir / f'mod-{i:05}.toml').write_text(
+            f'[mod-{i}]\nenabled = true\nvalue = {i}\n' * 100,
+            encoding='utf-8')
+    includes = ['config/**', 'mods/*.jar']
+    return dataclasses.replace(pack.config, client_includes=includes,
+                               server_includes=includes)
+
+
+def bench_export(pack: Pack, scratch: Path):
+    """Exports the client and server packs of the jars and config files,
+    compressing every file."""
+    config = _get_export_config(pack)
+    return lambda: None, lambda: export(config, use_cache=False)
+
+
+def bench_export_cached(pack: Pack, scratch: Path):
+    """Exports the client and server packs again with nothing changed since
+    the last export, reusing every compressed file."""
+    config = _get_export_config(pack)
+
+    def _setup():
+        if not get_export_cache_path(config).exists():
+            export(config)
+
+    return _setup, lambda: export(config)
+
+
+BENCHMARKS: dict[str, Benchmark] = {
+    'hash_asset_dir_multi_hash': bench_hash,
+    'hash_asset_dir_multi_hash_cached': bench_hash_cached,
+    'evaluate_diff': bench_evaluate_diff,
+    'get_assets_by_type': bench_get_assets_by_type,
+    'copy': bench_copy,
+    'copy_link': bench_copy_link,
+    'overwrite_dir': bench_overwrite_dir,
+    'apply': bench_apply,
+    'apply_store': bench_apply_store,
+    'export': bench_export,
+    'export_cached': bench_export_cached,
+}
+
+
+def run_benchmark(benchmark: Benchmark, pack: Pack, scratch: Path,
+                  repeat: int) -> list[float]:
+    """Returns the wall clock times of the given number of runs of a
+    benchmark in seconds."""
+    _reset_dir(scratch)
+    setup, run = benchmark(pack, scratch)
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _get_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, check=True,
+            text=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[list[str]] = None) -> dict:
+    """Runs the benchmarks and writes their results as JSON.
+
+    Returns:
+        The results that were written.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of jars in the generated packs')
+    parser.add_argument('--jar-size', type=int, default=DEFAULT_JAR_SIZE,
+                        help='average size of the generated jars in bytes')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='number of timed runs of each benchmark')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+                        help='benchmarks to run, defaults to all of them')
+    parser.add_argument('--output', type=Path,
+                        help='file to write the JSON results to, defaults to '
+                        'stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    original_home = paths.M3_HOME
+    with tempfile.TemporaryDirectory(prefix='m3-bench-') as tmpdir:
+        for count in args.sizes:
+            root = Path(tmpdir) / str(count)
+            with serve_cdn(root / 'cdn') as cdn_url:
+                pack = generate_pack(root, count, args.jar_size, cdn_url)
+                for name in args.only or BENCHMARKS:
+                    _use_m3_home(root / 'm3_home')
+                    with contextlib.chdir(pack.config.get_parent_dir()):
+                        times = run_benchmark(
+                            BENCHMARKS[name], pack, root / 'scratch',
+                            args.repeat)
+                    results.append({
+                        'benchmark': name, 'jars': count, 'times': times,
+                        'min': min(times),
+                        'median': statistics.median(times),
+                        'mean': statistics.mean(times),
+                    })
+                    print(f'{name:<34} {count:>6} jars  '
+                          f'min {min(times):8.4f}s  '
+                          f'median {statistics.median(times):8.4f}s',
+                          file=sys.stderr)
+    paths.M3_HOME = original_home
+
+    output = {
+        'metadata': {
+            'revision': _get_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'jar_size': args.jar_size,
+            'repeat': args.repeat,
+            'timestamp': time.time(),
+        },
+        'results': results,
+    }
+    data = json.dumps(output, indent=2)
+    if args.output is not None:
+        args.output.write_text(data + '\n', encoding='utf-8')
+    else:
+        print(data)
+    return output
+
+
+if __name__ == '__main__':
+    main()
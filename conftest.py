@@ -15,11 +15,21 @@ from src.config.config import Config
 # Fixtures defined in modules in this project.
 # pylint: disable-next=invalid-name
 pytest_plugins = (
+    "src.api.cf_test_util",
     "src.config.config_test_util",
     "src.config.lockfile_test_util"
 )
 
 
+@pytest.fixture(autouse=True)
+def m3_home(tmp_path_factory, monkeypatch) -> Path:
+    """Test fixture that points m3's per-user state directory at a temporary
+    directory so that tests never read or write the real ~/.m3."""
+    path = tmp_path_factory.mktemp('m3_home') / '.m3'
+    monkeypatch.setattr('src.util.paths.M3_HOME', path)
+    return path
+
+
 @pytest.fixture
 def current_dir(request) -> Path:
     """Test fixture that returns the parent directory of the current test."""
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """CLI entry point."""
 
+import functools
+from pathlib import Path
+
 import click
 
 from src.cli.add import Add
@@ -15,14 +18,33 @@ from src.cli.prune import Prune
 from src.cli.remove import Remove
 from src.cli.status import Status
 from src.util.click import AliasGroup
+from src.util.profile import (PROFILE_ENV_VAR, PROFILE_OUTPUT_ENV_VAR,
+                              PROFILER, report)
+
+PROFILE_HELPTEXT = """
+Print the time spent in each phase of the command and the work it did.
+"""
+PROFILE_OUTPUT_HELPTEXT = """
+Also write the profile to this file, as a speedscope profile of the phases if
+it ends with .json or as cProfile stats otherwise. Implies --profile.
+"""
 
 
 @click.group(context_settings={
     'help_option_names': ['-h', '--help']
 }, cls=AliasGroup)
+@click.option('--profile', is_flag=True, envvar=PROFILE_ENV_VAR,
+              help=PROFILE_HELPTEXT)
+@click.option('--profile-output', envvar=PROFILE_OUTPUT_ENV_VAR,
+              type=click.Path(dir_okay=False, path_type=Path),
+              help=PROFILE_OUTPUT_HELPTEXT)
+@click.pass_context
 # pylint: disable-next=missing-function-docstring
-def m3():
-    pass
+def m3(ctx, profile, profile_output):
+    if profile or profile_output is not None:
+        PROFILER.start(cprofile=profile_output is not None
+                       and profile_output.suffix != '.json')
+        ctx.call_on_close(functools.partial(report, profile_output))
 
 
 m3.add_command(Init.init)
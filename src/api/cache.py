@@ -0,0 +1,203 @@
+"""On-disk cache for CurseForge API responses."""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from src.api.dataclasses.cf_response_objects import CFFile, CFMod
+from src.util.paths import get_m3_dir
+from src.util.profile import PROFILER
+
+CF_CACHE_DIR = 'cache'
+CF_CACHE_FILENAME = 'curseforge.sqlite'
+# Environment variable to override how long mod records are cached for.
+MOD_TTL_ENV_VAR = 'M3_MOD_CACHE_TTL'
+# Mod records change when new files are uploaded, so they expire after a day.
+DEFAULT_MOD_TTL = 24 * 60 * 60
+
+FILE_KIND = 'file'
+MOD_KIND = 'mod'
+
+
+class ResponseCache:
+    """sqlite backed cache of CurseForge file and mod records.
+
+    File records are immutable for a given file ID and are cached permanently.
+    Mod records expire after mod_ttl seconds. The ETag and Last-Modified
+    headers of single mod lookups are stored so that expired records can be
+    revalidated with a conditional request. Batch lookups return no such
+    headers and keep the ones a record was last stored with.
+    """
+
+    def __init__(self, path: Optional[Path] = None,
+                 mod_ttl: Optional[float] = None):
+        self.path = path if path is not None else (
+            get_m3_dir(CF_CACHE_DIR) / CF_CACHE_FILENAME)
+        self.mod_ttl = mod_ttl if mod_ttl is not None else float(
+            os.environ.get(MOD_TTL_ENV_VAR, DEFAULT_MOD_TTL))
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                kind TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                fetched REAL NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                PRIMARY KEY (kind, id)
+            )''')
+        self._conn.commit()
+
+    def _get_rows(self, kind: str, ids: list[int]) -> dict[int, tuple]:
+        rows = {}
+        with self._lock:
+            for id_ in dict.fromkeys(ids):
+                row = self._conn.execute(
+                    'SELECT body, fetched, etag, last_modified FROM responses '
+                    'WHERE kind = ? AND id = ?', (kind, id_)).fetchone()
+                if row is not None:
+                    rows[id_] = row
+        return rows
+
+    def _put_rows(self, kind: str, records: list[tuple[int, object]],
+                  etag: Optional[str] = None,
+                  last_modified: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            # Records fetched without validators, such as by batch lookups,
+            # keep the validators they were last fetched with.
+            self._conn.executemany(
+                'INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (kind, id) DO UPDATE SET body = excluded.body, '
+                'fetched = excluded.fetched, '
+                'etag = COALESCE(excluded.etag, etag), '
+                'last_modified = COALESCE(excluded.last_modified, '
+                'last_modified)',
+                [(kind, id_, orjson.dumps(record), now, etag, last_modified)
+                 for id_, record in records])
+            self._conn.commit()
+
+    def _count(self, hits: int, misses: int):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        PROFILER.count('api_cache_hits', hits)
+        PROFILER.count('api_cache_misses', misses)
+
+    def get_files(self, file_ids: list[int]) -> dict[int, CFFile]:
+        """Returns the cached file records for the given file IDs.
+
+        Args:
+            file_ids: The CurseForge file IDs to look up
+
+        Returns:
+            A dict mapping each cached file ID to its CFFile record.
+        """
+        rows = self._get_rows(FILE_KIND, file_ids)
+        self._count(len(rows), len(set(file_ids)) - len(rows))
+        return {id_: CFFile(**orjson.loads(row[0]))
+                for id_, row in rows.items()}
+
+    def put_files(self, files: list[CFFile]):
+        """Stores the given file records permanently."""
+        self._put_rows(FILE_KIND, [(file_.id, file_) for file_ in files])
+
+    def get_mods(self, mod_ids: list[int]) -> dict[int, CFMod]:
+        """Returns the cached mod records for the given mod IDs that have not
+        expired.
+
+        Args:
+            mod_ids: The CurseForge mod IDs to look up
+
+        Returns:
+            A dict mapping each cached mod ID to its CFMod record.
+        """
+        expiry = time.time() - self.mod_ttl
+        rows = {id_: row for id_, row in self._get_rows(
+            MOD_KIND, mod_ids).items() if row[1] >= expiry}
+        self._count(len(rows), len(set(mod_ids)) - len(rows))
+        return {id_: CFMod(**orjson.loads(row[0]))
+                for id_, row in rows.items()}
+
+    def get_expired_mod_ids(self, mod_ids: list[int]) -> list[int]:
+        """Returns the given mod IDs whose records are cached but expired.
+
+        Args:
+            mod_ids: The CurseForge mod IDs to look up
+
+        Returns:
+            The IDs of the expired records, in the order of the given IDs.
+        """
+        expiry = time.time() - self.mod_ttl
+        return [id_ for id_, row in self._get_rows(MOD_KIND, mod_ids).items()
+                if row[1] < expiry]
+
+    def get_mod_validators(
+            self, mod_id: int) -> Optional[tuple[CFMod, Optional[str],
+                                                 Optional[str]]]:
+        """Returns an expired or fresh mod record with the ETag and
+        Last-Modified header values it was fetched with, for revalidating the
+        record with a conditional request.
+
+        Args:
+            mod_id: The CurseForge mod ID to look up
+
+        Returns:
+            A (CFMod, etag, last_modified) tuple, or None if the mod was never
+            cached.
+        """
+        row = self._get_rows(MOD_KIND, [mod_id]).get(mod_id)
+        if row is None:
+            return None
+        return (CFMod(**orjson.loads(row[0])), row[2], row[3])
+
+    def put_mods(self, mods: list[CFMod], etag: Optional[str] = None,
+                 last_modified: Optional[str] = None):
+        """Stores the given mod records, which expire after mod_ttl seconds.
+
+        Args:
+            mods: The mod records to store
+            etag: The ETag header value the records were fetched with
+            last_modified: The Last-Modified header value the records were
+                fetched with. Stored validators are kept if neither is
+                given.
+        """
+        self._put_rows(MOD_KIND, [(mod.id, mod) for mod in mods],
+                       etag, last_modified)
+
+    def touch_mod(self, mod_id: int):
+        """Marks a cached mod record as freshly fetched after the API confirmed
+        that it has not changed."""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE responses SET fetched = ? WHERE kind = ? AND id = ?',
+                (time.time(), MOD_KIND, mod_id))
+            self._conn.commit()
+            self.revalidated += 1
+        PROFILER.count('api_cache_revalidated')
+
+    def clear(self):
+        """Removes every cached record."""
+        with self._lock:
+            self._conn.execute('DELETE FROM responses')
+            self._conn.commit()
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of cache hits, misses, and expired records that
+        were revalidated without being refetched so far."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'revalidated': self.revalidated}
+
+    def close(self):
+        """Closes the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,124 @@
+"""Unit testing for cache.py"""
+
+import dataclasses
+from unittest.mock import MagicMock, patch
+
+from src.api.cache import ResponseCache
+from src.api.wrappers.cf_wrapper import CF_MAX_REVALIDATIONS, CurseForgeWrapper
+
+
+def test_response_cache_files(tmp_path, make_cf_file):
+    """Tests that file records are persisted and counted as hits and
+    misses."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=0)
+    cache.put_files([make_cf_file(1, 10)])
+    cache.close()
+
+    cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=0)
+    assert cache.get_files([1, 2]) == {1: make_cf_file(1, 10)}
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'revalidated': 0}
+
+
+def test_response_cache_mod_ttl(tmp_path, make_cf_mod):
+    """Tests that mod records are only returned until they expire."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=60)
+    cache.put_mods([make_cf_mod(10)], etag='"etag"')
+    assert cache.get_mods([10]) == {10: make_cf_mod(10)}
+
+    cache.mod_ttl = -1
+    assert not cache.get_mods([10])
+    assert cache.get_mod_validators(10) == (make_cf_mod(10), '"etag"', None)
+
+
+def test_response_cache_keeps_validators(tmp_path, make_cf_mod):
+    """Tests that storing a mod record without validators, as batch lookups
+    do, keeps the validators it was last stored with."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite')
+    cache.put_mods([make_cf_mod(10)], etag='"v1"',
+                   last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+    renamed = dataclasses.replace(make_cf_mod(10), name='renamed')
+    cache.put_mods([renamed])
+    assert cache.get_mod_validators(10) == (
+        renamed, '"v1"', 'Mon, 01 Jan 2024 00:00:00 GMT')
+    cache.put_mods([renamed], etag='"v2"')
+    assert cache.get_mod_validators(10) == (
+        renamed, '"v2"', 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+
+@patch.object(CurseForgeWrapper, '_get_mods_chunk')
+@patch.object(CurseForgeWrapper, '_get_asset_files_chunk')
+def test_wrapper_uses_cache(mock_get_files_chunk, mock_get_mods_chunk,
+                            tmp_path, make_cf_file, make_cf_mod):
+    """Tests that the wrapper only requests records missing from the
+    cache."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite')
+    cache.put_files([make_cf_file(1, 10)])
+    cache.put_mods([make_cf_mod(10)])
+    mock_get_files_chunk.return_value = [make_cf_file(2, 20)]
+    mock_get_mods_chunk.return_value = [make_cf_mod(20)]
+
+    client = CurseForgeWrapper('key', MagicMock(), cache)
+    resolved = client.resolve_assets([1, 2])
+    assert [(mod.id, file_.id) for mod, file_ in resolved] == [
+        (10, 1), (20, 2)]
+    mock_get_files_chunk.assert_called_once_with([2])
+    mock_get_mods_chunk.assert_called_once_with([20])
+
+    # Everything is cached now, so no more requests are made
+    client.resolve_assets([1, 2])
+    assert mock_get_files_chunk.call_count == 1
+    assert mock_get_mods_chunk.call_count == 1
+
+
+def test_wrapper_revalidates_expired_mod(tmp_path, make_cf_mod):
+    """Tests that an expired mod is revalidated with its ETag and reused when
+    the API responds with 304 Not Modified."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=-1)
+    cache.put_mods([make_cf_mod(10)], etag='"etag"')
+    session = MagicMock()
+    session.get.return_value.status_code = 304
+
+    mod = CurseForgeWrapper('key', session, cache).get_mod(10).data
+    assert mod == make_cf_mod(10)
+    assert session.get.call_args.kwargs['headers']['If-None-Match'] == '"etag"'
+    assert cache.stats()['revalidated'] == 1
+
+
+@patch.object(CurseForgeWrapper, '_get_mods_chunk')
+def test_wrapper_revalidates_expired_mods(mock_get_mods_chunk, tmp_path,
+                                          make_cf_mod):
+    """Tests that batch lookups revalidate a few expired mods one by one, and
+    only fetch uncached mods in batches."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=-1)
+    cache.put_mods([make_cf_mod(10)], etag='"etag"')
+    cache.put_mods([make_cf_mod(20)])
+    session = MagicMock()
+    not_modified = MagicMock(status_code=304)
+    modified = MagicMock(status_code=200, headers={'ETag': '"new"'})
+    modified.json.return_value = {'data': make_cf_mod(20)}
+    session.get.side_effect = [not_modified, modified]
+    mock_get_mods_chunk.return_value = [make_cf_mod(30)]
+
+    mods = CurseForgeWrapper('key', session, cache).get_mods([10, 20, 30])
+    assert [mod.id for mod in mods] == [10, 20, 30]
+    assert [call.kwargs['headers'].get('If-None-Match')
+            for call in session.get.call_args_list] == ['"etag"', None]
+    mock_get_mods_chunk.assert_called_once_with([30])
+    assert cache.stats()['revalidated'] == 1
+    assert cache.get_mod_validators(20)[1] == '"new"'
+
+
+@patch.object(CurseForgeWrapper, '_get_mods_chunk')
+def test_wrapper_refetches_many_expired_mods(mock_get_mods_chunk, tmp_path,
+                                             make_cf_mod):
+    """Tests that expired mods are refetched in batches when there are too
+    many to revalidate one by one."""
+    cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=-1)
+    mod_ids = list(range(1, CF_MAX_REVALIDATIONS + 2))
+    cache.put_mods([make_cf_mod(id_) for id_ in mod_ids], etag='"etag"')
+    session = MagicMock()
+    mock_get_mods_chunk.return_value = [make_cf_mod(id_) for id_ in mod_ids]
+
+    CurseForgeWrapper('key', session, cache).get_mods(mod_ids)
+    session.get.assert_not_called()
+    mock_get_mods_chunk.assert_called_once_with(mod_ids)
@@ -0,0 +1,37 @@
+"""Utilities and fixtures for unit testing the CurseForge API modules."""
+
+from typing import Callable
+
+import pytest
+
+from src.api.dataclasses.cf_response_objects import CFFile, CFMod
+
+
+@pytest.fixture
+def make_cf_file() -> Callable[[int, int], CFFile]:
+    """Test fixture that returns a helper function to create a CFFile with the
+    given file and mod IDs and placeholder metadata."""
+    def _make_cf_file(file_id: int, mod_id: int) -> CFFile:
+        return CFFile(
+            id=file_id, gameId=432, modId=mod_id, isAvailable=True,
+            displayName=f'file-{file_id}', fileName=f'file-{file_id}.jar',
+            releaseType=1, fileStatus=4, hashes=[], fileDate='', fileLength=0,
+            downloadCount=0, downloadUrl='', gameVersions=[],
+            sortableGameVersions=[], dependencies=[], alternateFileId=0,
+            isServerPack=False, fileFingerprint=0, modules=[])
+    return _make_cf_file
+
+
+@pytest.fixture
+def make_cf_mod() -> Callable[[int], CFMod]:
+    """Test fixture that returns a helper function to create a CFMod with the
+    given ID and placeholder metadata."""
+    def _make_cf_mod(mod_id: int) -> CFMod:
+        return CFMod(
+            id=mod_id, gameId=432, name=f'mod-{mod_id}', slug=f'mod-{mod_id}',
+            links={}, summary='', status=4, downloadCount=0,
+            primaryCategoryId=0, categories=[], classId=6, authors=[],
+            mainFileId=0, latestFiles=[], latestEarlyAccessFilesIndexes=[],
+            dateCreated='', dateModified='', allowModDistribution=True,
+            isAvailable=True)
+    return _make_cf_mod
@@ -0,0 +1,179 @@
+"""An asyncio wrapper class for the CurseForge API."""
+
+import asyncio
+import time
+import weakref
+from typing import Callable, Optional
+
+import requests
+
+from src.api.cache import ResponseCache
+from src.api.dataclasses.cf_response_objects import (CFFile,
+                                                     CFGetModResponse, CFMod)
+from src.api.wrappers.cf_wrapper import (CF_BASE_URL, CurseForgeWrapper,
+                                         chunk_ids, join_assets, order_by_ids)
+
+# Maximum number of requests in flight at once.
+MAX_IN_FLIGHT_REQUESTS = 8
+# Maximum number of requests started per second across all callers.
+MAX_REQUESTS_PER_SECOND = 10
+
+
+class RateLimiter:
+    """Token bucket rate limiter for coroutines.
+
+    Allows bursts of up to burst calls to acquire() and refills at rate tokens
+    per second after that. The limiter may be used from several event loops
+    one after another, but not from several loops at the same time.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        # asyncio primitives bind to the first loop that waits on them, so
+        # each running loop gets its own lock.
+        self._locks = weakref.WeakKeyDictionary()
+
+    async def acquire(self):
+        """Waits until a token is available and takes it."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._locks:
+            self._locks[loop] = asyncio.Lock()
+        async with self._locks[loop]:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncCurseForgeWrapper:
+    """asyncio twin of CurseForgeWrapper with the same lookup methods.
+
+    Batched lookups send their chunks concurrently, with at most max_in_flight
+    requests outstanding and at most requests_per_second requests started per
+    second across every caller sharing the wrapper. Requests are made through
+    a CurseForgeWrapper on worker threads, so they share its pooled session and
+    response cache.
+
+    Cancelling a call cancels every request it has not started yet. Requests
+    already on the network run to completion on their worker thread, but their
+    results are discarded.
+
+    A wrapper may be reused across event loops, for example by several calls
+    to asyncio.run, but must not be used from two loops at the same time.
+    """
+
+    def __init__(self, api_key, session: requests.Session = None,
+                 cache: Optional[ResponseCache] = None,
+                 base_url: str = CF_BASE_URL,
+                 max_in_flight: int = MAX_IN_FLIGHT_REQUESTS,
+                 requests_per_second: float = MAX_REQUESTS_PER_SECOND):
+        self.client = CurseForgeWrapper(api_key, session, cache, base_url)
+        self._max_in_flight = max_in_flight
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._rate_limiter = RateLimiter(requests_per_second)
+
+    async def _call(self, func: Callable, *args) -> object:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self._max_in_flight)
+        async with self._semaphores[loop]:
+            await self._rate_limiter.acquire()
+            return await asyncio.to_thread(func, *args)
+
+    async def _call_all(self, func: Callable, args: list) -> list:
+        """Calls func with each of the given arguments concurrently, cancelling
+        every other call and raising the first error if one of them fails."""
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(self._call(func, arg))
+                         for arg in args]
+        except ExceptionGroup as error:
+            raise error.exceptions[0] from error
+        return [task.result() for task in tasks]
+
+    async def _fetch_chunks(
+            self, ids: list[int], fetch_chunk: Callable) -> list:
+        """Fetches the given IDs in concurrent chunks like _call_all."""
+        chunks = await self._call_all(fetch_chunk, chunk_ids(ids))
+        return [record for chunk in chunks for record in chunk]
+
+    async def get_mod(self, mod_id: int) -> CFGetModResponse:
+        """Return CFGetModData object containing mod metadata.
+
+        Args:
+          mod_id: The Mod ID for the mod metadata to be fetched
+
+        Returns:
+            A CFGetModResponse object.
+        """
+        return await self._call(self.client.get_mod, mod_id)
+
+    async def get_mods(self, mod_ids: list[int]) -> list[CFMod]:
+        """Return list of CFMod objects containing mod metadata.
+
+        Expired records are revalidated like in CurseForgeWrapper.get_mods.
+
+        Args:
+            mod_ids: List of mod IDs to query
+
+        Returns:
+            List of CFMod objects in the order of the given IDs. IDs that were
+            not found are left out.
+        """
+        # pylint: disable=protected-access
+        mods, expired_ids, missing_ids = self.client._get_cached_mods(mod_ids)
+        revalidated = await self._call_all(
+            self.client._revalidate_mod, expired_ids)
+        fetched = await self._fetch_chunks(
+            missing_ids, self.client._get_mods_chunk)
+        # pylint: enable=protected-access
+        if self.client.cache is not None:
+            self.client.cache.put_mods(fetched)
+        mods.update({mod.id: mod for mod in revalidated + fetched
+                     if mod is not None})
+        return order_by_ids(mod_ids, mods)
+
+    async def get_asset_files(self, file_ids: list[int]) -> list[CFFile]:
+        """Return list of CFFile objects containing file metadata.
+
+        Args:
+            file_ids: List of file IDs to query
+
+        Returns:
+            A list of CFFile objects in the order of the given IDs. IDs that
+            were not found are left out.
+        """
+        cache = self.client.cache
+        files = cache.get_files(file_ids) if cache is not None else {}
+        fetched = await self._fetch_chunks(
+            [id_ for id_ in file_ids if id_ not in files],
+            # pylint: disable-next=protected-access
+            self.client._get_asset_files_chunk)
+        if cache is not None:
+            cache.put_files(fetched)
+        files.update({file_.id: file_ for file_ in fetched})
+        return order_by_ids(file_ids, files)
+
+    async def resolve_assets(
+            self, file_ids: list[int]) -> list[tuple[CFMod, CFFile]]:
+        """Fetches the file and project metadata of several assets.
+
+        Args:
+            file_ids: List of CurseForge file IDs to resolve
+
+        Returns:
+            A list of (CFMod, CFFile) tuples in the order of the given file IDs,
+            or raises a ValueError if a file or its project was not found.
+        """
+        files = await self.get_asset_files(file_ids)
+        mods = await self.get_mods([file_.modId for file_ in files])
+        return join_assets(file_ids, files, mods)
@@ -0,0 +1,178 @@
+"""Unit testing for async_cf_wrapper.py"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import orjson
+import pytest
+import requests
+from click import ClickException
+
+from src.api.cache import ResponseCache
+from src.api.wrappers.async_cf_wrapper import (AsyncCurseForgeWrapper,
+                                               RateLimiter)
+
+# Seconds the stub server takes to answer each request.
+RESPONSE_DELAY = 0.2
+
+
+@pytest.fixture
+def stub_api(make_cf_file, make_cf_mod):
+    """Test fixture that serves the batched CurseForge endpoints from a local
+    HTTP server. Every file ID N belongs to mod ID N * 10, and file ID 0 makes
+    the server return a malformed response.
+
+    Single mod lookups are always answered with 304 Not Modified.
+
+    Yields the base URL of the server and a dict recording the requests made
+    to it and the peak number of concurrent requests.
+    """
+    stats = {'requests': [], 'in_flight': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):  # pylint: disable=invalid-name
+            """Answers batched file and mod lookups."""
+            body = orjson.loads(self.rfile.read(
+                int(self.headers['Content-Length'])))
+            with lock:
+                stats['requests'].append((self.path, body))
+                stats['in_flight'] += 1
+                stats['peak'] = max(stats['peak'], stats['in_flight'])
+            time.sleep(RESPONSE_DELAY)
+            if self.path == '/v1/mods/files':
+                ids = body['fileIds']
+                data = [make_cf_file(id_, id_ * 10) for id_ in ids]
+            else:
+                ids = body['modIds']
+                data = [make_cf_mod(id_) for id_ in ids]
+            # Answer in reverse order, like the API which has no ordering
+            payload = orjson.dumps({'data': data[::-1]}) if 0 not in ids \
+                else b'not json'
+            with lock:
+                stats['in_flight'] -= 1
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            """Answers every conditional mod lookup with 304 Not Modified."""
+            with lock:
+                stats['requests'].append((self.path, None))
+            self.send_response(304)
+            self.end_headers()
+
+        def log_message(self, *args):  # pylint: disable=arguments-differ
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/', stats
+    server.shutdown()
+    server.server_close()
+
+
+@patch('src.api.wrappers.cf_wrapper.CF_MAX_BATCH_SIZE', 2)
+class AsyncCurseForgeWrapperTest:
+    def test_resolve_assets(self, stub_api):
+        """Tests that chunks are fetched concurrently and resolved in the
+        order of the given IDs."""
+        base_url, stats = stub_api
+        client = AsyncCurseForgeWrapper(
+            'key', requests.Session(), base_url=base_url)
+        start = time.monotonic()
+        resolved = asyncio.run(client.resolve_assets([5, 4, 3, 2, 1, 6]))
+        elapsed = time.monotonic() - start
+
+        assert [(mod.id, file_.id) for mod, file_ in resolved] == [
+            (50, 5), (40, 4), (30, 3), (20, 2), (10, 1), (60, 6)]
+        assert len(stats['requests']) == 6
+        assert stats['peak'] == 3
+        # Two rounds of concurrent chunks rather than six sequential requests
+        assert elapsed < 4 * RESPONSE_DELAY
+
+    def test_max_in_flight(self, stub_api):
+        """Tests that no more than max_in_flight requests are outstanding."""
+        base_url, stats = stub_api
+        client = AsyncCurseForgeWrapper(
+            'key', requests.Session(), base_url=base_url, max_in_flight=2)
+        files = asyncio.run(client.get_asset_files(list(range(1, 9))))
+        assert [file_.id for file_ in files] == list(range(1, 9))
+        assert stats['peak'] == 2
+
+    def test_uses_cache(self, stub_api, tmp_path):
+        """Tests that only records missing from the cache are fetched."""
+        base_url, stats = stub_api
+        cache = ResponseCache(tmp_path / 'cache.sqlite')
+        client = AsyncCurseForgeWrapper(
+            'key', requests.Session(), cache, base_url=base_url)
+        asyncio.run(client.get_asset_files([1, 2]))
+        asyncio.run(client.get_asset_files([1, 2, 3]))
+        assert [body for _, body in stats['requests']] == [
+            {'fileIds': [1, 2]}, {'fileIds': [3]}]
+
+    def test_revalidates_expired_mods(self, stub_api, tmp_path, make_cf_mod):
+        """Tests that a few expired mods are revalidated one by one rather
+        than refetched."""
+        base_url, stats = stub_api
+        cache = ResponseCache(tmp_path / 'cache.sqlite', mod_ttl=-1)
+        cache.put_mods([make_cf_mod(10), make_cf_mod(20)], etag='"etag"')
+        client = AsyncCurseForgeWrapper(
+            'key', requests.Session(), cache, base_url=base_url)
+        mods = asyncio.run(client.get_mods([10, 20, 30]))
+        assert [mod.id for mod in mods] == [10, 20, 30]
+        assert sorted(stats['requests'], key=str) == [
+            ('/v1/mods', {'modIds': [30], 'filterPcOnly': True}),
+            ('/v1/mods/10', None), ('/v1/mods/20', None)]
+        assert cache.stats()['revalidated'] == 2
+
+    def test_reused_across_loops(self, stub_api):
+        """Tests that a wrapper whose limits were contended in one event loop
+        can be used again from another."""
+        base_url, stats = stub_api
+        client = AsyncCurseForgeWrapper(
+            'key', requests.Session(), base_url=base_url, max_in_flight=1,
+            requests_per_second=1000)
+        for _ in range(2):
+            files = asyncio.run(client.get_asset_files([1, 2, 3, 4]))
+            assert [file_.id for file_ in files] == [1, 2, 3, 4]
+        assert len(stats['requests']) == 4
+        assert stats['peak'] == 1
+
+    def test_failed_chunk(self, stub_api):
+        """Tests that a failed chunk raises its error and cancels the chunks
+        that have not started yet."""
+        base_url, stats = stub_api
+        client = AsyncCurseForgeWrapper(
+            'key', requests.Session(), base_url=base_url, max_in_flight=1)
+        with pytest.raises(ClickException):
+            asyncio.run(client.get_asset_files([0, 1, 2, 3, 4, 5]))
+        # The chunk queued behind the failed one may already have started
+        assert len(stats['requests']) < 3
+
+
+def test_rate_limiter():
+    """Tests that acquiring past the burst size waits for tokens to refill."""
+    async def acquire_all(limiter: RateLimiter, count: int):
+        for _ in range(count):
+            await limiter.acquire()
+
+    start = time.monotonic()
+    asyncio.run(acquire_all(RateLimiter(rate=20, burst=2), 6))
+    # 2 tokens are available immediately and 4 refill at 20 per second
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_reused_across_loops():
+    """Tests that a limiter contended in one event loop works in another."""
+    async def acquire_concurrently(limiter: RateLimiter, count: int):
+        await asyncio.gather(*(limiter.acquire() for _ in range(count)))
+
+    limiter = RateLimiter(rate=100, burst=1)
+    asyncio.run(acquire_concurrently(limiter, 3))
+    asyncio.run(acquire_concurrently(limiter, 3))
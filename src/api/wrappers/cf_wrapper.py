@@ -2,26 +2,94 @@
 
 from json.decoder import JSONDecodeError
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
 from urllib.parse import urljoin
 
 import requests
 from click import ClickException
 
+from src.api.cache import ResponseCache
 from src.api.dataclasses.cf_response_objects import (CFFile,
                                                      CFGetFilesResponse,
                                                      CFGetModResponse,
                                                      CFGetModsResponse, CFMod)
+from src.util.profile import PROFILER
+from src.util.web import get_session
 
 CF_BASE_URL = 'https://api.curseforge.com'
 CF_API_VERSION = 'v1'
+# Maximum number of IDs to send in a single batched request.
+CF_MAX_BATCH_SIZE = 50
+# Maximum number of expired mod records to revalidate with one conditional
+# request each, rather than refetching them all in batches.
+CF_MAX_REVALIDATIONS = 5
+
+
+def chunk_ids(ids: list[int], size: Optional[int] = None) -> list[list[int]]:
+    """Splits the given IDs into chunks of at most the given size, dropping
+    duplicate IDs.
+
+    Args:
+        ids: The IDs to split
+        size: The maximum size of each chunk, defaults to CF_MAX_BATCH_SIZE
+
+    Returns:
+        A list of chunks of IDs in their original order.
+    """
+    size = size if size is not None else CF_MAX_BATCH_SIZE
+    unique_ids = list(dict.fromkeys(ids))
+    return [unique_ids[i:i + size] for i in range(0, len(unique_ids), size)]
+
+
+def order_by_ids(ids: list[int], records: dict[int, object]) -> list:
+    """Returns the records for the given IDs in the order of the IDs, leaving
+    out duplicate IDs and IDs without a record."""
+    return [records[id_] for id_ in dict.fromkeys(ids) if id_ in records]
+
+
+def join_assets(file_ids: list[int], files: list[CFFile],
+                mods: list[CFMod]) -> list[tuple[CFMod, CFFile]]:
+    """Joins file records with the records of their projects.
+
+    Args:
+        file_ids: The CurseForge file IDs to join, in the order to return them
+        files: The file records of the file IDs
+        mods: The project records of the files
+
+    Returns:
+        A list of (CFMod, CFFile) tuples in the order of the given file IDs,
+        or raises a ValueError if a file or its project is missing.
+    """
+    files_by_id = {file_.id: file_ for file_ in files}
+    missing_files = [id_ for id_ in file_ids if id_ not in files_by_id]
+    if len(missing_files) > 0:
+        raise ValueError(
+            f'CurseForge files not found: {missing_files}')
+    mods_by_id = {mod.id: mod for mod in mods}
+    missing_mods = [file_.modId for file_ in files_by_id.values()
+                    if file_.modId not in mods_by_id]
+    if len(missing_mods) > 0:
+        raise ValueError(
+            f'CurseForge projects not found: {missing_mods}')
+    return [(mods_by_id[files_by_id[id_].modId], files_by_id[id_])
+            for id_ in file_ids]
 
 
 class CurseForgeWrapper:  # pylint: disable=too-few-public-methods
-    """Wrapper for the CurseForge API."""
+    """Wrapper for the CurseForge API.
 
-    def __init__(self, api_key):
+    Requests go through a pooled, keep-alive session that is shared with asset
+    downloads unless a session is given. If a response cache is given, file and
+    mod records are served from it when possible.
+    """
+
+    def __init__(self, api_key, session: requests.Session = None,
+                 cache: Optional[ResponseCache] = None,
+                 base_url: str = CF_BASE_URL):
         self.api_key = api_key
+        self.session = session if session is not None else get_session()
+        self.cache = cache
+        self.base_url = base_url
 
     def _get_headers(self) -> dict:
         return {
@@ -32,10 +100,12 @@ class CurseForgeWrapper:  # pylint: disable=too-few-public-methods
 
     def _get_request(self, path: Path, body: dict = None) -> dict:
         try:
-            url = urljoin(CF_BASE_URL, str(Path(CF_API_VERSION) / path))
-            response = requests.get(
-                url, headers=self._get_headers(), json=body, timeout=10)
-            return response.json()
+            url = urljoin(self.base_url, str(Path(CF_API_VERSION) / path))
+            PROFILER.count('api_requests')
+            with PROFILER.phase('api'):
+                response = self.session.get(
+                    url, headers=self._get_headers(), json=body, timeout=10)
+                return response.json()
         except requests.exceptions.HTTPError as e:
             raise ClickException(
                 'A problem occurred while querying the CurseForge API') from e
@@ -46,12 +116,40 @@ class CurseForgeWrapper:  # pylint: disable=too-few-public-methods
             raise ClickException(
                 'Failed to decode JSON payload from CurseForge API') from e
 
+    def _conditional_get_request(
+            self, path: Path, etag: Optional[str],
+            last_modified: Optional[str]) -> Optional[requests.Response]:
+        """Issues a GET request that the API may answer with 304 Not Modified
+        if the resource still matches the given validators.
+
+        Returns:
+            The response, or None if the resource was not modified.
+        """
+        headers = self._get_headers()
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            url = urljoin(self.base_url, str(Path(CF_API_VERSION) / path))
+            PROFILER.count('api_requests')
+            with PROFILER.phase('api'):
+                response = self.session.get(url, headers=headers, timeout=10)
+            if response.status_code == 304:
+                return None
+            return response
+        except requests.exceptions.RequestException as e:
+            raise ClickException(
+                'A problem occurred while querying the CurseForge API') from e
+
     def _post_request(self, path: Path, body: dict = None) -> dict:
         try:
-            url = urljoin(CF_BASE_URL, str(Path(CF_API_VERSION) / path))
-            response = requests.post(
-                url, headers=self._get_headers(), json=body, timeout=10)
-            return response.json()
+            url = urljoin(self.base_url, str(Path(CF_API_VERSION) / path))
+            PROFILER.count('api_requests')
+            with PROFILER.phase('api'):
+                response = self.session.post(
+                    url, headers=self._get_headers(), json=body, timeout=10)
+                return response.json()
         except (requests.exceptions.HTTPError, requests.exceptions.RequestException) as e:
             raise ClickException(
                 'A problem occurred while querying the CurseForge API') from e
@@ -74,9 +172,66 @@ class CurseForgeWrapper:  # pylint: disable=too-few-public-methods
             raise Exception(
                 f'Failed to process API response to {path}') from e
 
+    def _revalidate_mod(self, mod_id: int) -> Optional[CFMod]:
+        """Fetches a mod with a conditional request, sending the ETag and
+        Last-Modified values of its cached record if there is one, and stores
+        the result and its validators in the cache.
+
+        Args:
+            mod_id: The Mod ID for the mod metadata to be fetched
+
+        Returns:
+            The CFMod, or None if the mod was not found.
+        """
+        validators = self.cache.get_mod_validators(mod_id)
+        etag, last_modified = (validators[1], validators[2]) \
+            if validators is not None else (None, None)
+        response = self._conditional_get_request(
+            Path(f'mods/{mod_id}'), etag, last_modified)
+        if response is None:
+            self.cache.touch_mod(mod_id)
+            return validators[0]
+        if response.status_code == 404:
+            return None
+        try:
+            mod = CFGetModResponse(**response.json()).data
+        except (TypeError, JSONDecodeError) as e:
+            raise Exception(
+                f'Failed to process API response to mods/{mod_id}') from e
+        self.cache.put_mods([mod], response.headers.get('ETag'),
+                            response.headers.get('Last-Modified'))
+        return mod
+
+    def _get_cached_mods(
+            self, mod_ids: list[int]) -> tuple[dict[int, CFMod], list[int],
+                                               list[int]]:
+        """Splits the given mod IDs by how to look them up.
+
+        Expired records are revalidated one by one with conditional requests
+        if there are at most CF_MAX_REVALIDATIONS of them, since a 304 response
+        is much cheaper than refetching the record. Otherwise they are
+        refetched in batches along with the uncached IDs.
+
+        Returns:
+            A tuple of the fresh cached records keyed by mod ID, the IDs to
+            revalidate, and the IDs to fetch in batches.
+        """
+        if self.cache is None:
+            return {}, [], mod_ids
+        mods = self.cache.get_mods(mod_ids)
+        missing_ids = [id_ for id_ in mod_ids if id_ not in mods]
+        expired_ids = self.cache.get_expired_mod_ids(missing_ids)
+        if len(expired_ids) > CF_MAX_REVALIDATIONS:
+            return mods, [], missing_ids
+        return mods, expired_ids, [
+            id_ for id_ in missing_ids if id_ not in expired_ids]
+
     def get_mod(self, mod_id: int) -> CFMod:
         """Return CFGetModData object containing mod metadata.
 
+        If the mod is cached but expired, it is revalidated with its ETag and
+        Last-Modified values instead of being refetched.
+
         Args:
           mod_id: The Mod ID for the mod metadata to be fetched
 
@@ -84,42 +239,84 @@ class CurseForgeWrapper:  # pylint: disable=too-few-public-methods
             An object containing CFGetModResponse object or None, statusCode of
             API request, and status containing status or error message.
         """
+        if self.cache is None:
+            return self._unpack_request(
+                f'mods/{mod_id} ', 'GET',
+                unpacker=lambda json: CFGetModResponse(**json))
+        cached = self.cache.get_mods([mod_id])
+        if mod_id in cached:
+            return CFGetModResponse(data=cached[mod_id])
+        mod = self._revalidate_mod(mod_id)
+        if mod is None:
+            raise Exception(f'Failed to process API response to mods/{mod_id}')
+        return CFGetModResponse(data=mod)
+
+    def _get_mods_chunk(self, mod_ids: list[int]) -> list[CFMod]:
         return self._unpack_request(
-            f'mods/{mod_id} ', 'GET',
-            unpacker=lambda json: CFGetModResponse(**json))
+            'mods', 'POST',
+            body={
+                "modIds": mod_ids,
+                "filterPcOnly": True
+            },
+            unpacker=lambda json: CFGetModsResponse(**json)).data
 
     def get_mods(self, mod_ids: list[int]) -> list[CFMod]:
-        """Return list of CFGetModData object containing mod metadata.
+        """Return list of CFMod objects containing mod metadata.
+
+        Cached records that have not expired are reused, and a few expired
+        ones are revalidated like in get_mod. The rest are fetched in batches
+        of at most CF_MAX_BATCH_SIZE.
 
         Args:
             mod_ids: List of mod IDs to query
 
         Returns:
-            List of CFGetModResponse objects.
+            List of CFMod objects in the order of the given IDs. IDs that were
+            not found are left out.
         """
+        mods, expired_ids, missing_ids = self._get_cached_mods(mod_ids)
+        for id_ in expired_ids:
+            mod = self._revalidate_mod(id_)
+            if mod is not None:
+                mods[id_] = mod
+        for chunk in chunk_ids(missing_ids):
+            fetched = self._get_mods_chunk(chunk)
+            if self.cache is not None:
+                self.cache.put_mods(fetched)
+            for mod in fetched:
+                mods[mod.id] = mod
+        return order_by_ids(mod_ids, mods)
+
+    def _get_asset_files_chunk(self, file_ids: list[int]) -> list[CFFile]:
         return self._unpack_request(
-            'mods', 'POST',
+            'mods/files', 'POST',
             body={
-                "modIds": mod_ids,
-                "filterPcOnly": True
+                "fileIds": file_ids,
             },
-            unpacker=lambda json: CFGetModsResponse(**json))
+            unpacker=lambda json: CFGetFilesResponse(**json)).data
 
     def get_asset_files(self, file_ids: list[int]) -> list[CFFile]:
         """Return list of CFFile objects containing file metadata.
 
+        Cached records are reused, the rest are fetched in batches of at most
+        CF_MAX_BATCH_SIZE.
+
         Args:
             file_ids: List of file IDs to query
 
         Returns:
-            A list of CFFile objects.
+            A list of CFFile objects in the order of the given IDs. IDs that
+            were not found are left out.
         """
-        return self._unpack_request(
-            'mods/files', 'POST',
-            body={
-                "fileIds": file_ids,
-            },
-            unpacker=lambda json: CFGetFilesResponse(**json)).data
+        files = self.cache.get_files(file_ids) \
+            if self.cache is not None else {}
+        for chunk in chunk_ids([id_ for id_ in file_ids if id_ not in files]):
+            fetched = self._get_asset_files_chunk(chunk)
+            if self.cache is not None:
+                self.cache.put_files(fetched)
+            for file_ in fetched:
+                files[file_.id] = file_
+        return order_by_ids(file_ids, files)
 
     def get_asset_file(self, file_id) -> CFFile:
         """Return a CFFile object containing file metadata.
@@ -128,6 +325,26 @@ class CurseForgeWrapper:  # pylint: disable=too-few-public-methods
             file_id: The CurseForge file ID to query
 
         Returns:
-            A CFFile object.
+            A CFFile object, or raises a ValueError if the file was not found.
+        """
+        files = self.get_asset_files([file_id])
+        if len(files) == 0:
+            raise ValueError(f'CurseForge file {file_id} not found')
+        return files[0]
+
+    def resolve_assets(
+            self, file_ids: list[int]) -> list[tuple[CFMod, CFFile]]:
+        """Fetches the file and project metadata of several assets with batched
+        requests, costing about 2 * ceil(N / CF_MAX_BATCH_SIZE) API calls
+        instead of 2 * N.
+
+        Args:
+            file_ids: List of CurseForge file IDs to resolve
+
+        Returns:
+            A list of (CFMod, CFFile) tuples in the order of the given file IDs,
+            or raises a ValueError if a file or its project was not found.
         """
-        return self.get_asset_files([file_id])[0]
+        files = self.get_asset_files(file_ids)
+        mods = self.get_mods([file_.modId for file_ in files])
+        return join_assets(file_ids, files, mods)
@@ -0,0 +1,50 @@
+"""Unit testing for cf_wrapper.py"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.api.wrappers.cf_wrapper import CurseForgeWrapper, chunk_ids
+
+
+def test_chunk_ids():
+    """Tests that IDs are deduplicated and split into bounded chunks."""
+    assert chunk_ids([1, 2, 3, 2, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert not chunk_ids([], 2)
+
+
+@patch('src.api.wrappers.cf_wrapper.CF_MAX_BATCH_SIZE', 2)
+class CurseForgeWrapperTest:
+    @patch.object(CurseForgeWrapper, '_get_mods_chunk')
+    @patch.object(CurseForgeWrapper, '_get_asset_files_chunk')
+    def test_resolve_assets(self, mock_get_files_chunk, mock_get_mods_chunk,
+                            make_cf_file, make_cf_mod):
+        """Tests that resolving assets batches file and mod lookups and fans the
+        results back out in the order requested."""
+        file_to_mod = {10: 1, 11: 2, 12: 1, 13: 3, 14: 4}
+        # The API returns results in an arbitrary order
+        mock_get_files_chunk.side_effect = lambda ids: [
+            make_cf_file(id_, file_to_mod[id_]) for id_ in reversed(ids)]
+        mock_get_mods_chunk.side_effect = lambda ids: [
+            make_cf_mod(id_) for id_ in reversed(ids)]
+
+        resolved = CurseForgeWrapper('key', MagicMock()).resolve_assets(
+            [13, 10, 11, 12, 14])
+
+        assert [(mod.id, file_.id) for mod, file_ in resolved] == [
+            (3, 13), (1, 10), (2, 11), (1, 12), (4, 14)]
+        # 5 files in 3 chunks and 4 unique mods in 2 chunks
+        assert mock_get_files_chunk.call_count == 3
+        assert mock_get_mods_chunk.call_count == 2
+
+    @patch.object(CurseForgeWrapper, '_get_mods_chunk')
+    @patch.object(CurseForgeWrapper, '_get_asset_files_chunk')
+    def test_resolve_assets_missing_file(
+            self, mock_get_files_chunk, mock_get_mods_chunk, make_cf_file,
+            make_cf_mod):
+        """Tests that resolving a file ID the API does not return raises a
+        ValueError."""
+        mock_get_files_chunk.return_value = [make_cf_file(10, 1)]
+        mock_get_mods_chunk.return_value = [make_cf_mod(1)]
+        with pytest.raises(ValueError):
+            CurseForgeWrapper('key', MagicMock()).resolve_assets([10, 11])
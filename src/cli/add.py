@@ -2,74 +2,131 @@
 
 import os
 import shutil
-import tempfile
 from pathlib import Path
+from typing import Iterable, TextIO
 
 import click
 
 from src.api.apikey import get_api_key
+from src.api.cache import ResponseCache
 from src.api.wrappers.cf_wrapper import CurseForgeWrapper
 from src.config.lockfile_entry import LockfileEntry
 from src.lib.copy import copy
 from src.lib.lockfile_context_manager import M3ContextManager
-from src.lib.overwrite import overwrite_dir
-from src.util.asset_management import install_asset
+from src.lib.overwrite import create_staging_dir, overwrite_dir
+from src.util.asset_management import install_assets
 from src.util.click import command_with_aliases
+from src.util.enum import AssetType
+from src.util.store import AssetStore
 
 INVALID_FILE_ID_ERROR_MSG = 'Not a valid identifier. Currently only support CurseForge modpacks'
 
+FROM_FILE_HELPTEXT = """
+Read identifiers from a file, one per line. Blank lines and lines starting
+with # are ignored.
+"""
+
+
+def read_identifiers(file: TextIO) -> list[str]:
+    """Reads asset identifiers from a file with one identifier per line,
+    skipping blank lines and # comments."""
+    identifiers = []
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            identifiers.append(line)
+    return identifiers
+
+
+def group_entries_by_type(
+        entries: Iterable[LockfileEntry]) -> dict[AssetType,
+                                                  list[LockfileEntry]]:
+    """Groups the given lockfile entries by their asset type, preserving their
+    order within each group."""
+    groups = {}
+    for entry in entries:
+        groups.setdefault(entry.asset_type, []).append(entry)
+    return groups
+
 
 # pylint: disable-next=too-few-public-methods, missing-class-docstring
 class Add:
     @command_with_aliases('a', 'install', 'i', no_args_is_help=True,
                           short_help='Installs assets into the project.')
-    @click.argument('identifier')
+    @click.argument('identifiers', nargs=-1)
+    @click.option('-f', '--from-file', type=click.File('r'),
+                  help=FROM_FILE_HELPTEXT)
     @staticmethod
-    def add(identifier):
-        """Installs the specified asset into your file system and adds it to the
-        lockfile.
+    def add(identifiers, from_file):
+        """Installs the specified assets into your file system and adds them to
+        the lockfile.
 
-        If your project is a CurseForge modpack, IDENTIFIER is the CurseForge
-        file ID.
+        If your project is a CurseForge modpack, each IDENTIFIER is a
+        CurseForge file ID.
 
-        If your project is a Modrinth modpack, IDENTIFIER is the Modrinth
+        If your project is a Modrinth modpack, each IDENTIFIER is a Modrinth
         project slug.
+
+        All assets are resolved with batched API requests and downloaded
+        concurrently. Either every asset is installed or none of them are.
         """
+        identifiers = list(identifiers)
+        if from_file is not None:
+            identifiers.extend(read_identifiers(from_file))
+        if len(identifiers) == 0:
+            raise click.UsageError('No identifiers given')
         with M3ContextManager() as context:
             if context.config is None or context.lockfile is None:
                 raise click.ClickException('Not an m3 project')
-            if not identifier.isdigit():
-                click.echo(INVALID_FILE_ID_ERROR_MSG)
+            invalid = [i for i in identifiers if not i.isdigit()]
+            if len(invalid) > 0:
+                click.echo(f'{INVALID_FILE_ID_ERROR_MSG}: {", ".join(invalid)}')
                 return
             try:
-                cf_identifier = int(identifier)
-                cf_client = CurseForgeWrapper(get_api_key())
-                asset_data = cf_client.get_asset_file(
-                    cf_identifier)
-                proj_data = cf_client.get_mod(asset_data.modId).data
-                asset_lf_entry = LockfileEntry.create_lockfile_entry_from_resp_obj(
-                    proj_data, asset_data)
-                asset_path = context.config.get_asset_paths()[
-                    asset_lf_entry.asset_type]
+                cf_client = CurseForgeWrapper(
+                    get_api_key(), cache=ResponseCache())
+                resolved = cf_client.resolve_assets(
+                    [int(i) for i in dict.fromkeys(identifiers)])
+                entries_by_type = group_entries_by_type(
+                    LockfileEntry.create_lockfile_entry_from_resp_obj(
+                        proj_data, asset_data)
+                    for proj_data, asset_data in resolved)
+                asset_paths = context.config.get_asset_paths()
+                store = AssetStore()
 
                 # Use a temp filesystem and make all changes in the temp fs so
                 # that if any errors occur, it does not impact the real
-                # filesystem. Makes this command's operation atomic.
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    temp_asset_path = Path(
-                        tmpdir) / context.config.paths.get()[asset_lf_entry.asset_type]
-                    # Create asset dir structure matching real fs in temp fs
-                    os.makedirs(temp_asset_path, exist_ok=True)
-                    copy(asset_path, Path(temp_asset_path),
-                         include=['*'], exclude=[])
-                    installed = install_asset(
-                        asset_lf_entry, Path(temp_asset_path))
-
-                    # Overwrite the contents of the real fs with the updated
-                    # contents of the temp fs
-                    overwrite_dir(asset_path, temp_asset_path)
-                context.lockfile.add_entry(asset_lf_entry)
-                click.echo(f'Installed {installed}')
+                # filesystem. Makes this command's operation atomic. Each
+                # affected asset directory is staged and swapped in once,
+                # regardless of how many assets are added to it, and existing
+                # assets are hardlinked rather than copied into the temp fs.
+                # Every affected directory is staged first so that the assets
+                # of all types are downloaded concurrently on one pool.
+                with create_staging_dir(
+                        context.config.get_parent_dir()) as tmpdir:
+                    temp_asset_paths = {}
+                    for asset_type in entries_by_type:
+                        temp_asset_path = Path(
+                            tmpdir) / context.config.paths.get()[asset_type]
+                        # Create asset dir structure matching real fs in temp fs
+                        os.makedirs(temp_asset_path, exist_ok=True)
+                        copy(asset_paths[asset_type], temp_asset_path,
+                             include=['*'], exclude=[], link=True)
+                        temp_asset_paths[asset_type] = temp_asset_path
+                    installed = install_assets(
+                        [entry for entries in entries_by_type.values()
+                         for entry in entries],
+                        temp_asset_paths, store=store)
+
+                    # Move the changed files from the temp fs into the real fs
+                    for asset_type, temp_asset_path in temp_asset_paths.items():
+                        overwrite_dir(asset_paths[asset_type], temp_asset_path)
+                for entries in entries_by_type.values():
+                    for entry in entries:
+                        context.lockfile.add_entry(entry)
+                for display_name in installed:
+                    click.echo(f'Installed {display_name}')
+                store.gc()
             except ValueError as error:
                 raise click.ClickException(error)
             except FileNotFoundError as error:
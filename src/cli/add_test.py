@@ -13,31 +13,33 @@ from src.util.enum import AssetType, Platform, Side
 
 FILE_ID_FOR_TEST = 17
 MOD_ID_FOR_TEST = 71
+BULK_FILE_IDS_FOR_TEST = [17, 18, 19]
 
 
 @patch('src.config.lockfile.LOCKFILE_FILENAME', "test_m3.lock.json")
 @patch('src.config.config.CONFIG_FILENAME', "test_m3.json")
 class AddTest:
     @patch.object(LockfileEntry, 'create_lockfile_entry_from_resp_obj')
-    @patch.object(CurseForgeWrapper, 'get_mod')
+    @patch.object(CurseForgeWrapper, 'get_mods')
     @patch.object(CurseForgeWrapper, 'get_asset_files')
     @patch('src.util.asset_management.download_file')
     def test_add(
             self, mock_download_file, mock_get_asset_files,
-            mock_get_mod, mock_create_lockfile_entry_from_resp_obj,
+            mock_get_mods, mock_create_lockfile_entry_from_resp_obj,
             config_from_path, copy_test_data_directory, current_dir, tmp_path,
             setup_asset_dir, create_tmpdir, create_file, read_json_file):
         """Tests that the add command installs the given asset to the project."""
         ref_path = current_dir / 'testdata/'
         runner = CliRunner()
 
-        mock_get_asset_return = MagicMock()
         mock_asset_data = MagicMock()
+        mock_asset_data.id = FILE_ID_FOR_TEST
         mock_asset_data.modId = MOD_ID_FOR_TEST
-        mock_get_asset_return.__getitem__.return_value = mock_asset_data
-        mock_get_asset_files.return_value.data = mock_get_asset_return
+        mock_get_asset_files.return_value = [mock_asset_data]
 
-        mock_get_mod.return_value.data = {'id': MOD_ID_FOR_TEST}
+        mock_proj_data = MagicMock()
+        mock_proj_data.id = MOD_ID_FOR_TEST
+        mock_get_mods.return_value = [mock_proj_data]
         mock_asset_hashes = read_json_file(
             current_dir / 'testdata/test_add_file_hashes.json')
         mock_asset = CurseForgeAsset(
@@ -81,6 +83,11 @@ class AddTest:
                     create_file(tmp_expected_filepath, 'Test file d.jar')
                 mock_download_file.side_effect = _mock_download_file
                 result = runner.invoke(Add.add, [str(FILE_ID_FOR_TEST)])
+                mock_get_asset_files.assert_called_once_with(
+                    [FILE_ID_FOR_TEST])
+                mock_get_mods.assert_called_once_with([MOD_ID_FOR_TEST])
+                mock_create_lockfile_entry_from_resp_obj.assert_called_once_with(
+                    mock_proj_data, mock_asset_data)
                 mock_download_file.assert_called_once()
                 assert expected_filepath.is_file()
                 assert result.exit_code == 0  # Prevents silent failures of test
@@ -102,3 +109,82 @@ class AddTest:
             assert original_dir_contents == new_dir_contents
             mock_download_file.assert_not_called()
             assert result.exit_code == 0  # Prevents silent failures of test
+
+    @patch.object(LockfileEntry, 'create_lockfile_entry_from_resp_obj')
+    @patch.object(CurseForgeWrapper, 'resolve_assets')
+    @patch('src.util.asset_management.download_file')
+    def test_add_bulk(
+            self, mock_download_file, mock_resolve_assets,
+            mock_create_lockfile_entry_from_resp_obj, config_from_path,
+            copy_test_data_directory, current_dir, tmp_path, setup_asset_dir,
+            create_file, read_json_file, make_lockfile_entry):
+        """Tests that the add command installs every asset given as arguments
+        and in a file with one batched lookup and one lockfile write."""
+        ref_path = current_dir / 'testdata/'
+        runner = CliRunner()
+
+        resolved = []
+        for file_id in BULK_FILE_IDS_FOR_TEST:
+            mock_asset_data = MagicMock()
+            mock_asset_data.id = file_id
+            resolved.append((MagicMock(), mock_asset_data))
+        mock_resolve_assets.return_value = resolved
+        mock_create_lockfile_entry_from_resp_obj.side_effect = lambda proj, asset: \
+            make_lockfile_entry(f'{asset.id}.jar', project_id=MOD_ID_FOR_TEST,
+                                file_id=asset.id)
+
+        def _mock_download_file(url, dest, hashes, part_path=None):
+            create_file(dest, f'Test file {dest.name}')
+        mock_download_file.side_effect = _mock_download_file
+
+        mock_config = config_from_path(ref_path / 'test_m3.json')
+        mod_path = mock_config.paths.get()[AssetType.MOD]
+
+        with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+            copy_test_data_directory(ref_path, Path(td))
+            setup_asset_dir(mock_config, Path(td))
+            create_file(Path(td) / 'ids.txt', '# More mods\n18\n\n19\n17\n')
+
+            result = runner.invoke(
+                Add.add, ['17', '--from-file', 'ids.txt'])
+            assert result.exit_code == 0, result.output
+            mock_resolve_assets.assert_called_once_with(
+                BULK_FILE_IDS_FOR_TEST)
+            assert mock_download_file.call_count == 3
+            for file_id in BULK_FILE_IDS_FOR_TEST:
+                assert (Path(td) / mod_path / f'{file_id}.jar').is_file()
+            # Existing assets are left in place
+            assert (Path(td) / mod_path / 'a.jar').is_file()
+            entries = read_json_file(Path(td) / 'test_m3.lock.json')['entries']
+            assert {'17.jar', '18.jar', '19.jar'} <= entries.keys()
+
+    @patch.object(LockfileEntry, 'create_lockfile_entry_from_resp_obj')
+    @patch.object(CurseForgeWrapper, 'resolve_assets')
+    @patch('src.util.asset_management.download_file')
+    def test_add_bulk_failure(
+            self, mock_download_file, mock_resolve_assets,
+            mock_create_lockfile_entry_from_resp_obj, copy_test_data_directory,
+            current_dir, tmp_path, load_dir, make_lockfile_entry):
+        """Tests that the add command leaves the project untouched if any of
+        the assets fails to install."""
+        ref_path = current_dir / 'testdata/'
+        runner = CliRunner()
+
+        resolved = []
+        for file_id in BULK_FILE_IDS_FOR_TEST:
+            mock_asset_data = MagicMock()
+            mock_asset_data.id = file_id
+            resolved.append((MagicMock(), mock_asset_data))
+        mock_resolve_assets.return_value = resolved
+        mock_create_lockfile_entry_from_resp_obj.side_effect = lambda proj, asset: \
+            make_lockfile_entry(f'{asset.id}.jar', project_id=MOD_ID_FOR_TEST,
+                                file_id=asset.id)
+        mock_download_file.side_effect = ValueError('hash mismatch')
+
+        with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+            copy_test_data_directory(ref_path, Path(td))
+            original_dir_contents = load_dir(Path(td))
+            result = runner.invoke(
+                Add.add, [str(i) for i in BULK_FILE_IDS_FOR_TEST])
+            assert result.exit_code != 0
+            assert load_dir(Path(td)) == original_dir_contents
@@ -1,18 +1,21 @@
 """apply subcommand module"""
 
 import os
-import tempfile
 from pathlib import Path
 
 import click
 
+from src.cli.diff import NO_CACHE_HELPTEXT
 from src.config.loader import load_config_and_lockfile
 from src.config.lockfile import HASH_ALGS
 from src.lib.copy import copy
-from src.lib.overwrite import overwrite_dir
-from src.util.asset_management import (create_entry_queue, install_assets,
+from src.lib.diff import diff_assets
+from src.lib.overwrite import create_staging_dir, overwrite_dir
+from src.util.asset_management import (install_assets, rename_assets,
                                        uninstall_assets)
-from src.util.hash import hash_asset_dir_multi_hash
+from src.util.hash import hash_asset_dirs
+from src.util.hash_cache import HashCache
+from src.util.store import AssetStore
 
 R_HELPTEXT = """
 Remove assets found in the project asset directories that are not in the
@@ -25,48 +28,65 @@ class Apply:
     """Class for the apply command."""
     @click.command()
     @click.option('-r', '--remove', is_flag=True, help=R_HELPTEXT)
+    @click.option('--no-cache', is_flag=True, help=NO_CACHE_HELPTEXT)
     @staticmethod
-    def apply(remove):
+    def apply(remove, no_cache):
         """Applies the lockfile's state to the project assets."""
         config, lockfile = load_config_and_lockfile()
 
         if config is None or lockfile is None:
             raise click.ClickException('Not an m3 project')
 
+        cache = None if no_cache else HashCache()
+        store = AssetStore()
+
         # Use a temp filesystem and make all changes in the temp fs so that if
         # any errors occur, it does not impact the real filesystem.
-        # Makes this command's operation atomic.
-        with tempfile.TemporaryDirectory() as tmpdir:
+        # Makes this command's operation atomic. Existing assets are hardlinked
+        # into the temp fs, so only new downloads take up space or copy time.
+        with create_staging_dir(config.get_parent_dir()) as tmpdir:
+            temp_asset_paths = {}
             for asset_type, path in config.get_asset_paths().items():
                 temp_asset_path = Path(tmpdir) / config.paths.get()[asset_type]
                 # Create asset dir structure matching real fs in temp fs
                 os.makedirs(temp_asset_path, exist_ok=True)
-                copy(path, Path(temp_asset_path), include=['*'], exclude=[])
-
-                lockfile_assets_multikey_dict = lockfile.get_assets_by_type(
-                    asset_type)
-                curr_asset_multikey_dict = hash_asset_dir_multi_hash(
-                    temp_asset_path, HASH_ALGS)
-                install_queue = create_entry_queue(
-                    lockfile_assets_multikey_dict,
-                    lockfile_assets_multikey_dict.get_multikey_difference(
-                        curr_asset_multikey_dict))
+                copy(path, Path(temp_asset_path), include=['*'], exclude=[],
+                     link=True)
+                temp_asset_paths[asset_type] = temp_asset_path
 
-                install_assets(install_queue, temp_asset_path)
-
-                for i in install_queue:
-                    click.echo(f'Installed {i.display_name}')
+            # Hash the real asset directories rather than their copies in the
+            # temp fs so that hash cache entries stay valid across runs. Every
+            # asset type is hashed concurrently.
+            curr_asset_multikey_dicts = hash_asset_dirs(
+                config.get_asset_paths(), HASH_ALGS, cache)
 
+            install_queue = []
+            for asset_type, temp_asset_path in temp_asset_paths.items():
+                diff = diff_assets(lockfile.get_assets_by_type(asset_type),
+                                   curr_asset_multikey_dicts[asset_type])
+                # Remove files that are not in the lockfile first, so that
+                # renames can take the names they held.
                 if remove:
-                    uninstall_queue = create_entry_queue(
-                        curr_asset_multikey_dict, curr_asset_multikey_dict.
-                        get_multikey_difference(lockfile_assets_multikey_dict))
-                    uninstall_assets(
-                        uninstall_queue, temp_asset_path, click.echo)
+                    uninstall_assets(diff.added, temp_asset_path, click.echo)
+                # Renamed files already have the contents of their lockfile
+                # entries, so they are moved into place instead of downloaded.
+                # Renames that were skipped are downloaded instead.
+                install_queue += diff.removed + rename_assets(
+                    diff.renamed, temp_asset_path, click.echo,
+                    [path.name for path, _ in diff.modified])
+                renamed = {entry.file_name for _, entry in diff.renamed}
+                install_queue += [entry for _, entry in diff.modified
+                                  if entry.file_name not in renamed]
+
+            # Assets of every type are downloaded concurrently on one pool
+            install_assets(install_queue, temp_asset_paths, store=store)
+            for i in install_queue:
+                click.echo(f'Installed {i.display_name}')
             for asset_type, path in config.get_asset_paths().items():
-                # Overwrite the contents of the real fs with the updated
-                # contents of the temp fs
-                overwrite_dir(
-                    path, (Path(tmpdir) / config.paths.get()[asset_type]))
+                # Move the changed files from the temp fs into the real fs
+                overwrite_dir(path, temp_asset_paths[asset_type])
 
+        if cache is not None:
+            cache.save()
+        store.gc()
         click.echo('Applied lockfile state to development directory')
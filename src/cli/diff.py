@@ -1,42 +1,47 @@
 """diff subcommand module"""
 
-from typing import List, Tuple
+from typing import Optional
 
 import click
 
 from src.config.config import Config
 from src.config.loader import load_config_and_lockfile
 from src.config.lockfile import HASH_ALGS, Lockfile
+from src.lib.diff import AssetDiff, diff_assets
 from src.util.click import command_with_aliases
+from src.util.enum import AssetType
 from src.util.formatter import CustomOutputFormatter
-from src.util.hash import hash_asset_dir_multi_hash
+from src.util.hash import hash_asset_dirs
+from src.util.hash_cache import HashCache
+
+NO_CACHE_HELPTEXT = """
+Rehash every asset file instead of reusing hashes of unchanged files.
+"""
 
 
 def evaluate_diff(
-        config: Config, lockfile: Lockfile) -> Tuple[List[str], List[str]]:
+        config: Config, lockfile: Lockfile,
+        cache: Optional[HashCache] = None) -> dict[AssetType, AssetDiff]:
     """Given the config and lockfile of an m3 project, evaluates the diff
-    between the lockfile's state and the project's assets."""
-    missing_assets = []
-    new_assets = []
-    for asset_type, path in config.get_asset_paths().items():
-        lockfile_assets_multikey_dict = lockfile.get_assets_by_type(
-            asset_type)
-        curr_asset_multikey_dict = hash_asset_dir_multi_hash(
-            path, HASH_ALGS)
-
-        missing_asset_set = lockfile_assets_multikey_dict.get_multikey_difference(
-            curr_asset_multikey_dict)
-        new_asset_set = curr_asset_multikey_dict.get_multikey_difference(
-            lockfile_assets_multikey_dict)
-
-        for asset_key in missing_asset_set:
-            missing_assets.append(
-                lockfile_assets_multikey_dict.get_by_multikey(asset_key).file_name)
-
-        for asset_key in new_asset_set:
-            new_assets.append(
-                curr_asset_multikey_dict.get_by_multikey(asset_key))
-    return missing_assets, new_assets
+    between the lockfile's state and the project's assets.
+
+    Args:
+        config: The project config
+        lockfile: The project lockfile
+        cache: An optional hash cache to reuse the hashes of unchanged files
+
+    Returns:
+        A dict mapping each asset type to its AssetDiff.
+    """
+    # Hash every asset type's directory together to hash them concurrently
+    curr_asset_multikey_dicts = hash_asset_dirs(
+        config.get_asset_paths(), HASH_ALGS, cache)
+    return {
+        asset_type: diff_assets(
+            lockfile.get_assets_by_type(asset_type), curr_asset_multikey_dict)
+        for asset_type, curr_asset_multikey_dict
+        in curr_asset_multikey_dicts.items()
+    }
 
 
 # pylint: disable-next=too-few-public-methods
@@ -44,19 +49,24 @@ class DiffOutputBuilder:
     """Builds the output for the diff command in a predefined format to
     display."""
 
-    def build_diff_output(
-            self, missing_assets: List[str],
-            new_assets: List[str]) -> str:
-        """Given a list of missing assets and a list of new assets, builds the
-        output for the diff command.
+    def build_diff_output(self, diffs: dict[AssetType, AssetDiff]) -> str:
+        """Given the diff of each asset type, builds the output for the diff
+        command.
 
         Args:
-            missing_assets: The list of missing assets to display
-            new_assets: The list of new assets to display
+            diffs: The diff of each asset type to display
 
         Returns:
             The output of the diff command as a single string.
         """
+        missing_assets, new_assets, renamed_assets, modified_assets = \
+            [], [], [], []
+        for diff in diffs.values():
+            missing_assets += [entry.file_name for entry in diff.removed]
+            new_assets += diff.added
+            renamed_assets += [f'{path.name} -> {entry.file_name}'
+                               for path, entry in diff.renamed]
+            modified_assets += [entry.file_name for _, entry in diff.modified]
         # Display the diff correctly formatted
         formatter = CustomOutputFormatter()
         output = ''
@@ -73,23 +83,43 @@ class DiffOutputBuilder:
         for asset in new_assets:
             output += '\n' + formatter.format(
                 '{new_asset:diff_plus}', new_asset=asset)
+        if renamed_assets:
+            output += '\n' + formatter.format(
+                '{separator:separator}', separator='')
+            output += '\n' + formatter.format(
+                '{renamed:header}', renamed='Renamed assets')
+            for asset in renamed_assets:
+                output += '\n' + formatter.format(
+                    '{renamed_asset:diff_change}', renamed_asset=asset)
+        if modified_assets:
+            output += '\n' + formatter.format(
+                '{separator:separator}', separator='')
+            output += '\n' + formatter.format(
+                '{modified:header}', modified='Modified assets')
+            for asset in modified_assets:
+                output += '\n' + formatter.format(
+                    '{modified_asset:diff_change}', modified_asset=asset)
         return output
 
 
 # pylint: disable-next=too-few-public-methods, missing-class-docstring
 class Diff:
     @command_with_aliases(short_help='Shows the lockfile and current asset diff.')
+    @click.option('--no-cache', is_flag=True, help=NO_CACHE_HELPTEXT)
     @staticmethod
-    def diff():
+    def diff(no_cache):
         """Shows the diff between the lockfile's state and the project assets."""
-        config, lockfile = load_config_and_lockfile()
+        config, lockfile = load_config_and_lockfile(read_only=True)
 
         if config is None or lockfile is None:
             raise click.ClickException('Not an m3 project')
 
-        missing_assets, new_assets = evaluate_diff(config, lockfile)
+        cache = None if no_cache else HashCache()
+        diffs = evaluate_diff(config, lockfile, cache)
+        if cache is not None:
+            cache.save()
 
         # Display the diff correctly formatted
         output_builder = DiffOutputBuilder()
-        output = output_builder.build_diff_output(missing_assets, new_assets)
+        output = output_builder.build_diff_output(diffs)
         click.echo(output)
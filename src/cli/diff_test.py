@@ -1,6 +1,7 @@
 """Integration and functional testing for diff.py"""
 
 from src.cli.diff import evaluate_diff
+from src.util.enum import AssetType
 
 
 def test_diff(config_from_path, lockfile_from_path, current_dir):
@@ -8,6 +9,11 @@ def test_diff(config_from_path, lockfile_from_path, current_dir):
     and the project assets."""
     config = config_from_path('testdata/test_m3.json')
     lockfile = lockfile_from_path('testdata/test_m3.lock.json')
-    missing_assets, new_assets = evaluate_diff(config, lockfile)
-    assert missing_assets == ['c.zip']
-    assert new_assets == [current_dir / 'testdata/assets/mods/b.jar']
+    diffs = evaluate_diff(config, lockfile)
+    assert [entry.file_name for entry in diffs[AssetType.MOD].removed] == []
+    assert diffs[AssetType.MOD].added == [
+        current_dir / 'testdata/assets/mods/b.jar']
+    assert [entry.file_name for entry in
+            diffs[AssetType.TEXTURE_PACK].removed] == ['c.zip']
+    assert all(diff.renamed == [] and diff.modified == []
+               for diff in diffs.values())
@@ -1,38 +1,239 @@
 """export subcommand module"""
 
+import dataclasses
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import click
 
 from src.config.config import Config
-from src.lib.copy import copy
+from src.config.loader import load_config_and_lockfile
+from src.config.lockfile import Lockfile
+from src.curseforge.manifest import (MANIFEST_FILENAME, OVERRIDES_DIR,
+                                     Manifest)
+from src.lib.asset import CurseForgeAsset
+from src.lib.copy import MatcherUnion, PathMatcher, walk_matching
+from src.lib.export_cache import ExportCache
+from src.lib.overwrite import STAGING_PREFIX
+from src.lib.zip import ZipWriter, compress_bytes, compress_file
 from src.util.click import command_with_aliases
+from src.util.enum import Platform, Side
 
-TMP_DIR = '.tmp'
+CLIENT = 'client'
+SERVER = 'server'
+WORKERS_HELPTEXT = """
+Number of threads to compress files with, defaults to the number of CPUs.
+"""
+NO_CACHE_HELPTEXT = """
+Compress every file instead of reusing unchanged files from the last export.
+"""
 
 
-# pylint: disable-next=too-few-public-methods, missing-class-docstring
-class Export:
-    @command_with_aliases('ex')
-    @staticmethod
-    def export():
-        """Builds the modpack for export."""
+def get_export_paths(config: Config) -> dict[str, Path]:
+    """Returns the paths of the client and server archives for the given
+    config."""
+    output_dir = config.get_parent_dir() / config.output
+    base_name = '-'.join(part for part in [config.name, config.version] if part)
+    return {side: output_dir / f'{base_name}-{side}.zip'
+            for side in [CLIENT, SERVER]}
+
+
+def get_export_cache_path(config: Config) -> Path:
+    """Returns the path of the export cache manifest for the given config,
+    which is kept next to the archives so that it is cached along with them."""
+    path = get_export_paths(config)[CLIENT]
+    return path.with_name(f'.{path.stem.removesuffix(f"-{CLIENT}")}.cache.json')
+
 
+def _get_matchers(config: Config) -> dict[str, PathMatcher]:
+    """Returns the client and server matchers of the given config, which both
+    skip the output directory and staging directories."""
+    ignored = [f'{Path(config.output).as_posix()}/**', f'{STAGING_PREFIX}*/**']
+    return {
+        CLIENT: PathMatcher(config.client_includes,
+                            config.client_excludes + ignored),
+        SERVER: PathMatcher(config.server_includes,
+                            config.server_excludes + ignored),
+    }
 
-def export(config: Config):
+
+def get_platform_assets(config: Config, lockfile: Lockfile,
+                        matcher: PathMatcher) -> dict[str, CurseForgeAsset]:
+    """Returns the CurseForge assets in the lockfile that the given matcher
+    includes and that are not server only, keyed by their paths relative to
+    the project root."""
+    asset_dirs = config.paths.get()
+    assets = {}
+    for entry in lockfile.entries.values():
+        if not isinstance(entry.asset, CurseForgeAsset) \
+                or entry.asset.side == Side.SERVER:
+            continue
+        relative = (Path(asset_dirs[entry.asset_type]) /
+                    entry.file_name).as_posix()
+        if matcher.matches(relative):
+            assets[relative] = entry.asset
+    return assets
+
+
+def export(config: Config, workers: Optional[int] = None,
+           lockfile: Optional[Lockfile] = None,
+           use_cache: bool = True) -> dict[str, Path]:
     """Handles exporting the client and server pack to the designated output
     directory as specified by the given config, using the provided inclusion
     and exclusion globs.
 
+    The project is walked once for both packs and every matched file is
+    streamed straight into the archives that include it. Files are compressed
+    in parallel, and a file in both packs is only compressed once. Members are
+    written in sorted order with fixed timestamps, so exporting the same files
+    always produces byte for byte identical archives. Each archive is written
+    to a temporary file and renamed into place once complete.
+
+    Unless use_cache is False, the size, mtime and hash of every exported file
+    are kept in a manifest next to the archives, and the compressed data of
+    files that did not change since the last export is copied from the
+    previous archives instead of being compressed again.
+
+    If a lockfile is given for a CurseForge project, the client pack is a
+    CurseForge modpack instead: CurseForge assets from the lockfile are listed
+    in its manifest.json for the launcher to download, and every other file is
+    bundled under overrides/, and the config must set minecraft_version.
+
     Args:
       config: the m3 configuration to read
+      workers: the number of threads to compress files with, defaults to the
+        number of CPUs
+      lockfile: the lockfile of the project
+      use_cache: whether to reuse unchanged files from the last export
+
+    Returns:
+      A dict mapping 'client' and 'server' to the paths of their archives.
     """
-    minecraft_dir = config.get_path().parent
-    tmp_dir = config.output / TMP_DIR
-
-    # Build and write the client output
-    client_dir = tmp_dir / "client"
-    copy(minecraft_dir, client_dir,
-         config.client_includes, config.client_excludes)
-
-    # Build and write the server output
-    server_dir = tmp_dir / "server"
-    copy(minecraft_dir, server_dir,
-         config.server_includes, config.server_excludes)
+    root = config.get_parent_dir()
+    matchers = _get_matchers(config)
+    platform_assets = {}
+    manifest = None
+    if lockfile is not None and config.platform == Platform.CURSEFORGE:
+        if not config.minecraft_version:
+            raise click.ClickException(
+                'minecraft_version must be set in the config to export a '
+                + 'CurseForge modpack')
+        platform_assets = get_platform_assets(
+            config, lockfile, matchers[CLIENT])
+        manifest = Manifest.create(
+            config.name, config.version, config.authors,
+            config.minecraft_version, config.mod_loader,
+            list(platform_assets.values()))
+
+    def _get_names(relative: str) -> dict[str, str]:
+        """Returns the name of the file in each archive that includes it."""
+        names = {}
+        if matchers[CLIENT].matches(relative):
+            if manifest is None:
+                names[CLIENT] = relative
+            elif relative not in platform_assets:
+                names[CLIENT] = f'{OVERRIDES_DIR}/{relative}'
+        if matchers[SERVER].matches(relative):
+            names[SERVER] = relative
+        return names
+
+    files = []
+    for entry, relative in walk_matching(
+            root, MatcherUnion(list(matchers.values()))):
+        names = _get_names(relative)
+        if names:
+            files.append((relative, entry, names))
+    files.sort(key=lambda file_: file_[0])
+
+    paths = get_export_paths(config)
+    tmp_paths = {side: path.with_name(path.name + '.tmp')
+                 for side, path in paths.items()}
+    paths[CLIENT].parent.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    cache = ExportCache(get_export_cache_path(config), paths) \
+        if use_cache else None
+    handles = {}
+    try:
+        writers = {}
+        for side, tmp_path in tmp_paths.items():
+            handles[side] = open(tmp_path, 'wb')  # pylint: disable=consider-using-with
+            writers[side] = ZipWriter(handles[side])
+        if manifest is not None:
+            writers[CLIENT].add(compress_bytes(
+                manifest.json().encode('utf-8'), MANIFEST_FILENAME))
+        with ThreadPoolExecutor(workers) as executor:
+            # Bound the compressed files held in memory while keeping every
+            # worker busy, and write them out in order as they complete.
+            # Stored members, which include every jar, are copied from their
+            # files as they are written and take no memory while pending.
+            pending = deque()
+            for relative, entry, names in files:
+                future = executor.submit(
+                    cache.load_member, Path(entry.path), relative,
+                    entry.stat()) if cache is not None else executor.submit(
+                    compress_file, Path(entry.path), relative)
+                pending.append((relative, names, future))
+                if len(pending) >= 2 * workers:
+                    _write_member(*pending.popleft(), writers, cache)
+            while pending:
+                _write_member(*pending.popleft(), writers, cache)
+        for side, writer in writers.items():
+            writer.close()
+            handles.pop(side).close()
+            os.replace(tmp_paths[side], paths[side])
+        if cache is not None:
+            cache.save()
+    finally:
+        for handle in handles.values():
+            handle.close()
+        for tmp_path in tmp_paths.values():
+            tmp_path.unlink(missing_ok=True)
+    return paths
+
+
+def _write_member(relative: str, names: dict[str, str], future: Future,
+                  writers: dict[str, ZipWriter],
+                  cache: Optional[ExportCache]):
+    """Waits for a compressed file and writes it to every archive that
+    includes it under its name in that archive, recording where it was written
+    in the export cache if given."""
+    member = future.result()
+    for side, name in names.items():
+        offset = writers[side].add(dataclasses.replace(member, name=name))
+        if cache is not None:
+            cache.record(relative, side, offset, member)
+
+
+# pylint: disable-next=too-few-public-methods, missing-class-docstring
+class Export:
+    @command_with_aliases('ex')
+    @click.option('-w', '--workers', type=click.IntRange(min=1),
+                  help=WORKERS_HELPTEXT)
+    @click.option('--no-cache', is_flag=True, help=NO_CACHE_HELPTEXT)
+    @staticmethod
+    def export(workers, no_cache):
+        """Builds the modpack for export.
+
+        Writes the client and server packs as zip archives to the output
+        directory, using the include and exclude globs in the config.
+
+        For CurseForge projects, the client pack is a CurseForge modpack that
+        references the CurseForge assets in the lockfile instead of bundling
+        them.
+
+        Files that did not change since the last export are copied from the
+        previous archives instead of being compressed again.
+        """
+        config, lockfile = load_config_and_lockfile()
+        if config is None:
+            raise click.ClickException('Not an m3 project')
+        try:
+            paths = export(config, workers, lockfile, not no_cache)
+        except OSError as error:
+            raise click.ClickException(
+                f'An error occurred while exporting: {error}') from error
+        for side, path in paths.items():
+            click.echo(f'Exported {side} pack to {path}')
@@ -0,0 +1,168 @@
+"""Unit testing for export.py"""
+
+import json
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from click import ClickException
+from click.testing import CliRunner
+
+from src.cli.export import CLIENT, SERVER, Export, export
+from src.config.config import Config
+from src.config.lockfile import Lockfile
+from src.config.lockfile_entry import HashEntry, LockfileEntry
+from src.lib import export_cache
+from src.lib.asset import CurseForgeAsset
+from src.util.enum import AssetType, Platform, Side
+
+
+def make_project(tmp_path, create_file) -> Config:
+    """Creates a project with client only, server only and shared files in
+    the given directory and returns its config."""
+    create_file(tmp_path / 'config' / 'common.toml', 'common' * 100)
+    create_file(tmp_path / 'config' / 'client' / 'options.txt', 'client')
+    create_file(tmp_path / 'server.properties', 'server')
+    create_file(tmp_path / 'mods' / 'a.jar', 'jar contents')
+    create_file(tmp_path / 'mods' / 'notes.md', 'ignored')
+    return Config(
+        name='pack', version='1.0', _path=tmp_path / 'm3.json',
+        client_includes=['config/**', 'mods/*.jar'],
+        server_includes=['config/**', 'mods/*.jar', 'server.properties'],
+        server_excludes=['config/client/**'])
+
+
+def test_export(tmp_path, create_file):
+    """Tests that each pack contains its matched files in sorted order with
+    fixed timestamps."""
+    paths = export(make_project(tmp_path, create_file), workers=2)
+    assert paths[CLIENT] == tmp_path / 'output' / 'pack-1.0-client.zip'
+
+    with zipfile.ZipFile(paths[CLIENT]) as client:
+        assert client.testzip() is None
+        assert client.namelist() == [
+            'config/client/options.txt', 'config/common.toml', 'mods/a.jar']
+        assert client.read('config/common.toml') == b'common' * 100
+        assert client.getinfo('config/common.toml').compress_type == \
+            zipfile.ZIP_DEFLATED
+        # Jars are already compressed
+        assert client.getinfo('mods/a.jar').compress_type == \
+            zipfile.ZIP_STORED
+        assert {info.date_time for info in client.infolist()} == {
+            (1980, 1, 1, 0, 0, 0)}
+    with zipfile.ZipFile(paths[SERVER]) as server:
+        assert server.namelist() == [
+            'config/common.toml', 'mods/a.jar', 'server.properties']
+    assert sorted(p.name for p in paths[CLIENT].parent.iterdir()) == [
+        '.pack-1.0.cache.json', 'pack-1.0-client.zip', 'pack-1.0-server.zip']
+
+
+def test_export_reproducible(tmp_path, create_file):
+    """Tests that exporting the same files twice produces identical
+    archives, and that previous exports are not included."""
+    config = make_project(tmp_path, create_file)
+    first = {side: path.read_bytes()
+             for side, path in export(config, workers=1).items()}
+    (tmp_path / 'config' / 'common.toml').touch()
+    second = {side: path.read_bytes()
+              for side, path in export(config, workers=4).items()}
+    assert first == second
+
+
+def test_export_cache(tmp_path, create_file):
+    """Tests that only changed files are compressed again, and that the
+    archives match an export without the cache."""
+    config = make_project(tmp_path, create_file)
+    export(config, workers=2)
+    create_file(tmp_path / 'config' / 'client' / 'options.txt', 'changed')
+    # Files that were touched but have the same contents are reused too
+    (tmp_path / 'mods' / 'a.jar').touch()
+
+    with patch.object(export_cache, 'compress_file',
+                      wraps=export_cache.compress_file) as mock_compress:
+        paths = export(config, workers=2)
+    assert [call.args[1] for call in mock_compress.call_args_list] == [
+        'config/client/options.txt']
+    cached = {side: path.read_bytes() for side, path in paths.items()}
+    uncached = {side: path.read_bytes() for side, path in
+                export(config, workers=2, use_cache=False).items()}
+    assert cached == uncached
+    with zipfile.ZipFile(paths[CLIENT]) as client:
+        assert client.testzip() is None
+        assert client.read('config/client/options.txt') == b'changed'
+
+
+def test_export_cache_modified_archive(tmp_path, create_file):
+    """Tests that nothing is reused from archives that were modified after
+    the export."""
+    config = make_project(tmp_path, create_file)
+    paths = export(config, workers=1)
+    paths[CLIENT].write_bytes(b'corrupted')
+    paths[SERVER].unlink()
+
+    with patch.object(export_cache, 'compress_file',
+                      wraps=export_cache.compress_file) as mock_compress:
+        paths = export(config, workers=1)
+    assert mock_compress.call_count == 4
+    with zipfile.ZipFile(paths[CLIENT]) as client:
+        assert client.testzip() is None
+
+
+def test_export_command(tmp_path, create_file, monkeypatch):
+    """Tests that the export command writes both packs."""
+    make_project(tmp_path, create_file).write()
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(Export.export, ['--workers', '2'])
+    assert result.exit_code == 0, result.output
+    assert (tmp_path / 'output' / 'pack-1.0-client.zip').is_file()
+    assert (tmp_path / 'output' / 'pack-1.0-server.zip').is_file()
+
+
+def make_curseforge_lockfile(tmp_path) -> Lockfile:
+    """Returns a lockfile with a CurseForge asset for mods/a.jar."""
+    asset = CurseForgeAsset(
+        name='a-jar', display_name='a.jar', file_name='a.jar',
+        platform=Platform.CURSEFORGE, asset_type=AssetType.MOD,
+        side=Side.BOTH, cdn_link='https://cdn/a.jar', dependencies=[],
+        project_id=71, file_id=17)
+    return Lockfile(entries={'a.jar': LockfileEntry(
+        name='a-jar', display_name='a.jar', file_name='a.jar',
+        hash=HashEntry(sha1=None, sha512=None, md5=None),
+        platform=Platform.CURSEFORGE, asset_type=AssetType.MOD,
+        asset=asset)}, _path=tmp_path / 'm3.lock.json')
+
+
+def test_export_curseforge_manifest(tmp_path, create_file):
+    """Tests that the client pack of a CurseForge project references
+    CurseForge assets in its manifest and bundles other files as
+    overrides."""
+    config = make_project(tmp_path, create_file)
+    config.minecraft_version = '1.20.1'
+    config.mod_loader = 'forge-47.2.0'
+    create_file(tmp_path / 'mods' / 'custom.jar', 'not on CurseForge')
+    lockfile = make_curseforge_lockfile(tmp_path)
+
+    paths = export(config, lockfile=lockfile)
+    with zipfile.ZipFile(paths[CLIENT]) as client:
+        assert client.namelist() == [
+            'manifest.json', 'overrides/config/client/options.txt',
+            'overrides/config/common.toml', 'overrides/mods/custom.jar']
+        manifest = json.loads(client.read('manifest.json'))
+    assert manifest['minecraft'] == {
+        'version': '1.20.1',
+        'modLoaders': [{'id': 'forge-47.2.0', 'primary': True}]}
+    assert manifest['files'] == [
+        {'projectID': 71, 'fileID': 17, 'required': True}]
+    assert manifest['overrides'] == 'overrides'
+    # Servers cannot download from a manifest, so they keep every jar
+    with zipfile.ZipFile(paths[SERVER]) as server:
+        assert 'mods/a.jar' in server.namelist()
+
+
+def test_export_curseforge_no_minecraft_version(tmp_path, create_file):
+    """Tests that a CurseForge modpack is not exported without a Minecraft
+    version, which launchers require in its manifest."""
+    config = make_project(tmp_path, create_file)
+    with pytest.raises(ClickException, match='minecraft_version'):
+        export(config, lockfile=make_curseforge_lockfile(tmp_path))
+    assert not (tmp_path / 'output').exists()
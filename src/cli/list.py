@@ -128,7 +128,7 @@ class List:
 
         Valid asset types: mod, resource_pack, shader_pack, texture_pack
         """
-        config, lockfile = load_config_and_lockfile()
+        config, lockfile = load_config_and_lockfile(read_only=True)
 
         if config is None or lockfile is None:
             raise click.ClickException('Not an m3 project')
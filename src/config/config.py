@@ -11,6 +11,7 @@ from pydantic.dataclasses import dataclass
 
 from src.lib.dataclasses import PathField, dataclass_json, get_field_names
 from src.util.enum import AssetType, Platform
+from src.util.files import write_if_changed
 from src.util.paths import resolve_relative_path, walk_up_search
 
 CONFIG_FILENAME = "m3.json"
@@ -51,6 +52,10 @@ class Config:
     platform: Platform = field(default=Platform.CURSEFORGE)
     # Authors of the project
     authors: list[str] = field(default_factory=list)
+    # The Minecraft version and mod loader ID (e.g. forge-47.2.0) of the
+    # project, used to generate the CurseForge modpack manifest
+    minecraft_version: str = ""
+    mod_loader: str = ""
 
     # Paths to assets that m3 can manage relative to the config file itself
     paths: ProjectPaths = field(default_factory=ProjectPaths)
@@ -103,18 +108,21 @@ class Config:
         """Returns parent dir of the config file."""
         return self._path.parent
 
-    def write(self, path: Optional[Union[Path, str]] = None):
-        """Writes the state of this config object to disk.
+    def write(self, path: Optional[Union[Path, str]] = None) -> bool:
+        """Writes the state of this config object to disk. The file is
+        replaced atomically, and not at all if it would not change.
 
         Args:
             path: An optional path argument to write the config to, otherwise
                 writes to the default _path member stored in the config.
+
+        Returns:
+            True if the file was written, False if it was unchanged.
         """
-        with open(path if path is not None else self._path, "w",
-                  encoding="utf-8") as f:
-            # This is added by the @dataclass_json decorator
-            # pylint: disable-next=no-member
-            f.write(self.json())
+        # This is added by the @dataclass_json decorator
+        # pylint: disable-next=no-member
+        return write_if_changed(path if path is not None else self._path,
+                                self.json().encode('utf-8'))
 
     def get_asset_paths(self) -> dict[AssetType, Path]:
         """Gets the absolute paths for assets defined in config file."""
@@ -38,6 +38,8 @@ def test_config_read_write(config_from_path, current_dir, tmp_path, read_file):
         version="test",
         platform=Platform.CURSEFORGE,
         authors=["test-author", "test-author2"],
+        minecraft_version="1.20.1",
+        mod_loader="forge-47.2.0",
         paths=ProjectPaths(
             mods=Path("mods"),
             resourcepacks=Path("custom_subdirectory/resourcepacks"),
@@ -95,6 +97,8 @@ def test_config_write_read(tmp_path, config_from_path):
         "version": "test",
         "platform": "modrinth",
         "authors": ["author1", "author2"],
+        "minecraft_version": "",
+        "mod_loader": "",
         "paths": {
             "mods": "mods",
             "resourcepacks": "subdir/resourcepacks",
@@ -2,18 +2,38 @@
 
 from typing import Optional
 
+import click
+
 from src.config.config import Config
 from src.config.lockfile import Lockfile
+from src.config.lockfile_cache import load_lockfile
+from src.lib.overwrite import recover_overwrites
+from src.util.profile import PROFILER
 
 
-def load_config_and_lockfile() -> tuple[Optional[Config], Optional[Lockfile]]:
+def load_config_and_lockfile(
+        read_only: bool = False) -> tuple[Optional[Config], Optional[Lockfile]]:
     """Attempts to load the config and lockfile, surfacing any errors.
 
+    Any asset directory left mid-overwrite by an interrupted m3 command is
+    recovered first.
+
+    Args:
+      read_only: whether the command does not modify the lockfile, in which
+        case it is loaded from its binary cache when possible
+
     Returns:
       a two-tuple containing the config and lockfile, or Nones if not found
     """
-    config = Config.get_config()
-    if config is None:
-        return (None, None)
-    lockfile = Lockfile.create(config.get_parent_dir())
+    with PROFILER.phase('config'):
+        config = Config.get_config()
+        if config is None:
+            return (None, None)
+        for path, result in recover_overwrites(
+                config.get_asset_paths().values()).items():
+            click.echo(f'Recovered interrupted changes to {path}: {result}',
+                       err=True)
+    with PROFILER.phase('lockfile'):
+        lockfile = load_lockfile(config.get_parent_dir()) if read_only \
+            else Lockfile.create(config.get_parent_dir())
     return (config, lockfile)
@@ -7,6 +7,7 @@ from dataclasses import field
 from pathlib import Path
 from typing import Optional, Self, Union
 
+import orjson
 from click.exceptions import ClickException
 from pydantic.dataclasses import dataclass
 
@@ -15,19 +16,106 @@ from src.lib.dataclasses import PathField, dataclass_json
 from src.lib.multikey_dict import MultiKeyDict
 from src.util.dicts import reindex
 from src.util.enum import AssetType, HashAlg
+from src.util.files import write_if_changed
 
 LOCKFILE_FILENAME = 'm3.lock.json'
 HASH_ALGS = [HashAlg.SHA1, HashAlg.SHA512, HashAlg.MD5]
+# The order of the hashes in the multikeys of lockfile entries.
+SORTED_HASH_ALGS = sorted(HASH_ALGS, key=lambda member: member.value)
 DEFAULT_ALG = HashAlg.SHA512
+# Attribute names of the hashes in SORTED_HASH_ALGS on HashEntry.
+_SORTED_HASH_FIELDS = [alg.value for alg in SORTED_HASH_ALGS]
+
+
+def get_entry_multikey(entry: LockfileEntry) -> tuple:
+    """Returns the multikey of a lockfile entry, which is its file name
+    followed by its hashes in the order of SORTED_HASH_ALGS."""
+    keys = [entry.file_name]
+    for alg in SORTED_HASH_ALGS:
+        try:
+            keys.append(entry.hash[alg])
+        except AttributeError as error:
+            raise AttributeError(
+                f'Expected to find hashing alg {alg}' +
+                ' as attribute of HashEntry, not found') from error
+    return tuple(keys)
 
 
 @dataclass_json
 @dataclass
 class Lockfile:
-    """Dataclass wrapper for handling m3's lockfile"""
+    """Dataclass wrapper for handling m3's lockfile
+
+    Entries are keyed by file name. Indexes of the entries by internal name,
+    platform identifier and hash are built when the lockfile is created, and
+    the multikey dicts of the entries of each asset type are built on first
+    use. All of them are kept up to date by add_entry and remove_entry, so
+    entries must only be added and removed through those methods.
+    """
     entries: dict[str, LockfileEntry] = field(default_factory=dict)
     _path: Path = PathField(Path(os.getcwd()) / LOCKFILE_FILENAME)
 
+    def __post_init__(self):
+        # Attributes starting with an underscore are not serialized by orjson.
+        # Multikey dicts are keyed by asset type, or None for every entry.
+        self._multikey_dicts: dict[Optional[AssetType], MultiKeyDict] = {}
+        self._entries_by_name = {}
+        self._entries_by_identifier = {}
+        self._entries_by_hash = {}
+        for entry in self.entries.values():
+            self._index_entry(entry)
+
+    def _index_entry(self, entry: LockfileEntry):
+        self._entries_by_name[entry.name] = entry
+        identifier = _get_asset_identifier(entry)
+        if identifier is not None:
+            self._entries_by_identifier[identifier] = entry
+        for name in _SORTED_HASH_FIELDS:
+            hash_ = getattr(entry.hash, name)
+            if hash_:
+                self._entries_by_hash[hash_] = entry
+        self._update_multikey_dicts(entry, add=True)
+
+    def _unindex_entry(self, entry: LockfileEntry):
+        self._entries_by_name.pop(entry.name, None)
+        identifier = _get_asset_identifier(entry)
+        if identifier is not None:
+            self._entries_by_identifier.pop(identifier, None)
+        for name in _SORTED_HASH_FIELDS:
+            hash_ = getattr(entry.hash, name)
+            if hash_:
+                self._entries_by_hash.pop(hash_, None)
+        self._update_multikey_dicts(entry, add=False)
+
+    def _update_multikey_dicts(self, entry: LockfileEntry, add: bool):
+        """Adds the given entry to, or removes it from, the multikey dicts that
+        were built and hold entries of its type."""
+        if not self._multikey_dicts:
+            return
+        try:
+            multikey = get_entry_multikey(entry)
+            for key in (None, entry.asset_type):
+                if key not in self._multikey_dicts:
+                    continue
+                if add:
+                    self._multikey_dicts[key].add(multikey, entry)
+                else:
+                    self._multikey_dicts[key].remove(multikey)
+        except (KeyError, ValueError):
+            # The entries no longer have unique keys, which is raised when the
+            # dicts are rebuilt by the next lookup.
+            self._multikey_dicts.clear()
+
+    def _get_multikey_dict(
+            self, asset_type: Optional[AssetType]) -> MultiKeyDict:
+        if asset_type not in self._multikey_dicts:
+            multikey_dict = MultiKeyDict(len(HASH_ALGS) + 1)
+            for entry in self.entries.values():
+                if asset_type is None or entry.asset_type == asset_type:
+                    multikey_dict.add(get_entry_multikey(entry), entry)
+            self._multikey_dicts[asset_type] = multikey_dict
+        return self._multikey_dicts[asset_type]
+
     @staticmethod
     def create(path: Path) -> Optional[Self]:
         """Factory method that attempts to construct a lockfile dataclass using
@@ -44,9 +132,23 @@ class Lockfile:
         filepath = path / LOCKFILE_FILENAME
         if not filepath.exists():
             return None
+        return Lockfile.loads(filepath.read_bytes(), filepath)
+
+    @staticmethod
+    def loads(contents: bytes, filepath: Path) -> Self:
+        """Parses and validates the contents of the lockfile at the given
+        path.
+
+        Args:
+          contents: The contents of the lockfile
+          filepath: The path the lockfile was read from
+
+        Returns:
+          A Lockfile dataclass instance, or raises a ClickException if the
+          lockfile is invalid.
+        """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return Lockfile(**json.load(f), _path=filepath)
+            return Lockfile(**orjson.loads(contents), _path=filepath)
         except json.decoder.JSONDecodeError as e:
             raise ClickException(
                 f'Found malformed lockfile at {filepath}') from e
@@ -58,18 +160,29 @@ class Lockfile:
         """Returns the path of the lockfile."""
         return self._path
 
-    def write(self, path: Optional[Union[Path, str]] = None):
+    def write(self, path: Optional[Union[Path, str]] = None) -> bool:
         """Writes the state of this lockfile object to the file.
 
+        Entries are written sorted by file name, so the same entries always
+        produce the same file regardless of the order they were added in. The
+        file is replaced atomically, and not at all if it would not change.
+
         Args:
             path: An optional path argument to write the lockfile to, otherwise
             writes to the default _path member stored in the lockfile.
+
+        Returns:
+            True if the file was written, False if it was unchanged.
         """
-        with open(path if path is not None else self._path, "w",
-                  encoding="utf-8") as f:
-            # This is added by the @dataclass_json decorator
-            # pylint: disable-next=no-member
-            f.write(self.json())
+        sorted_entries = sorted(self.entries.items())
+        if list(self.entries) != [key for key, _ in sorted_entries]:
+            self.entries.clear()
+            self.entries.update(sorted_entries)
+        # This is added by the @dataclass_json decorator
+        # pylint: disable-next=no-member
+        return write_if_changed(
+            path if path is not None else self._path,
+            self.json().encode('utf-8'))
 
     def add_entry(self, entry: LockfileEntry):
         """Adds a specified entry to the lockfile object.
@@ -77,7 +190,11 @@ class Lockfile:
         If the object exists, updates the existing entry in the lockfile with a
         new LockfileEntry object.
         """
+        existing = self.entries.get(entry.file_name)
+        if existing is not None:
+            self._unindex_entry(existing)
         self.entries[entry.file_name] = entry
+        self._index_entry(entry)
 
     def remove_entry(self, entry: LockfileEntry):
         """Removes a given entry from the lockfile object.
@@ -85,13 +202,35 @@ class Lockfile:
         Returns the removed entry, or None if entry was not found.
         """
         if self.entries.get(entry.file_name) is not None:
-            return self.entries.pop(entry.file_name)
+            removed = self.entries.pop(entry.file_name)
+            self._unindex_entry(removed)
+            return removed
         return None
 
     def get_entry(self, entry: LockfileEntry):
         """Gets a specified entry from the lockfile object."""
         return self.entries.get(entry.file_name)
 
+    def get_entry_by_name(self, name: str) -> Optional[LockfileEntry]:
+        """Returns the entry with the given internal name, or None."""
+        return self._entries_by_name.get(name)
+
+    def get_entry_by_file_name(
+            self, file_name: str) -> Optional[LockfileEntry]:
+        """Returns the entry with the given file name, or None."""
+        return self.entries.get(file_name)
+
+    def get_entry_by_asset_identifier(
+            self, project_id: Union[str, int],
+            file_id: Union[str, int]) -> Optional[LockfileEntry]:
+        """Returns the entry of the platform asset with the given project and
+        file IDs, or None."""
+        return self._entries_by_identifier.get((project_id, file_id))
+
+    def get_entry_by_hash(self, hash_: str) -> Optional[LockfileEntry]:
+        """Returns the entry with the given hash of any algorithm, or None."""
+        return self._entries_by_hash.get(hash_)
+
     def reindex_lockfile_entries(
             self, entries: list[LockfileEntry], f_new_key: Callable
     ):
@@ -117,6 +256,8 @@ class Lockfile:
     def get_assets_by_type(self, asset_type: AssetType) -> MultiKeyDict:
         """Returns a multikey dict containing all entries of a given asset type.
 
+        The returned dict is the lockfile's index and must not be modified.
+
         Args:
             asset_type: The asset type to filter entries by
 
@@ -124,43 +265,30 @@ class Lockfile:
             A multikey dict keyed by the asset name and hashes, containing all
             entries of the given asset type.
         """
-        multikey_dict = MultiKeyDict(len(HASH_ALGS) + 1)
-        for entry in self.entries.values():
-            if entry.asset_type == asset_type:
-                keys = [entry.file_name]
-                for alg in sorted(HASH_ALGS, key=lambda member: member.value):
-                    try:
-                        keys.append(entry.hash[alg])
-                    except AttributeError as error:
-                        raise AttributeError(
-                            f'Expected to find hashing alg {alg}' +
-                            ' as attribute of HashEntry, not found') from error
-                multikey = tuple(keys)
-                multikey_dict.add(multikey, entry)
-        return multikey_dict
+        return self._get_multikey_dict(asset_type)
 
     def create_multikey_dict_for_lockfile(self) -> MultiKeyDict:
-        """Creates a multikey dict containing the lockfile entries, where the
+        """Returns a multikey dict containing the lockfile entries, where the
         multikey is the name of the asset and the hashes of the asset file.
 
         Note that the order of the hash algorithm matters and must be
-        consistent.
+        consistent. The returned dict is the lockfile's index and must not be
+        modified.
 
         Returns:
             A multikey dict where the multikey is the name of the asset and the
             hashes of the asset file, using the list of supported hash
             algorithms.
         """
-        multikey_dict = MultiKeyDict(len(HASH_ALGS) + 1)
-        for entry in self.entries.values():
-            keys = [entry.file_name]
-            for alg in sorted(HASH_ALGS, key=lambda member: member.value):
-                try:
-                    keys.append(entry.hash[alg])
-                except AttributeError as error:
-                    raise AttributeError(
-                        f'Expected to find hashing alg {alg}' +
-                        ' as attribute of HashEntry, not found') from error
-            multikey = tuple(keys)
-            multikey_dict.add(multikey, entry)
-        return multikey_dict
+        return self._get_multikey_dict(None)
+
+
+def _get_asset_identifier(
+        entry: LockfileEntry) -> Optional[tuple[Union[str, int],
+                                                Union[str, int]]]:
+    """Returns the platform identifier of the entry's asset, or None if the
+    asset is not from a platform."""
+    try:
+        return entry.asset.get_asset_identifier()
+    except NotImplementedError:
+        return None
@@ -0,0 +1,83 @@
+"""Binary cache of parsed lockfiles for read-only commands."""
+
+import dataclasses
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+from src.config.lockfile import LOCKFILE_FILENAME, Lockfile
+from src.config.lockfile_entry import HashEntry, LockfileEntry
+from src.lib.asset import Asset, CurseForgeAsset, ModrinthAsset
+from src.util.enum import AssetType
+from src.util.files import atomic_write
+from src.util.paths import get_m3_dir
+
+LOCKFILE_CACHE_DIR = 'cache/lockfiles'
+# Bumped when the cached data changes in a way the field names do not show.
+LOCKFILE_CACHE_VERSION = 1
+
+
+def _get_schema() -> tuple:
+    """Returns the field names of every class in a cached lockfile, so that
+    caches written by a version of m3 with different classes are ignored."""
+    return (LOCKFILE_CACHE_VERSION,) + tuple(
+        (cls.__name__, tuple(field.name for field in dataclasses.fields(cls)))
+        for cls in (Lockfile, LockfileEntry, HashEntry, Asset,
+                    CurseForgeAsset, ModrinthAsset))
+
+
+def _get_cache_path(lockfile_path: Path) -> Path:
+    """Returns the path of the cache of the given lockfile, which is kept in
+    m3's per-user state directory rather than next to the lockfile, since
+    loading a pickle from a shared project could run arbitrary code."""
+    key = hashlib.sha1(
+        os.path.abspath(lockfile_path).encode('utf-8')).hexdigest()
+    return get_m3_dir(LOCKFILE_CACHE_DIR) / f'{key}.pickle'
+
+
+def load_lockfile(path: Path) -> Optional[Lockfile]:
+    """Loads the lockfile in the given directory like Lockfile.create, from
+    the cache if the lockfile has not changed since it was cached.
+
+    The cache holds the parsed entries along with the multikey dicts of every
+    asset type, and is keyed on the size, mtime and SHA1 hash of the lockfile.
+    Unpickling it skips parsing and validating the JSON. Lockfiles loaded from
+    the cache are meant for commands that do not modify the lockfile, which
+    must load it with Lockfile.create instead.
+
+    Args:
+        path: The directory to look for a lockfile in
+
+    Returns:
+        A Lockfile instance, or None if there was no lockfile found.
+    """
+    lockfile_path = path / LOCKFILE_FILENAME
+    try:
+        with open(lockfile_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            contents = f.read()
+    except FileNotFoundError:
+        return None
+    key = (_get_schema(), stat.st_size, stat.st_mtime_ns,
+           hashlib.sha1(contents).hexdigest())
+    cache_path = _get_cache_path(lockfile_path)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached_key, lockfile = pickle.load(f)
+        if cached_key == key:
+            return lockfile
+    # Any corrupt or outdated cache is rebuilt
+    except Exception:  # pylint: disable=broad-exception-caught
+        pass
+    lockfile = Lockfile.loads(contents, lockfile_path)
+    try:
+        for asset_type in AssetType:
+            lockfile.get_assets_by_type(asset_type)
+    except ValueError:
+        # Entries with duplicate keys are reported by the command
+        return lockfile
+    atomic_write(cache_path, pickle.dumps(
+        (key, lockfile), protocol=pickle.HIGHEST_PROTOCOL))
+    return lockfile
@@ -0,0 +1,44 @@
+"""Unit testing for lockfile_cache.py"""
+
+from unittest.mock import patch
+
+from src.config.lockfile import LOCKFILE_FILENAME, Lockfile
+from src.config.lockfile_cache import _get_cache_path, load_lockfile
+from src.util.enum import AssetType
+
+
+def test_load_lockfile_cached(lockfile_from_path, tmp_path):
+    """Tests that an unchanged lockfile is loaded from the cache with its
+    multikey dicts, and that changed lockfiles are parsed again."""
+    expected = lockfile_from_path("testdata/test_m3.lock.json")
+    lockfile_path = tmp_path / LOCKFILE_FILENAME
+    expected.write(lockfile_path)
+
+    with patch.object(Lockfile, 'loads', wraps=Lockfile.loads) as mock_loads:
+        first = load_lockfile(tmp_path)
+        cached = load_lockfile(tmp_path)
+        assert mock_loads.call_count == 1
+    assert first == cached
+    assert cached.entries == expected.entries
+    assert cached.get_assets_by_type(AssetType.MOD).get("sha1-hash") is \
+        cached.entries["test-mod"]
+
+    expected.remove_entry(expected.entries["test-mod"])
+    expected.write(lockfile_path)
+    with patch.object(Lockfile, 'loads', wraps=Lockfile.loads) as mock_loads:
+        assert load_lockfile(tmp_path).entries == expected.entries
+        assert mock_loads.call_count == 1
+
+
+def test_load_lockfile_corrupt_cache(lockfile_from_path, tmp_path):
+    """Tests that a corrupt cache is rebuilt."""
+    expected = lockfile_from_path("testdata/test_m3.lock.json")
+    expected.write(tmp_path / LOCKFILE_FILENAME)
+    _get_cache_path(tmp_path / LOCKFILE_FILENAME).write_bytes(b'corrupt')
+    assert load_lockfile(tmp_path).entries == expected.entries
+    assert load_lockfile(tmp_path).entries == expected.entries
+
+
+def test_load_lockfile_missing(tmp_path):
+    """Tests that None is returned without a lockfile."""
+    assert load_lockfile(tmp_path) is None
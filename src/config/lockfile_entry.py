@@ -8,10 +8,10 @@ from pydantic.dataclasses import dataclass
 
 from src.api.dataclasses.cf_response_objects import (CF_HASH_ALG_MAP, CFFile,
                                                      CFMod)
-from src.lib.asset import Asset, CurseForgeAsset
+from src.lib.asset import Asset, CurseForgeAsset, ModrinthAsset
 from src.lib.dataclasses import dataclass_json
 from src.util.enum import AssetType, HashAlg, Platform
-from src.util.hash import hash_file
+from src.util.hash import hash_file, hash_file_multi
 
 
 @dataclass_json
@@ -42,13 +42,30 @@ class HashEntry:
 
         return HashEntry(**file_hashes, sha512=None)
 
-    def populate_hashes(self, filename: Path):
+    def populate_hashes(
+            self, filename: Path,
+            known_hashes: Optional[dict[HashAlg, str]] = None):
         """Populates missing HashEntry fields by computing the missing hashes
-        for a given file."""
+        for a given file.
+
+        Args:
+            filename: The path to the file to hash
+            known_hashes: Optional hashes already computed for the file, such
+                as the ones returned by download_file. The file is only read if
+                a missing hash is not found here.
+        """
+        missing_algs = []
         for alg, hash_ in self.__dict__.items():
             if not hash_:
                 missing_alg = HashAlg(alg)
-                setattr(self, alg, hash_file(filename, missing_alg))
+                if known_hashes and known_hashes.get(missing_alg):
+                    setattr(self, alg, known_hashes[missing_alg])
+                else:
+                    missing_algs.append(missing_alg)
+        if len(missing_algs) > 0:
+            # Compute every remaining hash with a single read of the file
+            for alg, hash_ in hash_file_multi(filename, missing_algs).items():
+                setattr(self, alg.value, hash_)
 
     def get_saved_hash(self) -> Union[tuple[HashAlg, str], None]:
         """Returns the first hash found with the corresponding
@@ -91,7 +108,9 @@ class LockfileEntry:
     hash: HashEntry
     platform: Platform
     asset_type: AssetType
-    asset: Asset
+    # Platform assets are listed first so that their identifiers are kept when
+    # the lockfile is loaded.
+    asset: Union[CurseForgeAsset, ModrinthAsset, Asset]
 
     @staticmethod
     def create_lockfile_entry_from_resp_obj(
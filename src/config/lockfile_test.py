@@ -2,9 +2,12 @@
 
 import json
 
+import pytest
+from click import ClickException
+
 from src.config.lockfile import LOCKFILE_FILENAME, Lockfile
 from src.config.lockfile_entry import HashEntry, LockfileEntry
-from src.lib.asset import Asset
+from src.lib.asset import Asset, CurseForgeAsset
 from src.lib.multikey_dict import MultiKeyDict
 from src.util.enum import AssetType, Platform, Side
 
@@ -251,3 +254,69 @@ def test_lockfile_multikey_dict_creation(lockfile_from_path):
         )
     ))
     assert multikey_dict == ref_dict
+
+
+def test_lockfile_indexes(lockfile_from_path):
+    """Tests that entries can be looked up by each index and that the indexes
+    follow added and removed entries."""
+    lockfile = lockfile_from_path("testdata/test_m3.lock.json")
+    mod = lockfile.get_entry_by_name("test-mod")
+    assert lockfile.get_entry_by_file_name("test-mod") is mod
+    assert lockfile.get_entry_by_hash("md5-hash") is mod
+    mods = lockfile.get_assets_by_type(AssetType.MOD)
+    assert mods.get("sha512-hash") is mod
+
+    entry = LockfileEntry(
+        name="test-cf-mod", display_name="test-cf-mod",
+        file_name="test-cf-mod.jar",
+        hash=HashEntry(sha1="sha1-cf", sha512="sha512-cf", md5="md5-cf"),
+        platform=Platform.CURSEFORGE, asset_type=AssetType.MOD,
+        asset=CurseForgeAsset(
+            name="test-cf-mod", display_name="test-cf-mod",
+            file_name="test-cf-mod.jar", platform=Platform.CURSEFORGE,
+            asset_type=AssetType.MOD, side=Side.BOTH, cdn_link="cdn-link",
+            dependencies=[], project_id=1, file_id=2))
+    lockfile.add_entry(entry)
+    assert lockfile.get_entry_by_asset_identifier(1, 2) is entry
+    assert lockfile.get_assets_by_type(AssetType.MOD) is mods
+    assert mods.get("test-cf-mod.jar") is entry
+    assert len(lockfile.create_multikey_dict_for_lockfile()) == 3
+
+    lockfile.remove_entry(mod)
+    assert lockfile.get_entry_by_name("test-mod") is None
+    assert lockfile.get_entry_by_hash("md5-hash") is None
+    assert mods.get("test-mod") is None
+    assert len(mods) == 1
+    assert lockfile == Lockfile(
+        entries=dict(lockfile.entries), _path=lockfile.get_path())
+
+
+def test_lockfile_indexes_not_serialized(tmp_path):
+    """Tests that indexes are not written to the lockfile."""
+    lockfile = Lockfile(_path=tmp_path / LOCKFILE_FILENAME)
+    lockfile.get_assets_by_type(AssetType.MOD)
+    assert json.loads(lockfile.json()) == {"entries": {}}
+
+
+def test_lockfile_create_malformed(tmp_path):
+    """Tests that a malformed lockfile raises a ClickException."""
+    (tmp_path / LOCKFILE_FILENAME).write_text('{"entries": ', encoding='utf-8')
+    with pytest.raises(ClickException, match='malformed lockfile'):
+        Lockfile.create(tmp_path)
+
+
+def test_lockfile_write_unchanged(lockfile_from_path, tmp_path):
+    """Tests that writing a lockfile sorts its entries by file name and does
+    not rewrite the file if it would not change."""
+    lockfile = lockfile_from_path("testdata/test_m3.lock.json")
+    lockfile_path = tmp_path / LOCKFILE_FILENAME
+    entries = list(reversed(lockfile.entries.items()))
+    lockfile.entries.clear()
+    lockfile.entries.update(entries)
+    assert lockfile.write(lockfile_path)
+    assert list(json.loads(lockfile_path.read_bytes())["entries"]) == \
+        sorted(key for key, _ in entries)
+    stat = lockfile_path.stat()
+    assert not lockfile.write(lockfile_path)
+    assert lockfile_path.stat().st_ino == stat.st_ino
+    assert lockfile_path.stat().st_mtime_ns == stat.st_mtime_ns
@@ -2,12 +2,14 @@
 
 import json
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
 
 import pytest
 
 from src.config.lockfile import Lockfile
-from src.config.lockfile_entry import LockfileEntry
+from src.config.lockfile_entry import HashEntry, LockfileEntry
+from src.lib.asset import CurseForgeAsset
+from src.util.enum import AssetType, Platform, Side
 
 
 @pytest.fixture
@@ -30,3 +32,31 @@ def lockfile_entry_from_path(current_dir) -> Callable[[Path], LockfileEntry]:
         with open(fullpath, 'r', encoding='utf-8') as f:
             return LockfileEntry(**json.load(f))
     return _lockfile_entry_from_path
+
+
+@pytest.fixture
+def make_lockfile_entry() -> Callable[..., LockfileEntry]:
+    """Test fixture that returns a helper function to create a LockfileEntry
+    for a CurseForge mod with the given file name and placeholder metadata.
+
+    The hashes of the entry are derived from hash_ if given, and are unset
+    otherwise. The CDN link defaults to one named after the file.
+    """
+    def _make_lockfile_entry(
+            file_name: str, cdn_link: Optional[str] = None,
+            hash_: Optional[str] = None, project_id: int = 0,
+            file_id: int = 0) -> LockfileEntry:
+        asset = CurseForgeAsset(
+            name=file_name.replace('.', '-'), display_name=file_name,
+            file_name=file_name, platform=Platform.CURSEFORGE,
+            asset_type=AssetType.MOD, side=Side.BOTH,
+            cdn_link=cdn_link or f'https://cdn/{file_name}',
+            dependencies=[], project_id=project_id, file_id=file_id)
+        return LockfileEntry(
+            name=asset.name, display_name=asset.display_name,
+            file_name=asset.file_name,
+            hash=HashEntry(sha1=f'sha1-{hash_}', sha512=f'sha512-{hash_}',
+                           md5=f'md5-{hash_}') if hash_ is not None
+            else HashEntry(sha1=None, sha512=None, md5=None),
+            platform=asset.platform, asset_type=asset.asset_type, asset=asset)
+    return _make_lockfile_entry
@@ -1,46 +1,82 @@
 """Dataclass representing the Curseforge manifest.json file."""
 
+from dataclasses import field
+
 from pydantic.dataclasses import dataclass
 
+from src.lib.asset import CurseForgeAsset
+from src.lib.dataclasses import dataclass_json
+
+MANIFEST_FILENAME = 'manifest.json'
+OVERRIDES_DIR = 'overrides'
+
 
 @dataclass
 class Files:
     """files subfield."""
     # pylint: disable=invalid-name
-    fileID: int
-    # pylint: disable=invalid-name
     projectID: int
-    required: bool
+    # pylint: disable=invalid-name
+    fileID: int
+    required: bool = True
 
 
 @dataclass
 class Loader:
     """modloaders subfield"""
     id: str
-    primary: bool
+    primary: bool = True
 
 
 @dataclass
 class Minecraft:
     """minecraft subfield"""
-    # pylint: disable=invalid-name
-    modLoaders: list[Loader]
     # Minecraft version
     version: str
+    # pylint: disable=invalid-name
+    modLoaders: list[Loader] = field(default_factory=list)
 
 
+@dataclass_json
 @dataclass
 class Manifest:
     """Parent manifest."""
-    author: str
-    files: list[Files]
+    minecraft: Minecraft
+    name: str
+    version: str = ''
+    author: str = ''
+    files: list[Files] = field(default_factory=list)
 
     # pylint: disable=invalid-name
     manifestType: str = 'minecraftModpack'
     # pylint: disable=invalid-name
     manifestVersion: int = 1
 
-    minecraft: Minecraft
+    overrides: str = OVERRIDES_DIR
 
-    name: str
-    overrides: str = 'overrides'
+    @staticmethod
+    def create(name: str, version: str, authors: list[str],
+               minecraft_version: str, mod_loader: str,
+               assets: list[CurseForgeAsset]) -> 'Manifest':
+        """Creates a manifest referencing the given CurseForge assets.
+
+        Args:
+            name: The name of the modpack
+            version: The version of the modpack
+            authors: The authors of the modpack
+            minecraft_version: The Minecraft version the modpack is for
+            mod_loader: The ID of the mod loader, such as forge-47.2.0, or an
+                empty string if the modpack has no mod loader
+            assets: The CurseForge assets for the launcher to download
+
+        Returns:
+            A Manifest object with files sorted by project and file ID.
+        """
+        return Manifest(
+            minecraft=Minecraft(
+                version=minecraft_version,
+                modLoaders=[Loader(id=mod_loader)] if mod_loader else []),
+            name=name, version=version, author=', '.join(authors),
+            files=[Files(projectID=project_id, fileID=file_id)
+                   for project_id, file_id in sorted(
+                       asset.get_asset_identifier() for asset in assets)])
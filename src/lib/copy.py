@@ -1,23 +1,149 @@
 """Module to handle copying over a list of inclusion/exclusion glob patterns."""
 
+import glob
+import os
+import re
 import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Iterator, Optional, Union
 
+from src.util.files import link_or_copy
+from src.util.profile import PROFILER
 
-def _is_excluded(path: Path, exclude: list[Path]):
-    """Returns True if path matches any pattern in exclude."""
-    for pattern in exclude:
-        if path.full_match(pattern):
-            return True
-    return False
+# Suffix of glob patterns that match everything below a directory.
+RECURSIVE_SUFFIX = '/**'
+
+
+def _compile_globs(patterns: list[str]) -> Optional[re.Pattern]:
+    """Compiles the given globs into a single regex matching relative paths
+    separated by forward slashes, or returns None if there are no globs."""
+    if len(patterns) == 0:
+        return None
+    return re.compile('|'.join(
+        glob.translate(pattern, recursive=True, include_hidden=True, seps='/')
+        for pattern in patterns))
+
+
+class PathMatcher:
+    """Matcher for paths relative to a root directory against lists of
+    inclusion and exclusion globs, each compiled into a single regex.
+
+    Inclusion globs match at any depth below the root, like Path.rglob().
+    Exclusion globs match the whole relative path, like Path.full_match().
+    Directories matched by an exclusion glob ending in /** can be skipped
+    entirely since nothing below them can be included.
+    """
+
+    def __init__(self, include: list[Union[str, Path]],
+                 exclude: list[Union[str, Path]]):
+        include = [Path(pattern).as_posix() for pattern in include]
+        exclude = [Path(pattern).as_posix() for pattern in exclude]
+        self._include = _compile_globs(
+            [f'**/{pattern}' for pattern in include])
+        self._exclude = _compile_globs(exclude)
+        self._prune = _compile_globs([
+            pattern.removesuffix(RECURSIVE_SUFFIX) for pattern in exclude
+            if pattern.endswith(RECURSIVE_SUFFIX)])
+
+    def matches(self, relative: str) -> bool:
+        """Returns True if the given relative file path is included and not
+        excluded."""
+        return self._include is not None \
+            and self._include.match(relative) is not None \
+            and (self._exclude is None
+                 or self._exclude.match(relative) is None)
+
+    def prunes(self, relative: str) -> bool:
+        """Returns True if nothing below the given relative directory path can
+        match."""
+        return self._prune is not None \
+            and self._prune.match(relative) is not None
+
+
+class MatcherUnion:
+    """Matcher for paths that any of the given matchers match, so that one
+    walk can serve several sets of globs."""
+
+    def __init__(self, matchers: list[PathMatcher]):
+        self.matchers = matchers
+
+    def matches(self, relative: str) -> bool:
+        """Returns True if any of the matchers matches the relative path."""
+        return any(matcher.matches(relative) for matcher in self.matchers)
+
+    def prunes(self, relative: str) -> bool:
+        """Returns True if every matcher prunes the relative directory."""
+        return all(matcher.prunes(relative) for matcher in self.matchers)
+
+
+def walk_matching(root: Path,
+                  matcher: Union[PathMatcher, MatcherUnion]) -> Iterator[
+        tuple[os.DirEntry, str]]:
+    """Walks the directory tree under root once, yielding every file that the
+    given matcher matches in sorted order.
+
+    Symlinks to directories are not followed. Nothing is yielded if root is
+    not a directory.
+
+    Args:
+        root: The directory to walk
+        matcher: The matcher to filter paths relative to root with
+
+    Yields:
+        Tuples of the directory entry of each matching file and its path
+        relative to root, separated by forward slashes.
+    """
+    if not os.path.isdir(root):
+        return
+    stack = [(root, '')]
+    while stack:
+        dir_, prefix = stack.pop()
+        with os.scandir(dir_) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        subdirs = []
+        for entry in entries:
+            relative = prefix + entry.name
+            if entry.is_dir():
+                if not entry.is_symlink() and not matcher.prunes(relative):
+                    subdirs.append((entry.path, relative + '/'))
+                continue
+            if matcher.matches(relative):
+                yield entry, relative
+        stack.extend(reversed(subdirs))
+
+
+class _Progress:
+    """Thread safe tracker of bytes copied that reports the throughput."""
+
+    def __init__(self, callback: Callable[[int, float], None]):
+        self.callback = callback
+        self.copied = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, size: int):
+        """Records that size more bytes were copied and reports the total."""
+        with self._lock:
+            self.copied += size
+            elapsed = time.monotonic() - self.start
+            self.callback(
+                self.copied, self.copied / elapsed if elapsed > 0 else 0.0)
 
 
 def copy(root: Path, dest: Path, include: list[str], exclude: list[Path],
-         callback: Optional[Callable[[str], None]] = None):
+         callback: Optional[Callable[[str], None]] = None, link: bool = False,
+         workers: Optional[int] = None,
+         progress: Optional[Callable[[int, float], None]] = None):
     """Recursively copies all of the include patterns rooted at root into destination,
     excluding any files that match the exclusion pattern.
 
+    The tree under root is walked once, with every pattern compiled into a
+    single matcher, and directories excluded with a pattern ending in /** are
+    not descended into.
+
     Args:
         root: the path to the root directory that all the inclusion and
             exclusion patterns will search from
@@ -26,19 +152,51 @@ def copy(root: Path, dest: Path, include: list[str], exclude: list[Path],
         exclude: a list of globs to exclude
         callback: an optional callback that will be invoked with each file that
             is copied, can be used to provide logging or other functionality
+        link: if True, files are hardlinked into the destination instead of
+            copied where possible, so the copies must not be modified in place
+        workers: the number of threads to copy files with, files are copied on
+            the calling thread if not given
+        progress: an optional callback that will be invoked after each file is
+            copied with the total bytes copied so far and the bytes copied per
+            second
     """
-    for pattern in include:
-        for path in root.rglob(pattern):
-            relative = path.relative_to(root)
-            if path.is_dir():
-                continue
-            if _is_excluded(relative, exclude):
-                continue
-            if callback is not None:
-                callback(path)
-            # Generate the full destination path by taking the pattern match
-            # relative to the root.
-            dest_file = dest / relative
-            if not dest_file.parent.exists():
-                dest_file.parent.mkdir(exist_ok=True)
-            shutil.copy(path, dest / path.relative_to(root))
+    matcher = PathMatcher(include, exclude)
+    tracker = _Progress(progress) if progress is not None else None
+    created_dirs = set()
+
+    def _copy_file(entry: os.DirEntry, dest_file: Path):
+        if link:
+            linked = link_or_copy(entry.path, dest_file)
+        else:
+            shutil.copy(entry.path, dest_file)
+            linked = False
+        if linked:
+            PROFILER.count('files_linked')
+        else:
+            PROFILER.count('bytes_copied', entry.stat().st_size)
+        if tracker is not None:
+            tracker.add(entry.stat().st_size)
+
+    executor = ThreadPoolExecutor(workers) if workers else None
+    try:
+        with PROFILER.phase('copy'):
+            futures = []
+            for entry, relative in walk_matching(root, matcher):
+                if callback is not None:
+                    callback(Path(entry.path))
+                # Generate the full destination path by taking the pattern
+                # match relative to the root.
+                dest_file = dest / relative
+                if dest_file.parent not in created_dirs:
+                    dest_file.parent.mkdir(parents=True, exist_ok=True)
+                    created_dirs.add(dest_file.parent)
+                if executor is None:
+                    _copy_file(entry, dest_file)
+                else:
+                    futures.append(
+                        executor.submit(_copy_file, entry, dest_file))
+            for future in futures:
+                future.result()
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
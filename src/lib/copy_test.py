@@ -1,7 +1,9 @@
 """Testing for packer.py"""
 
+import os
 from glob import glob
 from pathlib import Path
+from unittest.mock import patch
 
 from src.lib.copy import copy
 
@@ -55,3 +57,61 @@ def test_copy2(current_dir, tmp_path):
         'kubejs/jsconfig.json',
         'kubejs/script1.js'
     ])
+
+
+def test_copy_link(current_dir, tmp_path):
+    """Tests that linked copies share their contents with the originals."""
+    testdata_dir = current_dir / "testdata" / "test_copy"
+    copy(testdata_dir, tmp_path, ["config/**"], [], link=True)
+    assert get_files(tmp_path) == [
+        'config/config.json', 'config/file_to_ignore']
+    assert (tmp_path / 'config/config.json').samefile(
+        testdata_dir / 'config/config.json')
+
+
+def test_copy_prunes_excluded_dirs(current_dir, tmp_path):
+    """Tests that the tree is walked once and directories excluded with a
+    trailing /** are not descended into."""
+    testdata_dir = current_dir / "testdata" / "test_copy"
+    scanned = []
+    original_scandir = os.scandir
+
+    def _scandir(path):
+        scanned.append(Path(path).relative_to(testdata_dir).as_posix())
+        return original_scandir(path)
+
+    with patch('os.scandir', side_effect=_scandir):
+        copy(testdata_dir, tmp_path, ["config/**", "kubejs/**"],
+             ["kubejs/assets/**"])
+    assert scanned == ['.', 'config', 'kubejs']
+    assert get_files(tmp_path) == sorted([
+        'config/config.json',
+        'config/file_to_ignore',
+        'kubejs/dev_script.js',
+        'kubejs/file_to_ignore',
+        'kubejs/jsconfig.json',
+        'kubejs/script1.js',
+    ])
+
+
+def test_copy_parallel(current_dir, tmp_path):
+    """Tests that copying with worker threads copies the same files and
+    reports progress in bytes."""
+    testdata_dir = current_dir / "testdata" / "test_copy"
+    progress = []
+    copy(testdata_dir, tmp_path, ["**"], ["**/file_to_ignore"], workers=4,
+         progress=lambda copied, rate: progress.append(copied))
+    files = get_files(tmp_path)
+    assert files == sorted(
+        path for path in get_files(testdata_dir)
+        if not path.endswith('file_to_ignore'))
+    assert len(progress) == len(files)
+    assert progress[-1] == sum(
+        (testdata_dir / path).stat().st_size for path in files)
+
+
+def test_copy_missing_root(tmp_path):
+    """Tests that copying from a directory that does not exist copies
+    nothing."""
+    copy(tmp_path / "missing", tmp_path / "dest", ["**"], [])
+    assert get_files(tmp_path) == []
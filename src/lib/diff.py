@@ -0,0 +1,85 @@
+"""Module to diff the lockfile's assets against the files on disk."""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.config.lockfile_entry import LockfileEntry
+from src.lib.multikey_dict import MultiKeyDict
+
+
+@dataclass
+class AssetDiff:
+    """The differences between the lockfile's assets of one type and the asset
+    files on disk."""
+    # Files on disk that match no lockfile entry
+    added: list[Path] = field(default_factory=list)
+    # Lockfile entries with no matching file on disk
+    removed: list[LockfileEntry] = field(default_factory=list)
+    # Files on disk with the contents of a lockfile entry under another name
+    renamed: list[tuple[Path, LockfileEntry]] = field(default_factory=list)
+    # Files on disk with the name of a lockfile entry but other contents. The
+    # entry may also be the target of a rename that supplies its contents.
+    modified: list[tuple[Path, LockfileEntry]] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        """Returns True if the lockfile and the files on disk match."""
+        return not (self.added or self.removed or self.renamed
+                    or self.modified)
+
+
+def diff_assets(lockfile_assets: MultiKeyDict,
+                curr_assets: MultiKeyDict) -> AssetDiff:
+    """Diffs the lockfile entries of one asset type against the asset files on
+    disk.
+
+    Both multikey dicts must be keyed on the file name followed by the hashes
+    of the asset, like Lockfile.get_assets_by_type and hash_asset_dirs. Assets
+    are joined on their hashes first and their file names second, so a file
+    that was only renamed is reported as renamed rather than as both removed
+    and added, and a file whose contents changed is reported as modified.
+    A file left over with the name of an entry that was joined to another
+    file is reported as modified too, never as added.
+
+    Args:
+        lockfile_assets: The lockfile entries, keyed on their multikeys
+        curr_assets: The paths of the asset files, keyed on their multikeys
+
+    Returns:
+        The AssetDiff of the lockfile against the files on disk, with each
+        list sorted by file name.
+    """
+    diff = AssetDiff()
+    unmatched_files = {}
+    for multikey, path in curr_assets.data.items():
+        if not lockfile_assets.is_existing_multikey(multikey):
+            unmatched_files[multikey] = path
+    files_by_hashes = {multikey[1:]: multikey for multikey in unmatched_files}
+    files_by_name = {multikey[0]: multikey for multikey in unmatched_files}
+    unmatched_entries = []
+    for multikey, entry in lockfile_assets.data.items():
+        if curr_assets.is_existing_multikey(multikey):
+            continue
+        file_multikey = files_by_hashes.get(multikey[1:])
+        if file_multikey is not None:
+            diff.renamed.append((unmatched_files.pop(file_multikey), entry))
+        else:
+            unmatched_entries.append((multikey, entry))
+    for multikey, entry in unmatched_entries:
+        file_multikey = files_by_name.get(multikey[0])
+        if file_multikey in unmatched_files:
+            diff.modified.append((unmatched_files.pop(file_multikey), entry))
+        else:
+            diff.removed.append(entry)
+    entries_by_name = {entry.file_name: entry
+                       for entry in lockfile_assets.get_values()}
+    for path in unmatched_files.values():
+        entry = entries_by_name.get(path.name)
+        if entry is not None:
+            diff.modified.append((path, entry))
+        else:
+            diff.added.append(path)
+    diff.added.sort(key=lambda path: path.name)
+    diff.removed.sort(key=lambda entry: entry.file_name)
+    diff.renamed.sort(key=lambda rename: rename[1].file_name)
+    diff.modified.sort(key=lambda modified: modified[1].file_name)
+    return diff
@@ -0,0 +1,78 @@
+"""Unit testing for diff.py"""
+
+from pathlib import Path
+
+from src.config.lockfile import get_entry_multikey
+from src.config.lockfile_entry import LockfileEntry
+from src.lib.diff import AssetDiff, diff_assets
+from src.lib.multikey_dict import MultiKeyDict
+
+
+def _multikey(file_name: str, hash_: str) -> tuple:
+    return (file_name, f'md5-{hash_}', f'sha1-{hash_}', f'sha512-{hash_}')
+
+
+def _lockfile_assets(*entries: LockfileEntry) -> MultiKeyDict:
+    assets = MultiKeyDict(4)
+    for entry in entries:
+        assets.add(get_entry_multikey(entry), entry)
+    return assets
+
+
+def _curr_assets(*files: tuple[str, str]) -> MultiKeyDict:
+    assets = MultiKeyDict(4)
+    for file_name, hash_ in files:
+        assets.add(_multikey(file_name, hash_), Path(file_name))
+    return assets
+
+
+def test_diff_assets_unchanged(make_lockfile_entry):
+    """Tests that matching assets produce an empty diff."""
+    diff = diff_assets(
+        _lockfile_assets(make_lockfile_entry('a.jar', hash_='a')),
+        _curr_assets(('a.jar', 'a')))
+    assert diff == AssetDiff()
+    assert diff.is_empty()
+
+
+def test_diff_assets(make_lockfile_entry):
+    """Tests that assets are joined on their hashes first and file names
+    second."""
+    a, b, c, d = [make_lockfile_entry(f'{name}.jar', hash_=name)
+                  for name in ['a', 'b', 'c', 'd']]
+    diff = diff_assets(
+        _lockfile_assets(a, b, c, d),
+        _curr_assets(('a.jar', 'a'), ('b-renamed.jar', 'b'),
+                     ('c.jar', 'c2'), ('e.jar', 'e')))
+    assert diff == AssetDiff(
+        added=[Path('e.jar')],
+        removed=[d],
+        renamed=[(Path('b-renamed.jar'), b)],
+        modified=[(Path('c.jar'), c)],
+    )
+
+
+def test_diff_assets_swapped(make_lockfile_entry):
+    """Tests that a file renamed to the name of another entry is joined to the
+    entry with its contents, leaving the other entry removed."""
+    a, b = [make_lockfile_entry(f'{name}.jar', hash_=name)
+            for name in ['a', 'b']]
+    diff = diff_assets(_lockfile_assets(a, b),
+                       _curr_assets(('b.jar', 'a'), ('a.jar', 'b')))
+    assert diff == AssetDiff(
+        renamed=[(Path('b.jar'), a), (Path('a.jar'), b)])
+    diff = diff_assets(_lockfile_assets(a, b), _curr_assets(('b.jar', 'a')))
+    assert diff == AssetDiff(removed=[b], renamed=[(Path('b.jar'), a)])
+
+
+def test_diff_assets_renamed_over_modified(make_lockfile_entry):
+    """Tests that a file left over with the name of an entry renamed from
+    another file is reported as modified rather than added."""
+    a, b = [make_lockfile_entry(f'{name}.jar', hash_=hash_)
+            for name, hash_ in [('a', 'z'), ('b', 'x')]]
+    diff = diff_assets(_lockfile_assets(a, b),
+                       _curr_assets(('a.jar', 'x'), ('b.jar', 'y')))
+    assert diff == AssetDiff(
+        removed=[a],
+        renamed=[(Path('a.jar'), b)],
+        modified=[(Path('b.jar'), b)])
@@ -0,0 +1,155 @@
+"""Cache of the compressed members of a previous export, so that unchanged
+files are copied from the previous archives instead of recompressed."""
+
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from src.lib.zip import ZipMember, compress_file, get_member_mode
+from src.util.enum import HashAlg
+from src.util.files import atomic_write
+from src.util.hash import hash_file
+
+EXPORT_CACHE_VERSION = 1
+
+
+def _get_signature(path: Path) -> Optional[list[int]]:
+    """Returns the stat signature used to detect whether an archive changed
+    since it was exported, or None if it does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ExportCache:
+    """Manifest of the files in the previous export of a project.
+
+    For each exported file, the manifest records its size, mtime and SHA1
+    hash, and where its compressed data is in the previous archives. A file
+    with the same size and mtime, or failing that the same hash, reuses that
+    compressed data. Records are dropped if the archive they point to was
+    changed or removed since the export. It is safe to share between threads.
+
+    Args:
+        path: The path of the manifest file
+        archives: The paths of the archives keyed by name, which the previous
+            archives are read from
+    """
+
+    def __init__(self, path: Path, archives: dict[str, Path]):
+        self.path = path
+        self.archives = archives
+        self._hits = 0
+        self._misses = 0
+        self._records = self._load()
+        self._hashes = {}
+        self._new_records = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict[str, dict]:
+        try:
+            data = orjson.loads(self.path.read_bytes())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict) \
+                or data.get('version') != EXPORT_CACHE_VERSION:
+            return {}
+        valid_archives = {
+            name for name, signature in data['archives'].items()
+            if name in self.archives
+            and _get_signature(self.archives[name]) == signature}
+        return {relative: record
+                for relative, record in data['files'].items()
+                if record['archive'] in valid_archives}
+
+    def _get_member(self, record: dict, name: str, mode: int) -> ZipMember:
+        """Returns a member that copies the compressed data of a record from
+        its archive when it is written."""
+        return ZipMember(name, record['method'], record['crc'],
+                         record['size'], None, mode,
+                         source=self.archives[record['archive']],
+                         source_offset=record['offset'],
+                         source_size=record['compressed_size'])
+
+    def load_member(self, path: Path, relative: str,
+                    stat: os.stat_result) -> ZipMember:
+        """Returns the compressed member for the given file, reusing the
+        compressed data of the previous export if the file is unchanged.
+
+        Reused data is copied from the previous archive when the member is
+        written rather than read here.
+
+        Args:
+            path: The path of the file
+            relative: The path of the file relative to the project root, which
+                is also the name of the member
+            stat: The stat result of the file
+
+        Returns:
+            The ZipMember for the file.
+        """
+        mode = get_member_mode(stat.st_mode)
+        record = self._records.get(relative)
+        member = None
+        if record is not None and record['size'] == stat.st_size \
+                and record['mtime_ns'] == stat.st_mtime_ns:
+            sha1 = record['sha1']
+        else:
+            sha1 = hash_file(path, HashAlg.SHA1)
+            if record is None or record['size'] != stat.st_size \
+                    or record['sha1'] != sha1:
+                member = compress_file(path, relative)
+        with self._lock:
+            self._hashes[relative] = (sha1, stat.st_mtime_ns)
+            if member is None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if member is None:
+            member = self._get_member(record, relative, mode)
+        return member
+
+    def record(self, relative: str, archive: str, offset: int,
+               member: ZipMember):
+        """Records where the compressed data of a file loaded with
+        load_member was written to.
+
+        Args:
+            relative: The path of the file relative to the project root
+            archive: The name of the archive the member was written to
+            offset: The offset of the member's compressed data in the archive
+            member: The member that was written
+        """
+        with self._lock:
+            if relative in self._new_records:
+                return
+            sha1, mtime_ns = self._hashes[relative]
+            self._new_records[relative] = {
+                'archive': archive, 'offset': offset,
+                'compressed_size': member.compressed_size,
+                'method': member.method,
+                'crc': member.crc, 'size': member.size, 'mtime_ns': mtime_ns,
+                'sha1': sha1,
+            }
+
+    def stats(self) -> dict[str, int]:
+        """Returns the number of files reused from the previous export and the
+        number of files compressed."""
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses}
+
+    def save(self):
+        """Writes the records of this export to the manifest file, which must
+        be called once the archives are in place."""
+        with self._lock:
+            atomic_write(self.path, orjson.dumps({
+                'version': EXPORT_CACHE_VERSION,
+                'archives': {name: _get_signature(path)
+                             for name, path in self.archives.items()},
+                'files': self._new_records,
+            }))
@@ -4,7 +4,12 @@ from src.config.loader import load_config_and_lockfile
 
 
 class M3ContextManager():
-    """Context manager for m3's state on disk."""
+    """Context manager for m3's state on disk.
+
+    On a clean exit, the config and lockfile are written back if they changed.
+    If the body raised, nothing is written so that a half finished operation
+    does not leave a partially updated config or lockfile behind.
+    """
 
     def __init__(self):
         config, lockfile = load_config_and_lockfile()
@@ -15,5 +20,9 @@ class M3ContextManager():
         return self
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.config.write()
-        self.lockfile.write()
+        if exc_type is not None:
+            return
+        if self.config is not None:
+            self.config.write()
+        if self.lockfile is not None:
+            self.lockfile.write()
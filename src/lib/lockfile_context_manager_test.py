@@ -0,0 +1,49 @@
+"""Unit testing for lockfile_context_manager.py"""
+
+import pytest
+
+from src.config.config import CONFIG_FILENAME, Config
+from src.config.lockfile import LOCKFILE_FILENAME, Lockfile
+from src.lib.lockfile_context_manager import M3ContextManager
+
+
+@pytest.fixture
+def m3_project(tmp_path, monkeypatch):
+    """Test fixture that creates an empty m3 project and changes into it."""
+    Config(name="test-config").write(tmp_path / CONFIG_FILENAME)
+    Lockfile().write(tmp_path / LOCKFILE_FILENAME)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_context_manager_unchanged(m3_project):
+    """Tests that exiting the context manager does not rewrite unchanged
+    files."""
+    stats = {name: (m3_project / name).stat()
+             for name in [CONFIG_FILENAME, LOCKFILE_FILENAME]}
+    with M3ContextManager():
+        pass
+    for name, stat in stats.items():
+        assert (m3_project / name).stat().st_ino == stat.st_ino
+        assert (m3_project / name).stat().st_mtime_ns == stat.st_mtime_ns
+
+
+def test_context_manager_changed(m3_project):
+    """Tests that exiting the context manager writes changes to disk and keeps
+    the permissions of the files it replaces."""
+    (m3_project / CONFIG_FILENAME).chmod(0o640)
+    with M3ContextManager() as context:
+        context.config.version = "1.0.0"
+    assert Config.get_config().version == "1.0.0"
+    assert (m3_project / CONFIG_FILENAME).stat().st_mode & 0o777 == 0o640
+
+
+def test_context_manager_exception(m3_project):
+    """Tests that the context manager does not write anything if its body
+    raises."""
+    contents = (m3_project / CONFIG_FILENAME).read_bytes()
+    with pytest.raises(RuntimeError):
+        with M3ContextManager() as context:
+            context.config.version = "1.0.0"
+            raise RuntimeError()
+    assert (m3_project / CONFIG_FILENAME).read_bytes() == contents
@@ -1,15 +1,227 @@
 """Module to handle overwriting a given directory with contents from a source directory."""
 
+import filecmp
+import os
 import shutil
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
+import orjson
 
-def _delete_directory(path: Path):
-    """Deletes the given directory if it exists."""
+from src.util.files import atomic_write, move_file
+from src.util.profile import PROFILER
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Prefix of the staging directories that changes are prepared in.
+STAGING_PREFIX = '.m3-staging-'
+# Suffix of the hidden sibling directory that replaced files are moved to.
+BACKUP_SUFFIX = '.m3-backup'
+# Suffix of the hidden sibling file that records an overwrite in progress.
+JOURNAL_SUFFIX = '.m3-journal'
+
+# Journal states. A pending overwrite is rolled back on recovery, a committed
+# one only has its backups left to clean up.
+PENDING = 'pending'
+COMMITTED = 'committed'
+
+
+def create_staging_dir(parent: Path) -> tempfile.TemporaryDirectory:
+    """Creates a temporary directory to stage changes to the asset directories
+    of the project rooted at parent.
+
+    The staging directory is created inside the project so that it is on the
+    same filesystem as the asset directories, which lets unchanged assets be
+    hardlinked into it and lets staged files be renamed into place.
+
+    Args:
+        parent: The root directory of the project
+
+    Returns:
+        A TemporaryDirectory to use as a context manager.
+    """
+    return tempfile.TemporaryDirectory(dir=parent, prefix=STAGING_PREFIX)
+
+
+def _journal_path(dest: Path) -> Path:
+    return dest.with_name(f'.{dest.name}{JOURNAL_SUFFIX}')
+
+
+def _backup_path(dest: Path) -> Path:
+    return dest.with_name(f'.{dest.name}{BACKUP_SUFFIX}')
+
+
+def _list_files(root: Path) -> dict[str, Path]:
+    """Returns every file under root keyed by its path relative to root."""
+    if not root.is_dir():
+        return {}
+    return {path.relative_to(root).as_posix(): path
+            for path in root.rglob('*') if path.is_file()}
+
+
+def _is_unchanged(a: Path, b: Path) -> bool:
+    """Returns True if the two files are the same file or have the same
+    contents."""
+    try:
+        return os.path.samefile(a, b) or filecmp.cmp(a, b, shallow=False)
+    except OSError:
+        return False
+
+
+@contextmanager
+def _lock_dir(dest: Path, blocking: bool = True) -> Iterator[bool]:
+    """Returns a context manager that holds an exclusive lock on dest, so that
+    an overwrite in progress is never recovered by another process. Yields
+    whether the lock was acquired, which is always the case when blocking.
+
+    Locks are only taken on platforms with flock.
+    """
+    if fcntl is None:
+        yield True
+        return
+    try:
+        fd = os.open(dest, os.O_RDONLY)
+    except FileNotFoundError:
+        yield True
+        return
     try:
-        shutil.rmtree(path)
-    except FileNotFoundError as e:
-        raise e
+        try:
+            fcntl.flock(
+                fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        # Closing the file releases the lock
+        os.close(fd)
+
+
+def _fsync_dir(path: Path):
+    """Flushes renames in the given directory to disk where supported."""
+    if not hasattr(os, 'O_DIRECTORY') or not path.is_dir():
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_journal(dest: Path, state: str, staging: Path,
+                   added: list[str], removed: list[str]):
+    atomic_write(_journal_path(dest), orjson.dumps({
+        'state': state,
+        'staging': str(staging),
+        'added': added,
+        'removed': removed,
+    }))
+
+
+def _rollback(dest: Path, added: list[str], removed: list[str]):
+    """Undoes a partially applied overwrite of dest."""
+    backup = _backup_path(dest)
+    removed_set = set(removed)
+    for rel in added:
+        # A replaced file that was never moved to the backup is still the
+        # original file.
+        if rel in removed_set and not (backup / rel).exists():
+            continue
+        (dest / rel).unlink(missing_ok=True)
+    for rel in removed:
+        if (backup / rel).exists():
+            move_file(backup / rel, dest / rel)
+
+
+def _remove_empty_dirs(dest: Path, src: Path):
+    """Removes directories under dest that are empty and not in src."""
+    for path in sorted(dest.rglob('*'), reverse=True):
+        if path.is_dir() and not (src / path.relative_to(dest)).is_dir() \
+                and not any(path.iterdir()):
+            path.rmdir()
+
+
+def _finish(dest: Path):
+    """Removes the backup and the journal of an overwrite of dest."""
+    shutil.rmtree(_backup_path(dest), ignore_errors=True)
+    _journal_path(dest).unlink(missing_ok=True)
+
+
+def compute_delta(dest: Path, src: Path) -> tuple[list[str], list[str]]:
+    """Computes the changes needed to make dest match src.
+
+    Args:
+        dest: The directory to be overwritten
+        src: The directory with the desired contents
+
+    Returns:
+        A two-tuple of the sorted relative paths of the files to add from src
+        and the files to remove from dest. Changed files appear in both.
+    """
+    dest_files = _list_files(dest)
+    src_files = _list_files(src)
+    added = sorted(rel for rel, path in src_files.items()
+                   if rel not in dest_files
+                   or not _is_unchanged(path, dest_files[rel]))
+    added_set = set(added)
+    removed = sorted(rel for rel in dest_files
+                     if rel not in src_files or rel in added_set)
+    return added, removed
+
+
+def recover_overwrite(dest: Path) -> Optional[str]:
+    """Recovers the given directory from an overwrite that was interrupted.
+
+    An overwrite that had not finished applying its changes is rolled back, and
+    one that had is completed. An overwrite that is still running in another
+    process holds a lock on dest, and is left alone.
+
+    Args:
+        dest: The directory that was being overwritten
+
+    Returns:
+        'rolled back' or 'completed' if an interrupted overwrite was
+        recovered, otherwise None.
+    """
+    if not _journal_path(dest).exists():
+        return None
+    with _lock_dir(dest, blocking=False) as locked:
+        return _recover_overwrite(dest) if locked else None
+
+
+def _recover_overwrite(dest: Path) -> Optional[str]:
+    journal_path = _journal_path(dest)
+    # The overwrite may have finished while waiting for the lock
+    if not journal_path.exists():
+        return None
+    journal = orjson.loads(journal_path.read_bytes())
+    if journal['state'] == PENDING:
+        _rollback(dest, journal['added'], journal['removed'])
+        result = 'rolled back'
+    else:
+        result = 'completed'
+    _finish(dest)
+    shutil.rmtree(journal['staging'], ignore_errors=True)
+    return result
+
+
+def recover_overwrites(dirs: Iterable[Path]) -> dict[Path, str]:
+    """Recovers each of the given directories from an interrupted overwrite.
+
+    Returns:
+        A dict mapping each recovered directory to how it was recovered.
+    """
+    recovered = {}
+    for dest in dirs:
+        result = recover_overwrite(dest)
+        if result is not None:
+            recovered[dest] = result
+    return recovered
 
 
 def overwrite_dir(
@@ -17,24 +229,51 @@ def overwrite_dir(
     """Overwrites and replaces the contents of the destination directory with
     the contents from the source directory.
 
+    Only the files that differ are touched. Files that are only in dest, or
+    that changed, are moved to a hidden backup directory next to dest, then
+    new and changed files are moved over from src. The cost therefore scales
+    with the size of the change rather than the size of the directory.
+
+    A journal next to dest records the change before it is applied. If the
+    overwrite fails, it is rolled back immediately. If the process dies, the
+    overwrite is rolled back or completed by recover_overwrite. dest is locked
+    for the whole overwrite, which waits for any other overwrite of dest.
+
     Args:
         dest: the directory to overwrite the contents of
-        src: the directory containing the contents to overwrite the dest with
+        src: the directory containing the contents to overwrite the dest with,
+            which has the changed files moved out of it
     """
-    try:
-        _delete_directory(dest)
-        shutil.copytree(src, dest)
-    except shutil.Error as error:
-        err_msg = "Errors occurred during copytree operation:\n"
-        for err_info in error.args[0]:
-            s, d, msg = err_info
-            err_msg += f"Failed to copy '{s}' to '{d}': {msg}\n"
-        raise OSError(err_msg) from error
-    except FileExistsError as error:
-        raise FileExistsError(
-            f"Error: Destination directory '{dest}' already exists") from error
-    except FileNotFoundError as error:
+    if not src.is_dir():
         raise FileNotFoundError(
-            f"Error: Source directory '{src}' not found") from error
-    except OSError as error:
-        raise error
+            f"Error: Source directory '{src}' not found")
+    with PROFILER.phase('commit'):
+        _overwrite_dir(dest, src)
+
+
+def _overwrite_dir(dest: Path, src: Path):
+    dest.mkdir(parents=True, exist_ok=True)
+    with _lock_dir(dest):
+        _recover_overwrite(dest)
+        _apply_delta(dest, src)
+
+
+def _apply_delta(dest: Path, src: Path):
+    added, removed = compute_delta(dest, src)
+    if len(added) == 0 and len(removed) == 0:
+        return
+    _write_journal(dest, PENDING, src, added, removed)
+    try:
+        backup = _backup_path(dest)
+        for rel in removed:
+            move_file(dest / rel, backup / rel)
+        for rel in added:
+            move_file(src / rel, dest / rel)
+        _fsync_dir(dest)
+    except BaseException:
+        _rollback(dest, added, removed)
+        _finish(dest)
+        raise
+    _write_journal(dest, COMMITTED, src, added, removed)
+    _remove_empty_dirs(dest, src)
+    _finish(dest)
@@ -0,0 +1,152 @@
+"""Unit testing for overwrite.py"""
+
+import errno
+import os
+from unittest.mock import patch
+
+import orjson
+import pytest
+
+from src.lib.overwrite import (COMMITTED, PENDING, _lock_dir, compute_delta,
+                               create_staging_dir, overwrite_dir,
+                               recover_overwrite)
+
+
+@pytest.fixture
+def staged_change(tmp_path, create_file):
+    """Test fixture that sets up a mods directory and a staged copy of it with
+    one file kept, one file changed, one file removed, and one file added.
+
+    Returns the mods directory and the staged directory.
+    """
+    dest = tmp_path / 'mods'
+    create_file(dest / 'kept.jar', 'kept')
+    create_file(dest / 'changed.jar', 'old')
+    create_file(dest / 'removed.jar', 'removed')
+    src = tmp_path / 'staging' / 'mods'
+    src.mkdir(parents=True)
+    os.link(dest / 'kept.jar', src / 'kept.jar')
+    create_file(src / 'changed.jar', 'new')
+    create_file(src / 'added.jar', 'added')
+    return dest, src
+
+
+def read_dir(dir_) -> dict[str, str]:
+    """Returns the contents of every file in the given directory."""
+    return {path.name: path.read_text() for path in sorted(dir_.iterdir())}
+
+
+def test_compute_delta(staged_change):
+    """Tests that only the differences between the directories are
+    applied."""
+    dest, src = staged_change
+    assert compute_delta(dest, src) == (
+        ['added.jar', 'changed.jar'], ['changed.jar', 'removed.jar'])
+
+
+def test_overwrite_dir(tmp_path, staged_change):
+    """Tests that the destination is updated in place and unchanged files are
+    left alone."""
+    dest, src = staged_change
+    kept_inode = (dest / 'kept.jar').stat().st_ino
+    overwrite_dir(dest, src)
+    assert read_dir(dest) == {
+        'added.jar': 'added', 'changed.jar': 'new', 'kept.jar': 'kept'}
+    assert (dest / 'kept.jar').stat().st_ino == kept_inode
+    assert sorted(os.listdir(tmp_path)) == ['mods', 'staging']
+
+
+def test_overwrite_dir_staging(tmp_path, create_file):
+    """Tests that a staging directory is created inside the given parent."""
+    with create_staging_dir(tmp_path) as staging:
+        src = create_file(tmp_path / staging / 'mods' / 'a.jar').parent
+        overwrite_dir(tmp_path / 'mods', src)
+    assert os.listdir(tmp_path / 'mods') == ['a.jar']
+    assert os.listdir(tmp_path) == ['mods']
+
+
+def test_overwrite_dir_failure(tmp_path, staged_change):
+    """Tests that a failed overwrite is rolled back."""
+    dest, src = staged_change
+    original_replace = os.replace
+
+    def _replace(a, b):
+        if a == src / 'changed.jar':
+            raise PermissionError(errno.EACCES, 'Permission denied')
+        original_replace(a, b)
+
+    with patch('os.replace', side_effect=_replace):
+        with pytest.raises(PermissionError):
+            overwrite_dir(dest, src)
+    assert read_dir(dest) == {
+        'changed.jar': 'old', 'kept.jar': 'kept', 'removed.jar': 'removed'}
+    assert sorted(os.listdir(tmp_path)) == ['mods', 'staging']
+
+
+def test_overwrite_dir_cross_device(staged_change):
+    """Tests that files are copied if the source is on another
+    filesystem."""
+    dest, src = staged_change
+    original_replace = os.replace
+
+    def _replace(a, b):
+        if str(a).startswith(str(src)):
+            raise OSError(errno.EXDEV, 'Cross-device link')
+        original_replace(a, b)
+
+    with patch('os.replace', side_effect=_replace):
+        overwrite_dir(dest, src)
+    assert read_dir(dest) == {
+        'added.jar': 'added', 'changed.jar': 'new', 'kept.jar': 'kept'}
+
+
+@pytest.mark.parametrize('state', [PENDING, COMMITTED])
+def test_recover_overwrite(tmp_path, staged_change, state):
+    """Tests that an interrupted overwrite is rolled back if it was pending
+    and completed if it was committed."""
+    dest, src = staged_change
+    # Simulate a process that died after moving the changed file to the
+    # backup and moving the added file into place
+    (tmp_path / '.mods.m3-backup').mkdir()
+    os.replace(dest / 'changed.jar', tmp_path / '.mods.m3-backup/changed.jar')
+    os.replace(src / 'added.jar', dest / 'added.jar')
+    (tmp_path / '.mods.m3-journal').write_bytes(orjson.dumps({
+        'state': state, 'staging': str(src),
+        'added': ['added.jar', 'changed.jar'],
+        'removed': ['changed.jar', 'removed.jar']}))
+
+    if state == PENDING:
+        assert recover_overwrite(dest) == 'rolled back'
+        assert read_dir(dest) == {
+            'changed.jar': 'old', 'kept.jar': 'kept',
+            'removed.jar': 'removed'}
+    else:
+        assert recover_overwrite(dest) == 'completed'
+    assert sorted(os.listdir(tmp_path)) == ['mods', 'staging']
+    assert not src.exists()
+    assert recover_overwrite(dest) is None
+
+
+def test_compute_delta_same_mtime(tmp_path, create_file):
+    """Tests that files with the same size and mtime but other contents are
+    changed."""
+    dest, src = tmp_path / 'mods', tmp_path / 'staging'
+    create_file(dest / 'x.jar', 'AAAA')
+    create_file(src / 'x.jar', 'BBBB')
+    stat = (dest / 'x.jar').stat()
+    os.utime(src / 'x.jar', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert compute_delta(dest, src) == (['x.jar'], ['x.jar'])
+
+
+def test_recover_overwrite_locked(tmp_path, staged_change):
+    """Tests that an overwrite still running in another process is not
+    recovered."""
+    dest, src = staged_change
+    (tmp_path / '.mods.m3-journal').write_bytes(orjson.dumps({
+        'state': PENDING, 'staging': str(src),
+        'added': ['added.jar', 'changed.jar'],
+        'removed': ['changed.jar', 'removed.jar']}))
+    with _lock_dir(dest):
+        assert recover_overwrite(dest) is None
+        assert (tmp_path / '.mods.m3-journal').exists()
+    assert recover_overwrite(dest) == 'rolled back'
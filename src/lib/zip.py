@@ -0,0 +1,246 @@
+"""Module to write reproducible zip archives from precompressed members."""
+
+import os
+import stat
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+# Suffixes of files whose contents are already compressed, which are stored
+# as is rather than deflated again.
+COMPRESSED_SUFFIXES = frozenset([
+    '.jar', '.zip', '.gz', '.xz', '.bz2', '.7z', '.png', '.jpg', '.jpeg',
+    '.ogg', '.mp3', '.webp',
+])
+COMPRESSION_LEVEL = 6
+# Size of the chunks files are read in while compressing or copying them.
+READ_CHUNK_SIZE = 1024 * 1024
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Every member is timestamped 1980-01-01 00:00:00, the earliest DOS date, so
+# archives of the same files are byte for byte identical.
+DOS_TIME = 0
+DOS_DATE = (0 << 9) | (1 << 5) | 1
+
+_UTF8_FLAG = 0x800
+_UNIX_VERSION_MADE_BY = (3 << 8) | 45
+_VERSION_NEEDED = 20
+_ZIP64_VERSION_NEEDED = 45
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_ZIP64_END_RECORD = struct.Struct('<IQHHIIQQQQ')
+_ZIP64_END_LOCATOR = struct.Struct('<IIQI')
+
+
+@dataclass
+class ZipMember:
+    """A compressed file ready to be written to a zip archive.
+
+    The compressed contents are either held in data, or copied from source
+    in chunks when the member is written so that large members are never
+    held in memory whole.
+    """
+    # Path of the member in the archive, separated by forward slashes
+    name: str
+    # ZIP_STORED or ZIP_DEFLATED
+    method: int
+    crc: int
+    size: int
+    # The compressed contents, or None to copy them from source
+    data: Optional[bytes]
+    # Unix permission bits
+    mode: int = 0o644
+    # File the compressed contents start at source_offset of, and their size,
+    # if data is None
+    source: Optional[Path] = None
+    source_offset: int = 0
+    source_size: int = 0
+
+    @property
+    def compressed_size(self) -> int:
+        """The size of the compressed contents in bytes."""
+        return len(self.data) if self.data is not None else self.source_size
+
+
+def compress_file(path: Path, name: str,
+                  level: int = COMPRESSION_LEVEL) -> ZipMember:
+    """Reads and compresses the given file into a zip member in chunks. Files
+    with an already compressed format are stored uncompressed, and are only
+    read to compute their CRC so that their contents are copied from the file
+    when the member is written.
+
+    Args:
+        path: The path of the file to compress
+        name: The path of the member in the archive
+        level: The zlib compression level
+
+    Returns:
+        The compressed ZipMember.
+    """
+    mode = get_member_mode(os.stat(path).st_mode)
+    compressor = None if Path(name).suffix.lower() in COMPRESSED_SUFFIXES \
+        else zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = size = 0
+    chunks = []
+    with open(path, 'rb') as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor is not None:
+                chunks.append(compressor.compress(chunk))
+    if compressor is None:
+        return ZipMember(name, ZIP_STORED, crc, size, None, mode,
+                         source=path, source_size=size)
+    chunks.append(compressor.flush())
+    return ZipMember(name, ZIP_DEFLATED, crc, size, b''.join(chunks), mode)
+
+
+def get_member_mode(st_mode: int) -> int:
+    """Returns the permission bits to archive a file with the given mode with.
+
+    Only the executable bit is kept so that umask differences between machines
+    do not change the archive.
+    """
+    return 0o755 if st_mode & stat.S_IXUSR else 0o644
+
+
+def compress_bytes(contents: bytes, name: str, mode: int = 0o644,
+                   level: int = COMPRESSION_LEVEL) -> ZipMember:
+    """Compresses the given contents into a zip member like compress_file,
+    holding the compressed contents in memory.
+
+    Args:
+        contents: The contents of the member
+        name: The path of the member in the archive
+        mode: The Unix permission bits of the member
+        level: The zlib compression level
+
+    Returns:
+        The compressed ZipMember.
+    """
+    crc = zlib.crc32(contents)
+    if Path(name).suffix.lower() in COMPRESSED_SUFFIXES:
+        return ZipMember(name, ZIP_STORED, crc, len(contents), contents, mode)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = compressor.compress(contents) + compressor.flush()
+    return ZipMember(name, ZIP_DEFLATED, crc, len(contents), data, mode)
+
+
+class ZipWriter:
+    """Writer of zip archives from precompressed members.
+
+    Members are written in the order they are added with fixed timestamps and
+    no data that depends on the machine or time they were written on, so the
+    same members always produce the same archive. Archives and members larger
+    than 4 GiB or with more than 65535 members use the zip64 extensions.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self._offset = 0
+        self._central_directory = []
+
+    def _write(self, data: bytes):
+        self.file.write(data)
+        self._offset += len(data)
+
+    def _copy(self, member: ZipMember):
+        """Copies the compressed contents of a member from its source file in
+        chunks, raising an OSError if the source was truncated or, for stored
+        members, no longer has the member's CRC."""
+        crc = 0
+        remaining = member.source_size
+        with open(member.source, 'rb') as f:
+            f.seek(member.source_offset)
+            while remaining > 0:
+                chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise OSError(f'{member.source} is truncated')
+                crc = zlib.crc32(chunk, crc)
+                self._write(chunk)
+                remaining -= len(chunk)
+        if member.method == ZIP_STORED and crc != member.crc:
+            raise OSError(f'{member.source} changed while it was archived')
+
+    def add(self, member: ZipMember) -> int:
+        """Writes the given member to the archive.
+
+        Returns:
+            The offset of the member's compressed data in the archive.
+        """
+        name = member.name.encode('utf-8')
+        offset = self._offset
+        compressed_size = member.compressed_size
+        zip64 = member.size >= _ZIP64_LIMIT \
+            or compressed_size >= _ZIP64_LIMIT
+        extra = struct.pack('<HHQQ', 1, 16, member.size, compressed_size) \
+            if zip64 else b''
+        self._write(_LOCAL_HEADER.pack(
+            0x04034b50,
+            _ZIP64_VERSION_NEEDED if zip64 else _VERSION_NEEDED,
+            _UTF8_FLAG, member.method, DOS_TIME, DOS_DATE, member.crc,
+            _ZIP64_LIMIT if zip64 else compressed_size,
+            _ZIP64_LIMIT if zip64 else member.size,
+            len(name), len(extra)))
+        self._write(name)
+        self._write(extra)
+        data_offset = self._offset
+        if member.data is not None:
+            self._write(member.data)
+        else:
+            self._copy(member)
+        self._central_directory.append((member, name, offset))
+        return data_offset
+
+    def _central_header(self, member: ZipMember, name: bytes,
+                        offset: int) -> bytes:
+        zip64_fields = []
+        size, compressed_size, header_offset = \
+            member.size, member.compressed_size, offset
+        if size >= _ZIP64_LIMIT:
+            zip64_fields.append(size)
+            size = _ZIP64_LIMIT
+        if compressed_size >= _ZIP64_LIMIT:
+            zip64_fields.append(compressed_size)
+            compressed_size = _ZIP64_LIMIT
+        if header_offset >= _ZIP64_LIMIT:
+            zip64_fields.append(header_offset)
+            header_offset = _ZIP64_LIMIT
+        extra = struct.pack(
+            f'<HH{len(zip64_fields)}Q', 1, 8 * len(zip64_fields),
+            *zip64_fields) if zip64_fields else b''
+        return _CENTRAL_HEADER.pack(
+            0x02014b50, _UNIX_VERSION_MADE_BY,
+            _ZIP64_VERSION_NEEDED if zip64_fields else _VERSION_NEEDED,
+            _UTF8_FLAG, member.method, DOS_TIME, DOS_DATE, member.crc,
+            compressed_size, size, len(name), len(extra), 0, 0, 0,
+            (stat.S_IFREG | member.mode) << 16, header_offset) + name + extra
+
+    def close(self):
+        """Writes the central directory, which completes the archive."""
+        start = self._offset
+        for member, name, offset in self._central_directory:
+            self._write(self._central_header(member, name, offset))
+        size = self._offset - start
+        count = len(self._central_directory)
+        if count >= _ZIP64_COUNT_LIMIT or start >= _ZIP64_LIMIT \
+                or size >= _ZIP64_LIMIT:
+            end_offset = self._offset
+            self._write(_ZIP64_END_RECORD.pack(
+                0x06064b50, _ZIP64_END_RECORD.size - 12,
+                _UNIX_VERSION_MADE_BY, _ZIP64_VERSION_NEEDED, 0, 0, count,
+                count, size, start))
+            self._write(_ZIP64_END_LOCATOR.pack(
+                0x07064b50, 0, end_offset, 1))
+        self._write(_END_RECORD.pack(
+            0x06054b50, 0, 0, min(count, _ZIP64_COUNT_LIMIT),
+            min(count, _ZIP64_COUNT_LIMIT), min(size, _ZIP64_LIMIT),
+            min(start, _ZIP64_LIMIT), 0))
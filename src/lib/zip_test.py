@@ -0,0 +1,63 @@
+"""Unit testing for zip.py"""
+
+import io
+import os
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+from src.lib.zip import ZIP_STORED, ZipWriter, compress_file
+
+
+def test_zip_writer(tmp_path, create_file):
+    """Tests that archives written from compressed members can be read back
+    with their contents and permissions."""
+    script = create_file(tmp_path / 'run.sh', '#!/bin/sh\n')
+    os.chmod(script, 0o775)
+    text = create_file(tmp_path / 'a.txt', 'text ' * 1000)
+    buffer = io.BytesIO()
+    writer = ZipWriter(buffer)
+    writer.add(compress_file(text, 'dir/a.txt'))
+    writer.add(compress_file(script, 'run.sh'))
+    writer.close()
+
+    with zipfile.ZipFile(buffer) as archive:
+        assert archive.testzip() is None
+        assert archive.read('dir/a.txt') == b'text ' * 1000
+        assert archive.getinfo('dir/a.txt').compress_size < 1000
+        assert archive.getinfo('run.sh').external_attr >> 16 == 0o100755
+        assert archive.getinfo('dir/a.txt').external_attr >> 16 == 0o100644
+
+
+def test_compress_file_stores_compressed_formats(tmp_path, create_file):
+    """Tests that files in compressed formats are not deflated again, and are
+    copied from the file when written rather than held in memory."""
+    member = compress_file(create_file(tmp_path / 'a.jar', 'a' * 100), 'a.jar')
+    assert member.method == ZIP_STORED
+    assert member.data is None
+    assert member.compressed_size == 100
+
+
+@patch('src.lib.zip.READ_CHUNK_SIZE', 64)
+def test_zip_writer_copies_stored_members(tmp_path, create_file):
+    """Tests that stored members are copied from their files in chunks."""
+    path = create_file(tmp_path / 'a.jar', 'jar contents ' * 100)
+    buffer = io.BytesIO()
+    writer = ZipWriter(buffer)
+    writer.add(compress_file(path, 'mods/a.jar'))
+    writer.close()
+
+    with zipfile.ZipFile(buffer) as archive:
+        assert archive.testzip() is None
+        assert archive.read('mods/a.jar') == b'jar contents ' * 100
+
+
+def test_zip_writer_stored_member_changed(tmp_path, create_file):
+    """Tests that a stored member whose file changed after it was read is not
+    written with a stale CRC."""
+    path = create_file(tmp_path / 'a.jar', 'a' * 100)
+    member = compress_file(path, 'a.jar')
+    create_file(path, 'b' * 100)
+    with pytest.raises(OSError):
+        ZipWriter(io.BytesIO()).add(member)
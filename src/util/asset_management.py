@@ -1,36 +1,53 @@
 """Helper functions for installing and uninstalling assets."""
 
 import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Callable, Union
+from typing import Callable, Iterable, Optional, Union
+from urllib.parse import urlparse
 
 import requests
 from click import ClickException
 
 from src.config.lockfile_entry import LockfileEntry
-from src.lib.multikey_dict import MultiKeyDict
+from src.util.enum import AssetType
+from src.util.store import AssetStore
 from src.util.web import download_file
 
-
-def create_entry_queue(
-        lockfile_entries: MultiKeyDict, to_install: set) -> list[LockfileEntry]:
-    """Given a lookup dictionary of lockfile entries and a set of asset
-    references, return a list of the associated LockfileEntry objects."""
-    queue = []
-    for queued_asset in to_install:
-        queue.append(lockfile_entries.get_by_multikey(queued_asset))
-    return queue
+# Maximum number of downloads in flight at once across all hosts.
+MAX_DOWNLOAD_WORKERS = 8
+# Maximum number of concurrent downloads from a single host.
+MAX_DOWNLOADS_PER_HOST = 4
 
 
 def install_asset(
-        lockfile_entry: LockfileEntry, asset_path: Path) -> str:
-    """Installs the given asset to the asset path."""
+        lockfile_entry: LockfileEntry, asset_path: Path,
+        store: Optional[AssetStore] = None) -> str:
+    """Installs the given asset to the asset path.
+
+    If a store is given, the asset is installed from the store without
+    downloading it when its SHA512 hash is known and stored, downloaded assets
+    are added to the store, and interrupted downloads are kept in the store to
+    be resumed by the next install.
+    """
     try:
-        cdn_link = lockfile_entry.asset.cdn_link
         file_path = asset_path / lockfile_entry.file_name
         file_hashes = lockfile_entry.hash
-        download_file(cdn_link, file_path, file_hashes)
-        lockfile_entry.hash.populate_hashes(file_path)
+        if store is not None and store.fetch(file_hashes.sha512, file_path):
+            file_hashes.populate_hashes(file_path)
+            return lockfile_entry.display_name
+        cdn_link = lockfile_entry.asset.cdn_link
+        # Keep interrupted downloads in the store so that they can be resumed
+        # after the temporary asset directory is gone
+        saved_hash = file_hashes.get_saved_hash()
+        part_path = store.get_partial_path(*saved_hash) \
+            if store is not None and saved_hash is not None else None
+        downloaded_hashes = download_file(
+            cdn_link, file_path, file_hashes, part_path=part_path)
+        file_hashes.populate_hashes(file_path, downloaded_hashes)
+        if store is not None:
+            store.add(file_path, file_hashes.sha512)
         return lockfile_entry.display_name
     except requests.HTTPError as error:
         raise ClickException(
@@ -42,25 +59,145 @@ def install_asset(
             + "Downloaded file hash does not match expected hash") from error
 
 
+def _get_asset_path(asset_path: Union[Path, dict[AssetType, Path]],
+                    lockfile_entry: LockfileEntry) -> Path:
+    """Returns the directory to install the given entry to."""
+    if isinstance(asset_path, dict):
+        return asset_path[lockfile_entry.asset_type]
+    return asset_path
+
+
+def _rollback_installed(lockfile_entries: list[LockfileEntry],
+                        asset_path: Union[Path, dict[AssetType, Path]]):
+    """Removes the files of the given installed entries from the asset path."""
+    for entry in lockfile_entries:
+        file_path = _get_asset_path(asset_path, entry) / entry.file_name
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
 def install_assets(
         lockfile_entries: list[LockfileEntry],
-        asset_path: Path) -> list[str]:
+        asset_path: Union[Path, dict[AssetType, Path]], max_workers: int = MAX_DOWNLOAD_WORKERS,
+        max_per_host: int = MAX_DOWNLOADS_PER_HOST,
+        store: Optional[AssetStore] = None) -> list[str]:
     """Given a list of assets to install, installs the assets to the asset
-    path."""
-    result = []
+    path.
+
+    Downloads run concurrently on a bounded thread pool, with at most
+    max_per_host downloads in flight against any single host. The install is
+    all-or-nothing: if any asset fails to install, pending downloads are
+    cancelled, every asset installed by this call is removed from the asset
+    path, and the first error is raised.
+
+    Entries of several asset types can be installed on the same pool by
+    giving the directory of each type.
+
+    Args:
+        lockfile_entries: The lockfile entries to install
+        asset_path: The directory to install the assets to, or a dict mapping
+            each asset type to the directory to install its assets to
+        max_workers: The maximum number of concurrent downloads
+        max_per_host: The maximum number of concurrent downloads per host
+        store: An optional store to install assets from and add downloaded
+            assets to
+
+    Returns:
+        The display names of the installed assets, in the same order as the
+        given lockfile entries.
+    """
+    if len(lockfile_entries) == 0:
+        return []
+    host_limits = {}
     for entry in lockfile_entries:
-        try:
-            result.append(
-                install_asset(entry, asset_path))
-        except (requests.HTTPError, ValueError) as error:
-            raise error
-    return result
+        host = urlparse(entry.asset.cdn_link).netloc
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(max_per_host)
+
+    def _install(entry: LockfileEntry) -> str:
+        with host_limits[urlparse(entry.asset.cdn_link).netloc]:
+            return install_asset(
+                entry, _get_asset_path(asset_path, entry), store)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_install, entry)
+                   for entry in lockfile_entries]
+        wait(futures, return_when=FIRST_EXCEPTION)
+        for future in futures:
+            future.cancel()
+    # Leaving the executor block waits for any in-flight downloads to finish,
+    # so every future is settled here.
+    failed = [future for future in futures
+              if not future.cancelled() and future.exception() is not None]
+    if len(failed) > 0:
+        _rollback_installed([
+            entry for entry, future in zip(lockfile_entries, futures)
+            if not future.cancelled() and future.exception() is None
+        ], asset_path)
+        raise failed[0].exception()
+    return [future.result() for future in futures]
+
+
+def rename_assets(
+        renamed: list[tuple[Path, LockfileEntry]], asset_path: Path,
+        echo: Callable,
+        replaceable: Iterable[str] = ()) -> list[LockfileEntry]:
+    """Given files in the asset path that have the contents of a lockfile
+    entry under another name, moves each of them to the file name of its
+    entry.
+
+    Files are first moved to temporary names, so that files which swapped
+    names do not overwrite each other. A file is not moved if the name of its
+    entry is held by a file that is neither being renamed itself nor
+    replaceable, since that file is not in the lockfile and would be lost.
+
+    Args:
+        renamed: Pairs of the path of a file and the entry it should be
+            renamed to, like AssetDiff.renamed
+        asset_path: The directory containing the files
+        echo: The function to report each rename with
+        replaceable: The names of files that renames may replace, such as the
+            modified files in AssetDiff.modified
+
+    Returns:
+        The entries whose files were not renamed, which still have to be
+        installed.
+    """
+    replaceable = set(replaceable)
+    renames = list(renamed)
+    skipped = []
+    # Skipping a rename keeps its file in place, which can block another
+    blocked = True
+    while blocked:
+        sources = {path.name for path, _ in renames}
+        blocked = [(path, entry) for path, entry in renames
+                   if entry.file_name not in sources
+                   and entry.file_name not in replaceable
+                   and os.path.lexists(asset_path / entry.file_name)]
+        for path, entry in blocked:
+            echo(f'Not renaming {path.name} to {entry.file_name}, which is '
+                 + 'taken by a file not in the lockfile')
+            renames.remove((path, entry))
+            skipped.append(entry)
+    tmp_paths = []
+    for i, (path, _) in enumerate(renames):
+        tmp_path = asset_path / f'.{path.name}.{i}.rename'
+        os.replace(asset_path / path.name, tmp_path)
+        tmp_paths.append(tmp_path)
+    for tmp_path, (path, entry) in zip(tmp_paths, renames):
+        os.replace(tmp_path, asset_path / entry.file_name)
+        echo(f'Renamed {path.name} to {entry.file_name}')
+    return skipped
 
 
 def uninstall_asset(
         lockfile_entry: Union[LockfileEntry, Path],
         asset_path: Path, echo: Callable) -> str:
-    """Uninstalls the given asset located at the given path."""
+    """Uninstalls the given asset located at the given path.
+
+    If given a Path instead of a lockfile entry, the file with the same name in
+    the asset path is removed.
+    """
     if isinstance(lockfile_entry, LockfileEntry):
         file_path = asset_path / lockfile_entry.file_name
         if os.path.exists(file_path):
@@ -68,8 +205,9 @@ def uninstall_asset(
             echo(f'Uninstalled {lockfile_entry.display_name}')
         return lockfile_entry.display_name
 
-    if os.path.exists(lockfile_entry):
-        os.remove(lockfile_entry)
+    file_path = asset_path / lockfile_entry.name
+    if os.path.exists(file_path):
+        os.remove(file_path)
         echo(f'Uninstalled {lockfile_entry.name}')
         return lockfile_entry.name
 
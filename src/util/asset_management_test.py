@@ -0,0 +1,174 @@
+"""Unit testing for asset_management.py"""
+
+import dataclasses
+import time
+from unittest.mock import patch
+
+import pytest
+from click import ClickException
+
+from src.config.lockfile_entry import HashEntry
+from src.util.asset_management import (install_asset, install_assets,
+                                       rename_assets)
+from src.util.enum import AssetType
+from src.util.store import AssetStore
+
+
+@patch('src.config.lockfile_entry.HashEntry.populate_hashes')
+@patch('src.util.asset_management.download_file')
+class InstallAssetsTest:
+    def test_install_assets_preserves_order(
+            self, mock_download_file, _, tmp_path, create_file,
+            make_lockfile_entry):
+        """Tests that results are returned in the order of the given entries
+        regardless of the order the downloads finish in."""
+        entries = [make_lockfile_entry(f'{i}.jar', f'https://host{i % 2}/{i}.jar')
+                   for i in range(6)]
+
+        def _mock_download_file(url, dest, file_hashes, part_path=None):
+            # Earlier entries finish last
+            time.sleep(0.01 * (6 - int(dest.stem)))
+            create_file(dest, url)
+        mock_download_file.side_effect = _mock_download_file
+
+        result = install_assets(entries, tmp_path, max_workers=6)
+        assert result == [f'{i}.jar' for i in range(6)]
+        for i in range(6):
+            assert (tmp_path / f'{i}.jar').is_file()
+
+    def test_install_assets_by_type(
+            self, mock_download_file, _, tmp_path, create_file,
+            make_lockfile_entry):
+        """Tests that entries of several asset types are installed to the
+        directory of their type on one pool."""
+        entries = [
+            make_lockfile_entry('a.jar'),
+            dataclasses.replace(make_lockfile_entry('b.zip'),
+                                asset_type=AssetType.RESOURCE_PACK)]
+        asset_paths = {AssetType.MOD: tmp_path / 'mods',
+                       AssetType.RESOURCE_PACK: tmp_path / 'resourcepacks'}
+        for path in asset_paths.values():
+            path.mkdir()
+        mock_download_file.side_effect = \
+            lambda url, dest, file_hashes, part_path=None: create_file(dest, url)
+
+        assert install_assets(entries, asset_paths) == ['a.jar', 'b.zip']
+        assert (tmp_path / 'mods' / 'a.jar').is_file()
+        assert (tmp_path / 'resourcepacks' / 'b.zip').is_file()
+
+    def test_install_assets_limits_per_host(
+            self, mock_download_file, _, tmp_path, create_file,
+            make_lockfile_entry):
+        """Tests that no more than max_per_host downloads run against a single
+        host at once."""
+        entries = [make_lockfile_entry(f'{i}.jar', 'https://host/file')
+                   for i in range(8)]
+        in_flight = []
+        peak = []
+
+        def _mock_download_file(url, dest, file_hashes, part_path=None):
+            in_flight.append(dest)
+            peak.append(len(in_flight))
+            time.sleep(0.01)
+            create_file(dest, url)
+            in_flight.remove(dest)
+        mock_download_file.side_effect = _mock_download_file
+
+        install_assets(entries, tmp_path, max_workers=8, max_per_host=2)
+        assert max(peak) <= 2
+
+    def test_install_assets_rolls_back_on_failure(
+            self, mock_download_file, _, tmp_path, create_file,
+            make_lockfile_entry):
+        """Tests that a failed download removes every asset installed by the
+        same call."""
+        entries = [make_lockfile_entry(f'{i}.jar', f'https://host/{i}.jar')
+                   for i in range(4)]
+        existing = create_file(tmp_path / 'existing.jar')
+
+        def _mock_download_file(url, dest, file_hashes, part_path=None):
+            if dest.name == '3.jar':
+                time.sleep(0.02)
+                raise ValueError('hash mismatch')
+            create_file(dest, url)
+        mock_download_file.side_effect = _mock_download_file
+
+        with pytest.raises(ClickException):
+            install_assets(entries, tmp_path)
+        assert sorted(p.name for p in tmp_path.iterdir()) == [existing.name]
+
+
+@patch('src.util.asset_management.download_file')
+def test_install_asset_from_store(mock_download_file, tmp_path, create_file,
+                                  make_lockfile_entry):
+    """Tests that a downloaded asset is added to the store and reinstalled
+    from it without downloading it again."""
+    store = AssetStore(tmp_path / 'store')
+    entry = make_lockfile_entry('a.jar', 'https://host/a.jar')
+    entry.hash = HashEntry(sha1=None, sha512=None, md5=None)
+
+    def _mock_download_file(url, dest, file_hashes, part_path=None):
+        create_file(dest, 'a')
+    mock_download_file.side_effect = _mock_download_file
+
+    install_asset(entry, tmp_path / 'first', store)
+    assert store.contains(entry.hash.sha512)
+
+    (tmp_path / 'second').mkdir()
+    second_entry = make_lockfile_entry('a.jar', 'https://host/a.jar')
+    second_entry.hash = HashEntry(
+        sha1=None, sha512=entry.hash.sha512, md5=None)
+    install_asset(second_entry, tmp_path / 'second', store)
+    mock_download_file.assert_called_once()
+    assert (tmp_path / 'second' / 'a.jar').read_text() == 'a'
+    assert second_entry.hash == entry.hash
+
+
+def test_rename_assets(tmp_path, make_lockfile_entry):
+    """Tests that renamed assets are moved to the file names of their entries,
+    including files that swapped names."""
+    (tmp_path / 'a.jar').write_text('b', encoding='utf-8')
+    (tmp_path / 'b.jar').write_text('a', encoding='utf-8')
+    (tmp_path / 'c-old.jar').write_text('c', encoding='utf-8')
+    messages = []
+    rename_assets([
+        (tmp_path / 'b.jar', make_lockfile_entry('a.jar')),
+        (tmp_path / 'a.jar', make_lockfile_entry('b.jar')),
+        (tmp_path / 'c-old.jar', make_lockfile_entry('c.jar')),
+    ], tmp_path, messages.append)
+    assert sorted(path.name for path in tmp_path.iterdir()) == \
+        ['a.jar', 'b.jar', 'c.jar']
+    for name in ['a', 'b', 'c']:
+        assert (tmp_path / f'{name}.jar').read_text(encoding='utf-8') == name
+    assert messages == ['Renamed b.jar to a.jar', 'Renamed a.jar to b.jar',
+                        'Renamed c-old.jar to c.jar']
+
+
+def test_rename_assets_collision(tmp_path, make_lockfile_entry):
+    """Tests that a file is not renamed over a file that is not in the
+    lockfile, nor over a file whose own rename was skipped."""
+    (tmp_path / 'x.jar').write_text('untracked', encoding='utf-8')
+    (tmp_path / 'y.jar').write_text('x', encoding='utf-8')
+    (tmp_path / 'z.jar').write_text('y', encoding='utf-8')
+    messages = []
+    x, y = make_lockfile_entry('x.jar'), make_lockfile_entry('y.jar')
+    assert rename_assets([(tmp_path / 'y.jar', x), (tmp_path / 'z.jar', y)],
+                         tmp_path, messages.append) == [x, y]
+    for name, contents in [('x', 'untracked'), ('y', 'x'), ('z', 'y')]:
+        assert (tmp_path / f'{name}.jar').read_text(
+            encoding='utf-8') == contents
+    assert messages == [
+        'Not renaming y.jar to x.jar, which is taken by a file not in the '
+        + 'lockfile',
+        'Not renaming z.jar to y.jar, which is taken by a file not in the '
+        + 'lockfile']
+
+
+def test_rename_assets_replaceable(tmp_path, make_lockfile_entry):
+    """Tests that a file is renamed over a file that may be replaced."""
+    (tmp_path / 'a.jar').write_text('x', encoding='utf-8')
+    (tmp_path / 'b.jar').write_text('y', encoding='utf-8')
+    assert rename_assets([(tmp_path / 'a.jar', make_lockfile_entry('b.jar'))],
+                         tmp_path, lambda _: None, ['b.jar']) == []
+    assert [path.name for path in tmp_path.iterdir()] == ['b.jar']
+    assert (tmp_path / 'b.jar').read_text(encoding='utf-8') == 'x'
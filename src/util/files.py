@@ -0,0 +1,117 @@
+"""Utility file with file writing functions."""
+
+import errno
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from pathlib import Path
+
+_umask_lock = threading.Lock()
+
+
+def _get_umask() -> int:
+    """Returns the umask of the process, which can only be read by setting
+    it."""
+    with _umask_lock:
+        umask = os.umask(0o022)
+        os.umask(umask)
+    return umask
+
+
+def atomic_write(path: Path, data: bytes):
+    """Atomically replaces the contents of the file at path with data.
+
+    The data is written and fsynced to a temporary file in the same directory,
+    which is then renamed over the destination, so readers see either the old
+    or the new contents and never a partially written file. The file keeps the
+    permissions of the file it replaces, or gets the usual permissions of a new
+    file otherwise.
+
+    Args:
+        path: The path of the file to write
+        data: The bytes to write to the file
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_get_umask()
+            os.fchmod(f.fileno(), mode)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    """Atomically replaces the contents of the file at path with data like
+    atomic_write, unless the file already holds exactly that data.
+
+    Args:
+        path: The path of the file to write
+        data: The bytes to write to the file
+
+    Returns:
+        True if the file was written, False if it was unchanged.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
+def link_or_copy(src: Path, dest: Path) -> bool:
+    """Hardlinks src to dest, falling back to copying the file if the two paths
+    are on different filesystems or the filesystem does not support hardlinks.
+
+    Hardlinked files share their contents, so the linked file must only ever be
+    replaced, never modified in place.
+
+    Args:
+        src: The path of the file to link
+        dest: The path to create the link or copy at
+
+    Returns:
+        True if a hardlink was created, False if the file was copied.
+    """
+    try:
+        os.link(src, dest)
+        return True
+    except OSError:
+        shutil.copy2(src, dest)
+        return False
+
+
+def move_file(src: Path, dest: Path):
+    """Moves a file with a rename, replacing any file at dest. If the two paths
+    are on different filesystems, the file is copied next to dest and renamed
+    into place instead.
+
+    Args:
+        src: The path of the file to move
+        dest: The path to move the file to
+    """
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dest)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise error
+        tmp_dest = dest.with_name(f'.{dest.name}.tmp')
+        shutil.copy2(src, tmp_dest)
+        os.replace(tmp_dest, dest)
+        os.remove(src)
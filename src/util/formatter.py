@@ -20,6 +20,8 @@ class CustomOutputFormatter(Formatter):
             return '- ' + str(value)
         if format_spec == 'diff_plus':
             return '+ ' + str(value)
+        if format_spec == 'diff_change':
+            return '~ ' + str(value)
         if format_spec == 'separator':
             return '=' * MAX_LINE_LENGTH
         return super().format_field(value, format_spec)
@@ -1,12 +1,84 @@
 """Utility file with hashing functions."""
 
 import hashlib
+import os
+from collections.abc import Hashable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-
-import requests
+from typing import Optional
 
 from src.lib.multikey_dict import MultiKeyDict
 from src.util.enum import HashAlg
+from src.util.hash_cache import HashCache
+from src.util.profile import PROFILER
+
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+def hash_file_multi(filename: Path, algs: list[HashAlg]) -> dict[HashAlg, str]:
+    """Returns the hashes of the given file for each of the specified hashing
+    algorithms, reading the file from disk only once.
+
+    Args:
+        filename: The path to the file to hash
+        algs: The hashing algorithms to use
+
+    Returns:
+        A dict mapping each hashing algorithm to the hash of the given file as
+        a string.
+    """
+    hashers = create_hashers(algs)
+    update_hashers_from_file(hashers, filename)
+    return get_hexdigests(hashers)
+
+
+def update_hashers_from_file(
+        hashers: dict[HashAlg, 'hashlib._Hash'], filename: Path):
+    """Feeds the contents of the given file to each of the given hash objects,
+    reading the file from disk only once.
+
+    Args:
+        hashers: A dict mapping hashing algorithms to hash objects
+        filename: The path to the file to hash
+    """
+    buffer = bytearray(HASH_READ_SIZE)
+    view = memoryview(buffer)
+    total = 0
+    with open(filename, 'rb', buffering=0) as f:
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                break
+            total += size
+            for hasher in hashers.values():
+                hasher.update(view[:size])
+    PROFILER.count('bytes_hashed', total)
+
+
+def hash_file_cached(filename: Path, algs: list[HashAlg],
+                     cache: Optional[HashCache] = None) -> dict[HashAlg, str]:
+    """Returns the hashes of the given file like hash_file_multi, using the
+    given hash cache to skip reading files that have not changed.
+
+    Args:
+        filename: The path to the file to hash
+        algs: The hashing algorithms to use
+        cache: An optional hash cache to look up and store hashes in
+
+    Returns:
+        A dict mapping each hashing algorithm to the hash of the given file as
+        a string.
+    """
+    if cache is None:
+        return hash_file_multi(filename, algs)
+    hashes = cache.get(filename, algs)
+    if hashes is not None:
+        return hashes
+    stat = os.stat(filename)
+    hashes = hash_file_multi(filename, algs)
+    cache.put(filename, stat, hashes)
+    return hashes
 
 
 def hash_file(filename: Path, alg: HashAlg) -> str:
@@ -19,27 +91,31 @@ def hash_file(filename: Path, alg: HashAlg) -> str:
     Returns:
         A hash of the given file as a string.
     """
-    with open(filename, 'rb') as f:
-        return hashlib.file_digest(f, alg.value).hexdigest()
+    return hash_file_multi(filename, [alg])[alg]
 
 
-def hash_response_content(response: requests.Response, alg: HashAlg) -> str:
-    """Returns the hash of the file contents in the given response object.
+def create_hashers(algs: list[HashAlg]) -> dict[HashAlg, 'hashlib._Hash']:
+    """Returns a dict of new hash objects for each of the given algorithms.
 
     Args:
-        response: The response object holding the file contents to hash
-        alg: The hashing algorithm to use
+        algs: The hashing algorithms to create hash objects for
 
     Returns:
-        A hash of the given bytes as a string.
+        A dict mapping each hashing algorithm to a new hash object.
     """
-    hasher = hashlib.new(alg.value)
-    for chunk in response.iter_content(chunk_size=65536):
-        if chunk:
-            hasher.update(chunk)
-        else:
-            break
-    return hasher.hexdigest()
+    return {alg: hashlib.new(alg.value) for alg in algs}
+
+
+def get_hexdigests(hashers: dict[HashAlg, 'hashlib._Hash']) -> dict[HashAlg, str]:
+    """Returns the hex digests of the given dict of hash objects.
+
+    Args:
+        hashers: A dict mapping hashing algorithms to hash objects
+
+    Returns:
+        A dict mapping each hashing algorithm to its hex digest.
+    """
+    return {alg: hasher.hexdigest() for alg, hasher in hashers.items()}
 
 
 def hash_asset_dir(dir_: Path, alg: HashAlg) -> dict[str, str]:
@@ -57,15 +133,64 @@ def hash_asset_dir(dir_: Path, alg: HashAlg) -> dict[str, str]:
         A dict indexed by the file hash containing the file hash and file name.
     """
     hashes = {}
-    asset_files = list(dir_.glob('*.jar')) + list(dir_.glob('*.zip'))
-    for file in asset_files:
-        hashes[hash_file(file, alg)] = file.name
+    for file in list_asset_files(dir_):
+        hashes[hash_file_multi(file, [alg])[alg]] = file.name
 
     return hashes
 
 
-def hash_asset_dir_multi_hash(dir_: Path,
-                              algs: list[HashAlg]) -> MultiKeyDict:
+def list_asset_files(dir_: Path) -> list[Path]:
+    """Returns the .jar and .zip files in the given directory, sorted by name.
+    """
+    return sorted(list(dir_.glob('*.jar')) + list(dir_.glob('*.zip')))
+
+
+def hash_asset_dirs(
+        dirs: dict[Hashable, Path], algs: list[HashAlg],
+        cache: Optional[HashCache] = None,
+        workers: Optional[int] = None) -> dict[Hashable, MultiKeyDict]:
+    """Hashes the asset files of several directories at once, returning a
+    multikey dict for each directory like hash_asset_dir_multi_hash.
+
+    The files of every directory are hashed together on a single thread pool.
+    hashlib releases the GIL while hashing, so this scales with the number of
+    cores. Results are merged in sorted file order, so the returned dicts do
+    not depend on the order in which hashing finishes.
+
+    Args:
+        dirs: A dict mapping arbitrary keys, such as asset types, to the
+            directories to hash
+        algs: The hashing algorithms to use when generating hashes for the file
+        cache: An optional hash cache to reuse the hashes of unchanged files
+        workers: The number of threads to hash with, defaults to the number of
+            CPUs
+
+    Returns:
+        A dict mapping each key of dirs to a multikey dict keyed on the asset
+        name and generated hashes of the asset files in that directory,
+        containing the paths to the asset files.
+    """
+    sorted_algs = sorted(algs, key=lambda member: member.value)
+    with PROFILER.phase('hash'):
+        asset_files = [(key, path) for key, dir_ in dirs.items()
+                       for path in list_asset_files(dir_)]
+        with ThreadPoolExecutor(
+                max_workers=workers or os.cpu_count()) as executor:
+            all_hashes = list(executor.map(
+                lambda item: hash_file_cached(item[1], sorted_algs, cache),
+                asset_files))
+
+    multikey_dicts = {key: MultiKeyDict(len(algs) + 1) for key in dirs}
+    for (key, path), hashes in zip(asset_files, all_hashes):
+        multikey = tuple([path.name] + [hashes[alg] for alg in sorted_algs])
+        multikey_dicts[key].add(multikey, path)
+    return multikey_dicts
+
+
+def hash_asset_dir_multi_hash(
+        dir_: Path, algs: list[HashAlg],
+        cache: Optional[HashCache] = None,
+        workers: Optional[int] = None) -> MultiKeyDict:
     """Returns a multikey dict containing the path to the corresponding asset
     file path.
 
@@ -74,21 +199,14 @@ def hash_asset_dir_multi_hash(dir_: Path,
     hashing algorithm matters and must be consistent.
 
     Args:
-        dir_: The directory to search for .jar files to hash algs: The hashing
-        algorithms to use when generating hashes for the file
+        dir_: The directory to search for .jar files to hash
+        algs: The hashing algorithms to use when generating hashes for the file
+        cache: An optional hash cache to reuse the hashes of unchanged files
+        workers: The number of threads to hash with, defaults to the number of
+            CPUs
 
     Returns:
         A multikey dict keyed on the asset name and generated hashes of the
         asset file, containing the path to the asset file.
     """
-    multikey_dict = MultiKeyDict(len(algs) + 1)
-    asset_files = list(dir_.glob('*.jar')) + list(dir_.glob('*.zip'))
-    for path in asset_files:
-        keys = [path.name]
-        for alg in sorted(algs, key=lambda member: member.value):
-            keys.append(hash_file(path, alg))
-        multikey = tuple(keys)
-
-        multikey_dict.add(multikey, path)
-
-    return multikey_dict
+    return hash_asset_dirs({dir_: dir_}, algs, cache, workers)[dir_]
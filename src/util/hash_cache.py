@@ -0,0 +1,138 @@
+"""Persistent cache of file hashes keyed on each file's stat signature."""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+from src.util.enum import HashAlg
+from src.util.files import atomic_write
+from src.util.paths import get_m3_dir
+
+HASH_CACHE_DIR = 'cache'
+HASH_CACHE_FILENAME = 'hashes.json'
+# Maximum number of files to keep hashes for, least recently used files are
+# evicted first when the cache is saved.
+HASH_CACHE_MAX_ENTRIES = 20000
+# Minimum number of seconds between updates to the last use time of an entry,
+# so that commands which only read the cache do not rewrite it.
+HASH_CACHE_USED_INTERVAL = 24 * 60 * 60
+
+
+def _get_signature(stat: os.stat_result) -> list[int]:
+    """Returns the stat signature used to detect whether a file changed."""
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+class HashCache:
+    """On-disk cache mapping file paths to their hashes.
+
+    An entry is only returned while the file's size, modification time and
+    inode are unchanged since it was hashed, so modified or replaced files are
+    always rehashed. The cache is loaded once on construction and only written
+    back to disk when save() is called, if it changed. The last use time of
+    an entry is only updated once every HASH_CACHE_USED_INTERVAL seconds, so
+    lookups alone rarely require a write. It is safe to share between threads.
+    """
+
+    def __init__(self, path: Optional[Path] = None,
+                 max_entries: int = HASH_CACHE_MAX_ENTRIES):
+        self.path = path if path is not None else (
+            get_m3_dir(HASH_CACHE_DIR) / HASH_CACHE_FILENAME)
+        self.max_entries = max_entries
+        self.entries = self._load()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            entries = orjson.loads(self.path.read_bytes())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    @staticmethod
+    def _get_key(path: Path) -> str:
+        return os.path.abspath(path)
+
+    def get(self, path: Path, algs: list[HashAlg]) -> Optional[dict[HashAlg, str]]:
+        """Returns the cached hashes of the given file, or None if the file
+        changed since it was hashed or a requested algorithm is missing.
+
+        Args:
+            path: The path to the file to look up
+            algs: The hashing algorithms the caller needs hashes for
+
+        Returns:
+            A dict mapping each requested algorithm to the file's hash, or
+            None on a cache miss.
+        """
+        signature = _get_signature(os.stat(path))
+        with self._lock:
+            entry = self.entries.get(self._get_key(path))
+            if entry is None or entry['signature'] != signature:
+                return None
+            hashes = entry['hashes']
+            if any(alg.value not in hashes for alg in algs):
+                return None
+            now = time.time()
+            if now - entry['used'] >= HASH_CACHE_USED_INTERVAL:
+                entry['used'] = now
+                self._dirty = True
+            return {alg: hashes[alg.value] for alg in algs}
+
+    def put(self, path: Path, stat: os.stat_result,
+            hashes: dict[HashAlg, str]):
+        """Stores the hashes of the given file.
+
+        Args:
+            path: The path to the hashed file
+            stat: The stat of the file taken before it was hashed. The hashes
+                are discarded if the file changed while it was being hashed.
+            hashes: A dict mapping hashing algorithms to the file's hashes
+        """
+        signature = _get_signature(stat)
+        if signature != _get_signature(os.stat(path)):
+            return
+        key = self._get_key(path)
+        with self._lock:
+            entry = self.entries.get(key)
+            stored = {}
+            if entry is not None and entry['signature'] == signature:
+                stored = entry['hashes']
+            stored.update({alg.value: hash_ for alg, hash_ in hashes.items()})
+            self.entries[key] = {
+                'signature': signature,
+                'hashes': stored,
+                'used': time.time()
+            }
+            self._dirty = True
+
+    def invalidate(self, path: Path):
+        """Removes the entry for the given file if it exists."""
+        with self._lock:
+            if self.entries.pop(self._get_key(path), None) is not None:
+                self._dirty = True
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        with self._lock:
+            self.entries = {}
+            self._dirty = True
+
+    def save(self):
+        """Writes the cache to disk if it changed, evicting the least recently
+        used entries beyond max_entries."""
+        with self._lock:
+            if not self._dirty:
+                return
+            if len(self.entries) > self.max_entries:
+                newest = sorted(self.entries.items(),
+                                key=lambda item: item[1]['used'],
+                                reverse=True)[:self.max_entries]
+                self.entries = dict(newest)
+            atomic_write(self.path, orjson.dumps(self.entries))
+            self._dirty = False
@@ -0,0 +1,83 @@
+"""Unit testing for hash_cache.py"""
+
+import os
+from unittest.mock import patch
+
+from src.config.lockfile import HASH_ALGS
+from src.util.enum import HashAlg
+from src.util.hash import hash_file_cached, hash_file_multi
+from src.util.hash_cache import HashCache
+
+
+def test_hash_cache_hit(tmp_path, create_file):
+    """Tests that hashes of an unchanged file are served from the cache,
+    including after the cache is saved and reloaded."""
+    cache_path = tmp_path / 'hashes.json'
+    file_ = create_file(tmp_path / 'a.jar', 'a')
+    cache = HashCache(cache_path)
+    hashes = hash_file_cached(file_, HASH_ALGS, cache)
+    cache.save()
+
+    with patch('src.util.hash.hash_file_multi') as mock_hash_file_multi:
+        assert hash_file_cached(
+            file_, HASH_ALGS, HashCache(cache_path)) == hashes
+        mock_hash_file_multi.assert_not_called()
+
+
+def test_hash_cache_invalidated_on_change(tmp_path, create_file):
+    """Tests that a file whose stat signature changed is rehashed."""
+    file_ = create_file(tmp_path / 'a.jar', 'a')
+    cache = HashCache(tmp_path / 'hashes.json')
+    hash_file_cached(file_, HASH_ALGS, cache)
+
+    create_file(file_, 'modified contents')
+    assert cache.get(file_, HASH_ALGS) is None
+    assert hash_file_cached(file_, HASH_ALGS, cache) == hash_file_multi(
+        file_, HASH_ALGS)
+
+
+def test_hash_cache_missing_alg(tmp_path, create_file):
+    """Tests that a lookup for an algorithm that was never computed misses."""
+    file_ = create_file(tmp_path / 'a.jar', 'a')
+    cache = HashCache(tmp_path / 'hashes.json')
+    hash_file_cached(file_, [HashAlg.SHA1], cache)
+    assert cache.get(file_, [HashAlg.SHA1]) is not None
+    assert cache.get(file_, [HashAlg.SHA1, HashAlg.MD5]) is None
+
+
+def test_hash_cache_eviction(tmp_path, create_file):
+    """Tests that saving the cache keeps only the most recently used
+    entries."""
+    cache_path = tmp_path / 'hashes.json'
+    cache = HashCache(cache_path, max_entries=2)
+    files = [create_file(tmp_path / f'{i}.jar', str(i)) for i in range(3)]
+    for i, file_ in enumerate(files):
+        hash_file_cached(file_, HASH_ALGS, cache)
+        cache.entries[os.path.abspath(file_)]['used'] = i
+    cache.save()
+
+    reloaded = HashCache(cache_path, max_entries=2)
+    assert reloaded.get(files[0], HASH_ALGS) is None
+    assert reloaded.get(files[1], HASH_ALGS) is not None
+    assert reloaded.get(files[2], HASH_ALGS) is not None
+
+
+def test_hash_cache_hit_not_saved(tmp_path, create_file):
+    """Tests that a cache that was only read is not rewritten, unless its
+    entries were last used long ago."""
+    cache_path = tmp_path / 'hashes.json'
+    file_ = create_file(tmp_path / 'a.jar', 'a')
+    cache = HashCache(cache_path)
+    hash_file_cached(file_, HASH_ALGS, cache)
+    cache.save()
+    stat = cache_path.stat()
+
+    cache = HashCache(cache_path)
+    assert cache.get(file_, HASH_ALGS) is not None
+    cache.save()
+    assert cache_path.stat().st_ino == stat.st_ino
+
+    cache.entries[os.path.abspath(file_)]['used'] = 0
+    assert cache.get(file_, HASH_ALGS) is not None
+    cache.save()
+    assert cache_path.stat().st_ino != stat.st_ino
@@ -4,7 +4,8 @@
 from src.config.lockfile import HASH_ALGS
 from src.lib.multikey_dict import MultiKeyDict
 from src.util.enum import HashAlg
-from src.util.hash import hash_asset_dir, hash_asset_dir_multi_hash
+from src.util.hash import (hash_asset_dir, hash_asset_dir_multi_hash,
+                           hash_asset_dirs, hash_file_multi)
 
 
 def test_hash_asset_dir(current_dir, read_json_file):
@@ -51,3 +52,31 @@ def test_hash_asset_dir_multi_hash(current_dir, read_json_file):
     ), asset_path / "c.zip")
 
     assert multikey_dict == ref_dict
+
+
+def test_hash_file_multi(current_dir, read_json_file):
+    """Tests that hashing a file with multiple algorithms at once matches the
+    hashes of each algorithm."""
+    ref_hashes = read_json_file(
+        current_dir / 'testdata/test_filename_to_hashes.json')
+    hashes = hash_file_multi(current_dir / 'testdata/mods/a.jar', HASH_ALGS)
+    assert hashes == {
+        HashAlg.SHA1: ref_hashes['sha1']['a.jar'],
+        HashAlg.SHA512: ref_hashes['sha512']['a.jar'],
+        HashAlg.MD5: ref_hashes['md5']['a.jar'],
+    }
+
+
+def test_hash_asset_dirs(current_dir, tmp_path, copy_test_data_directory):
+    """Tests that hashing several directories in parallel returns the same
+    multikey dicts as hashing each directory serially."""
+    mods_path = current_dir / 'testdata/mods'
+    other_path = copy_test_data_directory(mods_path, tmp_path / 'other')
+    multikey_dicts = hash_asset_dirs(
+        {'mods': mods_path, 'other': other_path}, HASH_ALGS, workers=4)
+    assert multikey_dicts['mods'] == hash_asset_dir_multi_hash(
+        mods_path, HASH_ALGS, workers=1)
+    assert multikey_dicts['other'] == hash_asset_dir_multi_hash(
+        other_path, HASH_ALGS, workers=1)
+    assert list(multikey_dicts['mods'].get_values()) == [
+        mods_path / 'a.jar', mods_path / 'b.jar', mods_path / 'c.zip']
@@ -1,10 +1,33 @@
 """Utility file with path manipulation functions."""
 
+import os
 from pathlib import Path
 from typing import Optional
 
 from click import ClickException
 
+# Directory holding m3's per-user state, such as the API key and caches.
+M3_HOME = Path.home() / '.m3'
+
+
+def get_m3_dir(*subdirs: str) -> Path:
+    """Returns the path to m3's per-user state directory, or a subdirectory of
+    it, creating it if it does not exist.
+
+    Args:
+        subdirs: optional path components of a subdirectory of the m3 directory
+
+    Returns:
+        The path to the directory.
+    """
+    path = M3_HOME.joinpath(*subdirs)
+    if not path.exists():
+        try:
+            os.makedirs(path, mode=0o700, exist_ok=True)
+        except Exception as e:
+            raise ClickException(f'Unable to create {path}.') from e
+    return path
+
 
 def walk_up_search(filename: str) -> Optional[Path]:
     """Walks up from the current execution context looking for a given filename.
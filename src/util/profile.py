@@ -0,0 +1,148 @@
+"""Opt-in profiling of m3 commands, enabled with m3 --profile or M3_PROFILE.
+
+Code that does significant work wraps it in PROFILER.phase() and records what
+it did with PROFILER.count(). Both do nothing unless profiling was started, so
+they are cheap enough to leave in place.
+"""
+
+import cProfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+import click
+import orjson
+
+from src.util.files import atomic_write
+
+PROFILE_ENV_VAR = 'M3_PROFILE'
+PROFILE_OUTPUT_ENV_VAR = 'M3_PROFILE_OUTPUT'
+SPEEDSCOPE_SCHEMA = 'https://www.speedscope.app/file-format-schema.json'
+
+
+class Profiler:
+    """Recorder of the time spent in each phase of a command and counters of
+    the work it did.
+
+    Phases may be nested and entered from several threads at once, in which
+    case their times are summed, so the total of a phase run on a thread pool
+    can exceed the wall clock time of the command. Every phase is also
+    recorded as an event on its thread, which write() can export as a
+    speedscope profile. If started with cprofile, the calling thread is also
+    profiled with cProfile.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._start = 0.0
+        self._end = 0.0
+        self._phases: dict[str, list] = {}
+        self._counters: dict[str, int] = {}
+        self._events: dict[int, list[tuple[str, str, float]]] = {}
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._lock = threading.Lock()
+
+    def start(self, cprofile: bool = False):
+        """Starts recording phases and counters.
+
+        Args:
+            cprofile: whether to also profile the calling thread with cProfile
+        """
+        self.enabled = True
+        self._start = time.perf_counter()
+        if cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        """Stops recording."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.enabled = False
+        self._end = time.perf_counter()
+
+    def _add_event(self, type_: str, name: str, at: float):
+        with self._lock:
+            self._events.setdefault(threading.get_ident(), []).append(
+                (type_, name, at - self._start))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Returns a context manager that records the time spent in its body
+        as the given phase."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        self._add_event('O', name, start)
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._add_event('C', name, end)
+            with self._lock:
+                totals = self._phases.setdefault(name, [0, 0.0])
+                totals[0] += 1
+                totals[1] += end - start
+
+    def count(self, name: str, amount: int = 1):
+        """Adds amount to the given counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def summary(self) -> str:
+        """Returns a table of the time spent in each phase and the value of
+        each counter."""
+        lines = [f'{"phase":<24}{"calls":>10}{"seconds":>12}']
+        for name, (calls, seconds) in sorted(self._phases.items()):
+            lines.append(f'{name:<24}{calls:>10}{seconds:>12.4f}')
+        lines.append(f'{"total":<24}{"":>10}{self._end - self._start:>12.4f}')
+        if self._counters:
+            lines.append('')
+            lines.append(f'{"counter":<24}{"value":>22}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f'{name:<24}{value:>22,}')
+        return '\n'.join(lines)
+
+    def _speedscope(self) -> dict:
+        frames = sorted({name for events in self._events.values()
+                         for _, name, _ in events})
+        frame_ids = {name: i for i, name in enumerate(frames)}
+        return {
+            '$schema': SPEEDSCOPE_SCHEMA,
+            'shared': {'frames': [{'name': name} for name in frames]},
+            'profiles': [{
+                'type': 'evented', 'name': f'Thread {i}', 'unit': 'seconds',
+                'startValue': 0, 'endValue': self._end - self._start,
+                'events': [{'type': type_, 'frame': frame_ids[name], 'at': at}
+                           for type_, name, at in events],
+            } for i, events in enumerate(self._events.values())],
+            'name': 'm3',
+            'exporter': 'm3',
+        }
+
+    def write(self, path: Path):
+        """Writes the recorded profile to the given path, as a speedscope
+        profile of the phases if it ends with .json, or as cProfile stats
+        otherwise."""
+        if path.suffix == '.json':
+            atomic_write(path, orjson.dumps(self._speedscope()))
+        elif self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+
+
+PROFILER = Profiler()
+
+
+def report(output: Optional[Path] = None):
+    """Stops profiling and prints the summary table to stderr, writing the
+    profile to output if given."""
+    PROFILER.stop()
+    click.echo(PROFILER.summary(), err=True)
+    if output is not None:
+        PROFILER.write(output)
+        click.echo(f'Wrote profile to {output}', err=True)
@@ -0,0 +1,56 @@
+"""Unit testing for profile.py"""
+
+import json
+import pstats
+
+from click.testing import CliRunner
+
+from m3 import m3
+from src.util.profile import Profiler
+
+
+def test_profiler_disabled():
+    """Tests that nothing is recorded until the profiler is started."""
+    profiler = Profiler()
+    with profiler.phase('hash'):
+        profiler.count('bytes_hashed', 10)
+    profiler.start()
+    profiler.stop()
+    assert 'hash' not in profiler.summary()
+    assert 'bytes_hashed' not in profiler.summary()
+
+
+def test_profiler_summary(tmp_path):
+    """Tests that nested phases and counters are summed into the summary and
+    exported as a speedscope profile."""
+    profiler = Profiler()
+    profiler.start()
+    with profiler.phase('apply'):
+        for _ in range(2):
+            with profiler.phase('download'):
+                profiler.count('bytes_downloaded', 1024)
+    profiler.stop()
+
+    lines = profiler.summary().splitlines()
+    assert lines[1].split()[:2] == ['apply', '1']
+    assert lines[2].split()[:2] == ['download', '2']
+    assert lines[-1].split() == ['bytes_downloaded', '2,048']
+
+    profiler.write(tmp_path / 'profile.json')
+    profile = json.loads((tmp_path / 'profile.json').read_text())
+    assert [frame['name'] for frame in profile['shared']['frames']] == [
+        'apply', 'download']
+    assert [(event['type'], event['frame'])
+            for event in profile['profiles'][0]['events']] == [
+        ('O', 0), ('O', 1), ('C', 1), ('O', 1), ('C', 1), ('C', 0)]
+
+
+def test_profile_option(tmp_path, monkeypatch):
+    """Tests that --profile-output prints the summary and writes cProfile
+    stats."""
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner(mix_stderr=False).invoke(
+        m3, ['--profile-output', 'm3.prof', 'diff'])
+    assert 'phase' in result.stderr
+    assert 'config' in result.stderr
+    assert pstats.Stats(str(tmp_path / 'm3.prof')).total_calls > 0
@@ -0,0 +1,164 @@
+"""Content-addressed store of downloaded asset files shared by every
+project."""
+
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from src.util.enum import HashAlg
+from src.util.files import link_or_copy
+from src.util.hash import hash_file
+from src.util.paths import get_m3_dir
+
+STORE_DIR = 'store'
+# Subdirectory of the store that interrupted downloads are kept in.
+PARTIAL_DIR = 'partial'
+# Seconds after which an interrupted download that was not resumed is removed.
+PARTIAL_MAX_AGE = 7 * 24 * 60 * 60
+# Environment variable to override the maximum size of the store in bytes.
+STORE_MAX_BYTES_ENV_VAR = 'M3_STORE_MAX_BYTES'
+DEFAULT_STORE_MAX_BYTES = 10 * 1024 ** 3
+
+
+class AssetStore:
+    """Store of asset files keyed by the SHA512 hash of their contents.
+
+    Files are laid out as <root>/<first two hex digits>/<sha512>. Downloaded
+    assets are added to the store and later installs of the same file are
+    served from it, hardlinked into the asset directory where possible so that
+    an asset used by several projects only takes up space once. Files in the
+    store and their links must therefore never be modified in place. Since
+    nothing stops other programs from doing so, stored files are verified
+    before they are installed, and evicted if their contents changed.
+
+    The last use of each file is tracked through its access time, and gc()
+    evicts the least recently used files once the store grows past max_bytes.
+    It is safe to share between threads and processes.
+    """
+
+    def __init__(self, path: Optional[Path] = None,
+                 max_bytes: Optional[int] = None):
+        self.path = path if path is not None else get_m3_dir(STORE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get(STORE_MAX_BYTES_ENV_VAR, DEFAULT_STORE_MAX_BYTES))
+        self._lock = threading.Lock()
+
+    def get_path(self, sha512: str) -> Path:
+        """Returns the path a file with the given SHA512 hash is stored at."""
+        return self.path / sha512[:2] / sha512
+
+    def get_partial_path(self, alg: HashAlg, hash_: str) -> Path:
+        """Returns the path to keep an interrupted download of the file with
+        the given hash at, so that it can be resumed by a later install."""
+        partial_dir = self.path / PARTIAL_DIR
+        partial_dir.mkdir(exist_ok=True)
+        return partial_dir / f'{alg.value}-{hash_}.part'
+
+    @staticmethod
+    def _touch(path: Path):
+        """Marks the given file as used now, leaving its mtime as is."""
+        os.utime(path, ns=(time.time_ns(), path.stat().st_mtime_ns))
+
+    @staticmethod
+    def _link_into_place(src: Path, dest: Path):
+        """Links or copies src to dest, replacing dest atomically."""
+        tmp_dest = dest.with_name(f'.{dest.name}.{uuid.uuid4().hex}.tmp')
+        try:
+            link_or_copy(src, tmp_dest)
+            os.replace(tmp_dest, dest)
+        finally:
+            tmp_dest.unlink(missing_ok=True)
+
+    def contains(self, sha512: Optional[str]) -> bool:
+        """Returns True if a file with the given SHA512 hash is stored."""
+        return bool(sha512) and self.get_path(sha512).is_file()
+
+    def fetch(self, sha512: Optional[str], dest: Path) -> bool:
+        """Installs the stored file with the given SHA512 hash at dest.
+
+        The stored file is hashed first, and is evicted instead of installed
+        if it no longer has the given hash, for example because a project file
+        linked to it was written to in place. dest is therefore only left as
+        is when it is a link to the stored file if their contents are intact.
+
+        Args:
+            sha512: The SHA512 hash of the file to install
+            dest: The path to install the file at
+
+        Returns:
+            True if the file was stored and installed, False otherwise.
+        """
+        if not self.contains(sha512):
+            return False
+        path = self.get_path(sha512)
+        try:
+            if hash_file(path, HashAlg.SHA512) != sha512:
+                path.unlink(missing_ok=True)
+                return False
+            self._link_into_place(path, dest)
+            self._touch(path)
+        except FileNotFoundError:
+            # Evicted by a concurrent garbage collection
+            return False
+        return True
+
+    def add(self, path: Path, sha512: str):
+        """Adds the file at the given path to the store.
+
+        Args:
+            path: The path of the file, which must already be verified
+            sha512: The SHA512 hash of the file's contents
+        """
+        stored_path = self.get_path(sha512)
+        if stored_path.is_file():
+            self._touch(stored_path)
+            return
+        stored_path.parent.mkdir(parents=True, exist_ok=True)
+        self._link_into_place(path, stored_path)
+
+    def size(self) -> int:
+        """Returns the total size of the stored files in bytes."""
+        return sum(path.stat().st_size for path in self._list_files())
+
+    def _list_files(self) -> list[Path]:
+        return [path for path in self.path.glob('??/*')
+                if path.is_file() and not path.name.endswith('.tmp')]
+
+    def gc(self, max_bytes: Optional[int] = None) -> int:
+        """Evicts the least recently used files until the store is no larger
+        than max_bytes, and removes interrupted downloads that have not been
+        resumed for PARTIAL_MAX_AGE seconds.
+
+        Args:
+            max_bytes: The size to shrink the store to, defaults to the store's
+                max_bytes
+
+        Returns:
+            The number of bytes evicted.
+        """
+        max_bytes = max_bytes if max_bytes is not None else self.max_bytes
+        expiry = time.time() - PARTIAL_MAX_AGE
+        for path in self.path.glob(f'{PARTIAL_DIR}/*'):
+            try:
+                if path.stat().st_mtime < expiry:
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+        with self._lock:
+            files = []
+            for path in self._list_files():
+                try:
+                    files.append((path.stat(), path))
+                except FileNotFoundError:
+                    continue
+            total = sum(stat.st_size for stat, _ in files)
+            evicted = 0
+            for stat, path in sorted(files, key=lambda f: f[0].st_atime_ns):
+                if total - evicted <= max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                evicted += stat.st_size
+            return evicted
@@ -0,0 +1,70 @@
+"""Unit testing for store.py"""
+
+import hashlib
+import os
+
+from src.util.store import AssetStore
+
+
+def sha512(contents: str) -> str:
+    """Returns the SHA512 hash of the given string."""
+    return hashlib.sha512(contents.encode()).hexdigest()
+
+
+def test_store_add_and_fetch(tmp_path, create_file):
+    """Tests that stored files are hardlinked into place."""
+    store = AssetStore(tmp_path / 'store')
+    file_ = create_file(tmp_path / 'a' / 'a.jar', 'a')
+    assert not store.fetch(sha512('a'), tmp_path / 'b.jar')
+
+    store.add(file_, sha512('a'))
+    assert store.contains(sha512('a'))
+    assert store.fetch(sha512('a'), tmp_path / 'b.jar')
+    assert (tmp_path / 'b.jar').read_text() == 'a'
+    assert (tmp_path / 'b.jar').samefile(store.get_path(sha512('a')))
+    # An existing file at the destination is replaced
+    create_file(tmp_path / 'c.jar', 'old')
+    assert store.fetch(sha512('a'), tmp_path / 'c.jar')
+    assert (tmp_path / 'c.jar').read_text() == 'a'
+
+
+def test_store_default_path():
+    """Tests that the store lives in the m3 home directory by default."""
+    store = AssetStore()
+    assert store.path.is_dir()
+    assert store.path.name == 'store'
+
+
+def test_store_gc(tmp_path, create_file):
+    """Tests that the least recently used files are evicted first."""
+    store = AssetStore(tmp_path / 'store', max_bytes=2)
+    for i, name in enumerate(['a', 'b', 'c']):
+        store.add(create_file(tmp_path / f'{name}.jar', name), sha512(name))
+        stored_path = store.get_path(sha512(name))
+        os.utime(stored_path, ns=(i * 10 ** 9, i * 10 ** 9))
+    # Using a makes b the least recently used file
+    store.fetch(sha512('a'), tmp_path / 'a2.jar')
+
+    assert store.gc() == 1
+    assert store.contains(sha512('a'))
+    assert not store.contains(sha512('b'))
+    assert store.contains(sha512('c'))
+    assert store.size() == 2
+    # Evicting a stored file leaves installed copies in place
+    assert (tmp_path / 'b.jar').read_text() == 'b'
+
+
+def test_store_fetch_modified(tmp_path, create_file):
+    """Tests that a stored file modified in place through one of its links is
+    evicted instead of installed."""
+    store = AssetStore(tmp_path / 'store')
+    file_ = create_file(tmp_path / 'a' / 'a.jar', 'a')
+    store.add(file_, sha512('a'))
+    assert store.fetch(sha512('a'), tmp_path / 'b.jar')
+    with open(tmp_path / 'b.jar', 'w', encoding='utf-8') as f:
+        f.write('EVIL')
+
+    assert not store.fetch(sha512('a'), tmp_path / 'b.jar')
+    assert not store.contains(sha512('a'))
+    assert not store.fetch(sha512('a'), tmp_path / 'c.jar')
+    assert not (tmp_path / 'c.jar').exists()
@@ -1,32 +1,229 @@
 """Helper functions for web request related tasks."""
 
+import hashlib
+import os
+import threading
+import time
+import uuid
 from pathlib import Path
+from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from src.config.lockfile import HASH_ALGS
 from src.config.lockfile_entry import HashEntry
-from src.util.hash import hash_response_content
+from src.util.enum import HashAlg
+from src.util.files import move_file
+from src.util.hash import (create_hashers, get_hexdigests,
+                           update_hashers_from_file)
+from src.util.profile import PROFILER
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+PART_SUFFIX = '.part'
+# Seconds to wait to connect, and between bytes received, before giving up on
+# a download attempt.
+DOWNLOAD_TIMEOUT = (10, 60)
+# Number of times to resume a download after its connection fails, waiting
+# DOWNLOAD_RETRY_BACKOFF * 2 ** attempt seconds before each retry. Downloads
+# are only retried here, never by the session they are made through.
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_RETRY_BACKOFF = 1
+DOWNLOAD_RETRY_MAX_BACKOFF = 30
+DOWNLOAD_RETRY_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
 
-def download_file(url: str, dest: Path, file_hashes: HashEntry):
+# Maximum number of kept-alive connections per host, should be at least the
+# number of concurrent downloads.
+HTTP_POOL_SIZE = 16
+HTTP_RETRIES = 5
+HTTP_RETRY_BACKOFF = 0.5
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_download_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def create_session(retry_errors: bool = True) -> requests.Session:
+    """Returns a new requests session with a connection pool sized for
+    concurrent requests, which retries throttled and failed requests with
+    exponential backoff.
+
+    The CurseForge POST endpoints m3 uses only read data, so POST requests are
+    retried along with GET requests.
+
+    Args:
+        retry_errors: Whether to retry requests whose connection failed, or
+            only those answered with one of HTTP_RETRY_STATUSES
+    """
+    error_retries = HTTP_RETRIES if retry_errors else 0
+    retry = Retry(
+        total=HTTP_RETRIES, connect=error_retries, read=error_retries,
+        other=error_retries, backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Returns the session shared by every web request m3 makes, creating it
+    on first use so that connections are kept alive across requests."""
+    global _session  # pylint: disable=global-statement
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def get_download_session() -> requests.Session:
+    """Returns the session shared by every download, which leaves retrying
+    failed connections to download_file so that it can resume them."""
+    global _download_session  # pylint: disable=global-statement
+    with _session_lock:
+        if _download_session is None:
+            _download_session = create_session(retry_errors=False)
+        return _download_session
+
+
+def _open_download(url: str, offset: int) -> requests.Response:
+    """Starts streaming the given URL, asking for the bytes from offset
+    onwards if offset is not 0."""
+    headers = {'Range': f'bytes={offset}-'} if offset > 0 else {}
+    PROFILER.count('download_requests')
+    return get_download_session().get(
+        url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+
+
+def _is_resumed(response: requests.Response, offset: int) -> bool:
+    """Returns True if the response continues a download from offset rather
+    than sending the whole file."""
+    return response.status_code == 206 and response.headers.get(
+        'Content-Range', '').startswith(f'bytes {offset}-')
+
+
+def _download_part(url: str, part_path: Path,
+                   hashers: dict[HashAlg, 'hashlib._Hash']) -> bool:
+    """Downloads the given URL into part_path, resuming from the end of the
+    part file if it exists and the server supports range requests.
+
+    The hashers are fed the whole file, including any part downloaded
+    earlier.
+
+    Returns:
+        True if the part file holds the whole file, False if the server refused
+        the range because the part file is already complete or invalid.
+    """
+    offset = part_path.stat().st_size if part_path.exists() else 0
+    with _open_download(url, offset) as response:
+        if offset > 0 and response.status_code == 416:
+            return False
+        response.raise_for_status()
+        if offset > 0 and _is_resumed(response, offset):
+            update_hashers_from_file(hashers, part_path)
+            mode = 'ab'
+        else:
+            mode = 'wb'
+        downloaded = 0
+        try:
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(
+                        chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    for hasher in hashers.values():
+                        hasher.update(chunk)
+        finally:
+            PROFILER.count('bytes_downloaded', downloaded)
+    return True
+
+
+def download_file(
+        url: str, dest: Path, file_hashes: HashEntry,
+        part_path: Optional[Path] = None) -> dict[HashAlg, str]:
     """Download asset file from given URL.
 
+    The response is streamed to a .part file while every hash in HASH_ALGS is
+    computed over the same chunks, so memory use does not grow with the size of
+    the file. The .part file is moved to the destination only once the
+    expected hash has been verified.
+
+    If the connection fails, the download is retried with exponential backoff
+    and resumed with a Range request from the end of the .part file. The .part
+    file is kept when every attempt fails, so that a later call with the same
+    part_path resumes it. It is removed if its contents fail verification.
+
+    part_path may be shared by concurrent downloads of the same file. Each
+    download renames the .part file to a name of its own before writing to it,
+    so only one of them resumes it and the others start over.
+
     Args:
         url: The URL to download asset file from
         dest: The destination path to download to
+        file_hashes: The expected hashes of the file
+        part_path: Where to keep the partial download, defaults to a .part file
+            next to the destination
+
+    Returns:
+        A dict mapping each hashing algorithm to the hash of the downloaded
+        file.
     """
+    with PROFILER.phase('download'):
+        return _download_file(url, Path(dest), file_hashes, part_path)
+
+
+def _download_file(url: str, path: Path, file_hashes: HashEntry,
+                   part_path: Optional[Path]) -> dict[HashAlg, str]:
+    if part_path is None:
+        part_path = path.with_name(path.name + PART_SUFFIX)
+    claimed_path = part_path.with_name(f'{part_path.name}.{uuid.uuid4().hex}')
     try:
-        response = requests.get(url, timeout=10)
-        path = Path(dest)
-        response.raise_for_status()
-        common_alg, expected_hash = file_hashes.get_saved_hash()
-        if expected_hash != hash_response_content(response, common_alg):
-            raise ValueError(
-                "Downloaded file hash and expected hash do not match.")
-
-        with open(path, 'wb+') as f:
-            f.write(response.content)
-    except requests.HTTPError as error:
-        raise error
-    except ValueError as error:
-        raise error
+        os.rename(part_path, claimed_path)
+    except FileNotFoundError:
+        pass
+    try:
+        hashes = _download_to_part(url, claimed_path, file_hashes)
+    except BaseException:
+        # Hand the part back to be resumed by the next download
+        if claimed_path.exists():
+            os.replace(claimed_path, part_path)
+        raise
+    move_file(claimed_path, path)
+    return hashes
+
+
+def _download_to_part(url: str, part_path: Path,
+                      file_hashes: HashEntry) -> dict[HashAlg, str]:
+    """Downloads the given URL into part_path with retries, and verifies it
+    against the expected hash."""
+    common_alg, expected_hash = file_hashes.get_saved_hash()
+    algs = list(dict.fromkeys(HASH_ALGS + [common_alg]))
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        hashers = create_hashers(algs)
+        try:
+            if not _download_part(url, part_path, hashers):
+                hashers = create_hashers(algs)
+                update_hashers_from_file(hashers, part_path)
+            break
+        except DOWNLOAD_RETRY_ERRORS:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+            time.sleep(min(DOWNLOAD_RETRY_BACKOFF * 2 ** attempt,
+                           DOWNLOAD_RETRY_MAX_BACKOFF))
+    hashes = get_hexdigests(hashers)
+    if expected_hash != hashes[common_alg]:
+        part_path.unlink(missing_ok=True)
+        raise ValueError(
+            "Downloaded file hash and expected hash do not match.")
+    return hashes
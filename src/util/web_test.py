@@ -0,0 +1,178 @@
+"""Unit testing for web.py"""
+
+import hashlib
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+from src.config.lockfile_entry import HashEntry
+from src.util.enum import HashAlg
+from src.util.web import (DOWNLOAD_RETRY_BACKOFF, HTTP_POOL_SIZE,
+                          create_session, download_file,
+                          get_download_session)
+
+CONTENT = b'test jar contents' * 1000
+
+
+def mock_response(content: bytes, offset: int = 0,
+                  fail_after: int = None) -> MagicMock:
+    """Returns a mock streaming response for the given content.
+
+    Args:
+        content: The whole file
+        offset: The offset to send the content from with a 206 response
+        fail_after: The number of bytes to send before the connection drops
+    """
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.status_code = 206 if offset > 0 else 200
+    response.headers = {'Content-Range': f'bytes {offset}-'} \
+        if offset > 0 else {}
+    end = len(content) if fail_after is None else offset + fail_after
+
+    def _iter_content(chunk_size):
+        for i in range(offset, end, chunk_size):
+            yield content[i:min(i + chunk_size, end)]
+        if fail_after is not None:
+            raise requests.exceptions.ChunkedEncodingError('Connection lost')
+    response.iter_content.side_effect = _iter_content
+    return response
+
+
+@patch('src.util.web.DOWNLOAD_CHUNK_SIZE', 1024)
+@patch('src.util.web.get_download_session')
+class DownloadFileTest:
+    def test_download_file(self, mock_get_session, tmp_path):
+        """Tests that a streamed download is written to the destination and
+        hashed with every supported algorithm in one pass."""
+        mock_get = mock_get_session.return_value.get
+        mock_get.return_value = mock_response(CONTENT)
+        dest = tmp_path / 'a.jar'
+        hashes = download_file('https://cdn/a.jar', dest, HashEntry(
+            sha1=hashlib.sha1(CONTENT).hexdigest(), sha512=None, md5=None))
+
+        assert mock_get.call_args.kwargs['stream']
+        assert dest.read_bytes() == CONTENT
+        assert hashes[HashAlg.SHA1] == hashlib.sha1(CONTENT).hexdigest()
+        assert hashes[HashAlg.SHA512] == hashlib.sha512(CONTENT).hexdigest()
+        assert hashes[HashAlg.MD5] == hashlib.md5(CONTENT).hexdigest()
+        assert list(tmp_path.iterdir()) == [dest]
+
+    def test_download_file_hash_mismatch(self, mock_get_session, tmp_path):
+        """Tests that a download that fails verification leaves nothing
+        behind."""
+        mock_get_session.return_value.get.return_value = mock_response(CONTENT)
+        with pytest.raises(ValueError):
+            download_file('https://cdn/a.jar', tmp_path / 'a.jar', HashEntry(
+                sha1='wrong-hash', sha512=None, md5=None))
+        assert not list(tmp_path.iterdir())
+
+    def test_download_file_resumes_part(self, mock_get_session, tmp_path):
+        """Tests that an existing .part file is resumed with a range
+        request."""
+        mock_get = mock_get_session.return_value.get
+        mock_get.return_value = mock_response(CONTENT, offset=5000)
+        dest = tmp_path / 'a.jar'
+        (tmp_path / 'a.jar.part').write_bytes(CONTENT[:5000])
+        hashes = download_file('https://cdn/a.jar', dest, HashEntry(
+            sha1=hashlib.sha1(CONTENT).hexdigest(), sha512=None, md5=None))
+
+        assert mock_get.call_args.kwargs['headers'] == {'Range': 'bytes=5000-'}
+        assert dest.read_bytes() == CONTENT
+        assert hashes[HashAlg.SHA512] == hashlib.sha512(CONTENT).hexdigest()
+        assert list(tmp_path.iterdir()) == [dest]
+
+    def test_download_file_range_ignored(self, mock_get_session, tmp_path):
+        """Tests that the .part file is overwritten if the server sends the
+        whole file instead of the requested range."""
+        mock_get_session.return_value.get.return_value = mock_response(CONTENT)
+        dest = tmp_path / 'a.jar'
+        (tmp_path / 'a.jar.part').write_bytes(b'stale contents')
+        download_file('https://cdn/a.jar', dest, HashEntry(
+            sha1=hashlib.sha1(CONTENT).hexdigest(), sha512=None, md5=None))
+        assert dest.read_bytes() == CONTENT
+
+    @patch('time.sleep')
+    def test_download_file_retries(
+            self, mock_sleep, mock_get_session, tmp_path):
+        """Tests that a dropped connection is retried with backoff and resumed
+        from where it stopped."""
+        mock_get = mock_get_session.return_value.get
+        mock_get.side_effect = [
+            mock_response(CONTENT, fail_after=3000),
+            mock_response(CONTENT, offset=3000, fail_after=3000),
+            mock_response(CONTENT, offset=6000),
+        ]
+        dest = tmp_path / 'a.jar'
+        download_file('https://cdn/a.jar', dest, HashEntry(
+            sha1=hashlib.sha1(CONTENT).hexdigest(), sha512=None, md5=None))
+
+        assert dest.read_bytes() == CONTENT
+        assert [c.kwargs['headers'] for c in mock_get.call_args_list] == [
+            {}, {'Range': 'bytes=3000-'}, {'Range': 'bytes=6000-'}]
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [
+            DOWNLOAD_RETRY_BACKOFF, DOWNLOAD_RETRY_BACKOFF * 2]
+
+    @patch('time.sleep')
+    @patch('src.util.web.DOWNLOAD_RETRIES', 1)
+    def test_download_file_keeps_part(
+            self, _, mock_get_session, tmp_path):
+        """Tests that the .part file is kept to be resumed later if every
+        attempt fails."""
+        mock_get_session.return_value.get.side_effect = [
+            mock_response(CONTENT, fail_after=3000),
+            mock_response(CONTENT, offset=3000, fail_after=3000),
+        ]
+        part_path = tmp_path / 'partial' / 'a.part'
+        part_path.parent.mkdir()
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            download_file('https://cdn/a.jar', tmp_path / 'a.jar', HashEntry(
+                sha1=hashlib.sha1(CONTENT).hexdigest(), sha512=None, md5=None),
+                part_path=part_path)
+        assert part_path.read_bytes() == CONTENT[:6000]
+        assert not (tmp_path / 'a.jar').exists()
+
+    def test_download_file_shared_part(self, mock_get_session, tmp_path):
+        """Tests that concurrent downloads sharing a part_path each write to a
+        part file of their own."""
+        part_path = tmp_path / 'partial' / 'a.part'
+        part_path.parent.mkdir()
+        file_hashes = HashEntry(
+            sha1=hashlib.sha1(CONTENT).hexdigest(), sha512=None, md5=None)
+        outer = mock_response(CONTENT)
+        outer_chunks = outer.iter_content.side_effect
+
+        def _interleaved_chunks(chunk_size):
+            chunks = outer_chunks(chunk_size)
+            yield next(chunks)
+            # Another download of the same file starts and finishes meanwhile
+            download_file('https://cdn/a.jar', tmp_path / 'b.jar',
+                          file_hashes, part_path=part_path)
+            yield from chunks
+        outer.iter_content.side_effect = _interleaved_chunks
+        mock_get_session.return_value.get.side_effect = [
+            outer, mock_response(CONTENT)]
+        download_file('https://cdn/a.jar', tmp_path / 'a.jar', file_hashes,
+                      part_path=part_path)
+
+        assert (tmp_path / 'a.jar').read_bytes() == CONTENT
+        assert (tmp_path / 'b.jar').read_bytes() == CONTENT
+        assert not list(part_path.parent.iterdir())
+
+
+def test_create_session():
+    """Tests that the shared session pools connections and retries throttled
+    requests."""
+    adapter = create_session().get_adapter('https://api.curseforge.com')
+    assert adapter._pool_maxsize == HTTP_POOL_SIZE  # pylint: disable=protected-access
+    assert 429 in adapter.max_retries.status_forcelist
+    assert 'POST' in adapter.max_retries.allowed_methods
+
+
+def test_get_download_session():
+    """Tests that the download session retries throttled requests but leaves
+    failed connections to download_file."""
+    retry = get_download_session().get_adapter('https://cdn').max_retries
+    assert 429 in retry.status_forcelist
+    assert retry.connect == retry.read == retry.other == 0